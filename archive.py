@@ -0,0 +1,761 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module maintains a time-major archive of the daily NLDAS netCDF
+    files for fast point and small-box time series reads
+
+    Reading 10 years for one cell from the daily files means opening 3,650
+    files to read 4 bytes from each. The archive stores each variable in
+    its own netCDF4 file as a (time, lat_110, lon_110) array chunked long in
+    time (common.archiveChunks), so the same read touches a handful of
+    chunks in a single file.
+
+    Day N of the time axis is common.archiveOrigin + N days. Each day also
+    records the modification time of the daily file it was copied from
+    (source_mtime); days that were never ingested are masked there, and a
+    range is only read from the archive if every day in it was ingested.
+
+    File layout:
+        netCDF/archive/NLDAS_VARIABLE.nc
+            time(time)                  days since common.archiveOrigin
+            source_mtime(time)          mtime of the daily file ingested
+            lat_110(lat_110), lon_110(lon_110)
+            VARIABLE(time, lat_110, lon_110)
+            CUMSUM_VARIABLE(time, lat_110, lon_110)     float64 running sum
+            COUNT_VARIABLE(time, lat_110, lon_110)      running valid day count
+            time_K(time_K)                              for K = 1 to archiveLevels
+            MINK_VARIABLE(time_K, lat_110, lon_110)     min of each 2**K day block
+            MAXK_VARIABLE(time_K, lat_110, lon_110)     max of each 2**K day block
+
+    Each variable also has running totals over the time axis: CUMSUM holds
+    the sum of the valid values from day 0 through day N and COUNT the
+    number of valid days, so the sum and mean of any range are computed
+    from two time slices, (C[end] - C[start - 1]), whatever its length.
+
+    Range min and max use a pyramid of per-cell summaries: level k holds the
+    min and max of each aligned block of 2**k days (day j * 2**k through
+    (j + 1) * 2**k - 1), for k = 1 to common.archiveLevels. Any range splits
+    into O(log n) aligned blocks, and combining their summaries gives the
+    same result as scanning every day. A block is masked for a cell if any
+    of its days is.
+
+    The archive is updated incrementally by update(), which only copies the
+    days that are new or whose daily file changed since they were ingested
+    and recomputes the running totals and min/max blocks from the first day
+    copied onward.
+
+ """
+
+import glob
+import os
+import numpy as np
+from netCDF4 import Dataset
+import common
+import dataset_pool
+import grid_index
+import query_metrics
+import reducers
+
+
+def archive_filename(variable):
+    """
+    Get the archive filename of a variable
+
+    Parameters
+    ----------
+    variable : str
+        NLDAS variable name
+
+    Returns
+    -------
+    str
+        archive netCDF filename
+
+    """
+    return os.path.dirname(os.path.abspath(__file__)) + common.archivePath + "NLDAS_" + variable + ".nc"
+
+
+def archive_variables():
+    """
+    Get the variables that have an archive
+
+    Returns
+    -------
+    str()
+        NLDAS variable names
+
+    """
+    prefix = archive_filename('*')[:-len('*.nc')]
+    return sorted(f[len(prefix):-len('.nc')] for f in glob.glob(prefix + '*.nc'))
+
+
+def day_index(mydate):
+    """
+    Get the position of a date on the archive time axis
+
+    Parameters
+    ----------
+    mydate : date
+        date to locate
+
+    Returns
+    -------
+    int
+        days since common.archiveOrigin
+
+    """
+    return (mydate - common.archiveOrigin).days
+
+
+def _create(filename, variable, src):
+    """
+    Create the archive file of a variable using a daily file as template
+    """
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    ds = Dataset(filename, "w", format="NETCDF4")
+
+    ds.createDimension('time', None)
+    ds.createDimension('lat_110', len(src.dimensions['lat_110']))
+    ds.createDimension('lon_110', len(src.dimensions['lon_110']))
+
+    timeVar = ds.createVariable('time', 'i4', ('time',))
+    timeVar.units = 'days since ' + common.archiveOrigin.isoformat()
+    ds.createVariable('source_mtime', 'f8', ('time',), fill_value=-1.0)
+    for coordinate in ['lat_110', 'lon_110']:
+        ds.createVariable(coordinate, 'f', (coordinate,))
+        ds.variables[coordinate][:] = src.variables[coordinate][:]
+
+    data = ds.createVariable(variable, 'f', ('time', 'lat_110', 'lon_110'), fill_value=1.0e+20, chunksizes=_chunks(ds))
+    for key in src.variables[variable].ncattrs():
+        if key != '_FillValue':
+            setattr(data, key, getattr(src.variables[variable], key))
+    return ds
+
+
+def _chunks(ds):
+    return [min(c, len(ds.dimensions[d])) for c, d in zip(common.archiveChunks, ['time', 'lat_110', 'lon_110'])]
+
+
+def _create_totals(ds, variable):
+    """
+    Add the running total variables of a variable to its archive file
+    """
+    ds.createVariable('CUMSUM_' + variable, 'f8', ('time', 'lat_110', 'lon_110'), chunksizes=_chunks(ds))
+    ds.createVariable('COUNT_' + variable, 'i4', ('time', 'lat_110', 'lon_110'), chunksizes=_chunks(ds))
+
+
+def _update_totals(ds, variable, first):
+    """
+    Recompute the running totals of a variable from day first onward
+    """
+    data = ds.variables[variable]
+    cumsum = ds.variables['CUMSUM_' + variable]
+    count = ds.variables['COUNT_' + variable]
+
+    #the totals are only written from the first ingested day, before it they
+    #are unwritten (masked) and taken as zero
+    total = np.zeros(data.shape[1:], dtype=np.float64)
+    valid = np.zeros(data.shape[1:], dtype=np.int32)
+    if first > 0:
+        total = np.ma.filled(cumsum[first - 1], 0.0)
+        valid = np.ma.filled(count[first - 1], 0)
+
+    #one chunk of days at a time, masked days add nothing to either total
+    step = data.chunking()[0]
+    for start in range(first, len(ds.dimensions['time']), step):
+        block = data[start:start + step]
+        mask = np.ma.getmaskarray(block)
+        blockSum = np.cumsum(np.where(mask, 0.0, np.ma.getdata(block).astype(np.float64)), axis=0) + total
+        blockCount = np.cumsum(~mask, axis=0, dtype=np.int32) + valid
+        cumsum[start:start + len(block)] = blockSum
+        count[start:start + len(block)] = blockCount
+        total = blockSum[-1]
+        valid = blockCount[-1]
+
+
+def _create_pyramid(ds, variable):
+    """
+    Add the min/max block levels of a variable to its archive file
+    """
+    for level in range(1, common.archiveLevels + 1):
+        dimension = 'time_' + str(level)
+        if dimension not in ds.dimensions:
+            ds.createDimension(dimension, None)
+        chunks = _chunks(ds)
+        for function in ['MIN', 'MAX']:
+            ds.createVariable(function + str(level) + '_' + variable, 'f', (dimension, 'lat_110', 'lon_110'),
+                              fill_value=1.0e+20, chunksizes=chunks)
+
+
+def _level_variable(ds, variable, level, function):
+    #level 0 is the daily data itself
+    if level == 0:
+        return ds.variables[variable]
+    return ds.variables[function + str(level) + '_' + variable]
+
+
+def _update_pyramid(ds, variable, first):
+    """
+    Recompute the min/max blocks of a variable that contain day first or later
+    """
+    days = len(ds.dimensions['time'])
+    step = ds.variables[variable].chunking()[0]
+    for level in range(1, common.archiveLevels + 1):
+        lastBlock = (days - 1) >> level
+        for function, combine in [('MIN', np.ma.minimum), ('MAX', np.ma.maximum)]:
+            child = _level_variable(ds, variable, level - 1, function)
+            target = _level_variable(ds, variable, level, function)
+            #each block is the combination of the two blocks below it
+            for block in range(first >> level, lastBlock + 1, step):
+                blockEnd = min(block + step, lastBlock + 1)
+                pairs = np.ma.asarray(child[2 * block:2 * blockEnd])
+                if len(pairs) % 2:
+                    #the second half of the last block has no days yet
+                    pairs = np.ma.concatenate([pairs, np.ma.masked_all((1,) + pairs.shape[1:], dtype=pairs.dtype)])
+                target[block:blockEnd] = combine(pairs[0::2], pairs[1::2])
+
+
+def _first_ingested(ds):
+    ingested = np.flatnonzero(~np.ma.getmaskarray(ds.variables['source_mtime'][:]))
+    if len(ingested):
+        return int(ingested[0])
+    return None
+
+
+def _open_for_update(variable, src):
+    filename = archive_filename(variable)
+    #the pool may hold the archive open for reading
+    dataset_pool.pool.invalidate(filename)
+    if os.path.exists(filename):
+        ds = Dataset(filename, "a")
+    else:
+        ds = _create(filename, variable, src)
+    #archives written before the running totals or min/max blocks were added
+    #need them built from their first ingested day
+    first = None
+    if 'CUMSUM_' + variable not in ds.variables:
+        _create_totals(ds, variable)
+        first = _first_ingested(ds)
+    if 'MAX1_' + variable not in ds.variables:
+        _create_pyramid(ds, variable)
+        first = _first_ingested(ds)
+
+    #keep a whole row of chunks in the cache so consecutive days are written
+    #into the same chunks before they are flushed
+    data = ds.variables[variable]
+    chunks = data.chunking()
+    rowChunks = (-(-len(ds.dimensions['lat_110']) // chunks[1])) * (-(-len(ds.dimensions['lon_110']) // chunks[2]))
+    data.set_var_chunk_cache(size=int(rowChunks * chunks[0] * chunks[1] * chunks[2] * 4 * 1.2), nelems=rowChunks * 2 + 1)
+    return ds, first
+
+
+def update(dates, filenames, variables=None):
+    """
+    Copy new or changed daily files into the archive
+
+    Parameters
+    ----------
+    dates : date[]
+        date of each daily file
+    filenames : str[]
+        daily NLDAS netCDF filenames
+    variables : str[]
+        variables to archive, None for every 2d variable in the daily files
+
+    Returns
+    -------
+    int
+        number of days copied
+
+    """
+    handles = {}
+    #first day copied for each variable, the running totals and min/max
+    #blocks are recomputed from there
+    firstDay = {}
+    copied = 0
+    try:
+        for mydate, filename in zip(dates, filenames):
+            if not os.path.exists(filename):
+                continue
+            mtime = os.path.getmtime(filename)
+            index = day_index(mydate)
+
+            with dataset_pool.checkout(filename) as src:
+                names = variables
+                if names is None:
+                    names = [v for v in src.variables if src.variables[v].ndim == 2]
+
+                dayCopied = False
+                for variable in names:
+                    ds = handles.get(variable)
+                    if ds is None:
+                        ds, firstDay[variable] = _open_for_update(variable, src)
+                        handles[variable] = ds
+
+                    #skip days that are already up to date
+                    if index < len(ds.dimensions['time']):
+                        stamp = ds.variables['source_mtime'][index]
+                        if not np.ma.is_masked(stamp) and stamp >= mtime:
+                            continue
+
+                    ds.variables[variable][index, :, :] = src.variables[variable][:]
+                    ds.variables['time'][index] = index
+                    ds.variables['source_mtime'][index] = mtime
+                    if firstDay[variable] is None or index < firstDay[variable]:
+                        firstDay[variable] = index
+                    dayCopied = True
+                copied += dayCopied
+
+        for variable, ds in handles.items():
+            if firstDay[variable] is not None:
+                _update_totals(ds, variable, firstDay[variable])
+                _update_pyramid(ds, variable, firstDay[variable])
+    finally:
+        for ds in handles.values():
+            ds.close()
+
+    return copied
+
+
+def _read(variable, querystartdate, queryenddate, select):
+    """
+    Read a time series from the archive if it covers the whole range
+
+    select is called with the grid index of the archive and returns the (lat, lon)
+    index expressions to read plus any extra values to return.
+    """
+    filename = archive_filename(variable)
+    if not os.path.exists(filename):
+        return None
+
+    start = day_index(querystartdate)
+    end = day_index(queryenddate) + 1
+    with dataset_pool.checkout(filename) as ds:
+        if start < 0 or end > len(ds.dimensions['time']):
+            return None
+        if np.ma.getmaskarray(ds.variables['source_mtime'][start:end]).any():
+            return None
+
+        grid = grid_index.for_product('NLDAS', ds)
+        latselect, lonselect, extra = select(grid)
+        with query_metrics.stage('read'):
+            data = ds.variables[variable][start:end, latselect, lonselect]
+    query_metrics.record_read(data)
+
+    return np.ma.asarray(data), extra
+
+
+def _read_totals(variable, querystartdate, queryenddate, select):
+    """
+    Read the sum and valid day count of a range from the running totals
+
+    select is called as for _read; only two time slices are read whatever
+    the length of the range.
+    """
+    filename = archive_filename(variable)
+    if not os.path.exists(filename):
+        return None
+
+    start = day_index(querystartdate)
+    end = day_index(queryenddate) + 1
+    with dataset_pool.checkout(filename) as ds:
+        if start < 0 or end > len(ds.dimensions['time']) or 'CUMSUM_' + variable not in ds.variables:
+            return None
+        if np.ma.getmaskarray(ds.variables['source_mtime'][start:end]).any():
+            return None
+
+        grid = grid_index.for_product('NLDAS', ds)
+        latselect, lonselect, extra = select(grid)
+        cumsum = ds.variables['CUMSUM_' + variable]
+        count = ds.variables['COUNT_' + variable]
+        with query_metrics.stage('read'):
+            total = np.ma.getdata(cumsum[end - 1, latselect, lonselect])
+            valid = np.ma.getdata(count[end - 1, latselect, lonselect])
+            if start > 0:
+                total = total - np.ma.filled(cumsum[start - 1, latselect, lonselect], 0.0)
+                valid = valid - np.ma.filled(count[start - 1, latselect, lonselect], 0)
+        query_metrics.record_read(total)
+        query_metrics.record_read(valid)
+
+    return total, valid, extra
+
+
+def _blocks(start, end):
+    """
+    Split the days start to end - 1 into the fewest aligned blocks
+
+    Returns (level, block) pairs, block j of level k covers the days
+    j * 2**k to (j + 1) * 2**k - 1.
+    """
+    blocks = []
+    while start < end:
+        level = 0
+        while (level < common.archiveLevels and start % (2 << level) == 0 and
+               start + (2 << level) <= end):
+            level += 1
+        blocks.append((level, start >> level))
+        start += 1 << level
+    return blocks
+
+
+def _read_extreme(variable, querystartdate, queryenddate, aggregatefunction, select):
+    """
+    Read the min or max of a range by combining its aligned blocks
+
+    select is called as for _read.
+    """
+    filename = archive_filename(variable)
+    if not os.path.exists(filename):
+        return None
+
+    start = day_index(querystartdate)
+    end = day_index(queryenddate) + 1
+    function, combine = {'min': ('MIN', np.ma.minimum), 'max': ('MAX', np.ma.maximum)}[aggregatefunction]
+    with dataset_pool.checkout(filename) as ds:
+        if start < 0 or end > len(ds.dimensions['time']) or 'MAX1_' + variable not in ds.variables:
+            return None
+        if np.ma.getmaskarray(ds.variables['source_mtime'][start:end]).any():
+            return None
+
+        grid = grid_index.for_product('NLDAS', ds)
+        latselect, lonselect, extra = select(grid)
+        result = None
+        for level, block in _blocks(start, end):
+            with query_metrics.stage('read'):
+                data = np.ma.asarray(_level_variable(ds, variable, level, function)[block, latselect, lonselect])
+            query_metrics.record_read(data)
+            result = data if result is None else combine(result, data)
+
+    return result, extra
+
+
+def read_box_series(variable, querystartdate, queryenddate, lat_bounds, lon_bounds):
+    """
+    Read the daily values of a rectangle from the archive
+
+    Parameters
+    ----------
+    variable : str
+        variable to read
+    querystartdate : date
+        first day
+    queryenddate : date
+        last day
+    lat_bounds : float[]
+        lower and upper bounds for lat
+    lon_bounds : float[]
+        lower and upper bounds for lon
+
+    Returns
+    -------
+    tuple
+        (lats, lons, (days x lat x lon) MaskedArray), None if the archive
+        does not cover the range
+
+    """
+    result = _read(variable, querystartdate, queryenddate, _box_select(lat_bounds, lon_bounds))
+    if result is None:
+        return None
+    data, (lats, lons) = result
+    return lats, lons, data
+
+
+def read_rows(variable, querystartdate, queryenddate, latslice):
+    """
+    Read the daily values of a band of grid rows from the archive
+
+    Parameters
+    ----------
+    variable : str
+        variable to read
+    querystartdate : date
+        first day
+    queryenddate : date
+        last day
+    latslice : slice
+        lat index slice of the rows, every lon is read
+
+    Returns
+    -------
+    MaskedArray
+        (days x lat x lon) values, None if the archive does not cover the
+        range
+
+    """
+    result = _read(variable, querystartdate, queryenddate, lambda grid: (latslice, slice(None), None))
+    if result is None:
+        return None
+    return result[0]
+
+
+def _box_select(lat_bounds, lon_bounds):
+    def select(grid):
+        latslice, lonslice = grid.slices(lat_bounds, lon_bounds)
+        return latslice, lonslice, grid.coordinates(latslice, lonslice)
+    return select
+
+
+def _point_select(lats, lons, tolerance):
+    #read the hyperslab bounding the coordinates and gather them from it
+    def select(grid):
+        latindex, lonindex, snappedLats, snappedLons = grid.locate(lats, lons, tolerance)
+        latindex = np.atleast_1d(latindex)
+        lonindex = np.atleast_1d(lonindex)
+        latslice = slice(int(latindex.min()), int(latindex.max()) + 1)
+        lonslice = slice(int(lonindex.min()), int(lonindex.max()) + 1)
+        return latslice, lonslice, (latindex - latslice.start, lonindex - lonslice.start)
+    return select
+
+
+def read_point_series(variable, querystartdate, queryenddate, lats, lons, tolerance=None):
+    """
+    Read the daily values of one or more coordinates from the archive
+
+    The coordinates are snapped to their nearest grid cells and read from
+    the hyperslab bounding all of them.
+
+    Parameters
+    ----------
+    variable : str
+        variable to read
+    querystartdate : date
+        first day
+    queryenddate : date
+        last day
+    lats : float or float[]
+        lat of each coordinate
+    lons : float or float[]
+        lon of each coordinate
+    tolerance : float
+        max distance in degrees between a coordinate and the nearest grid
+        cell, None for half a grid cell
+
+    Returns
+    -------
+    MaskedArray
+        (days x coordinates) array, or (days,) for a single coordinate,
+        None if the archive does not cover the range
+
+    """
+    result = _read(variable, querystartdate, queryenddate, _point_select(lats, lons, tolerance))
+    if result is None:
+        return None
+    data, (latindex, lonindex) = result
+    series = data[:, latindex, lonindex]
+    if np.ndim(lats) == 0:
+        return series[:, 0]
+    return series
+
+
+def reduce_series(data, aggregatefunction):
+    """
+    Aggregate a time series read from the archive over time
+
+    Parameters
+    ----------
+    data : MaskedArray
+        time series, time is the first axis
+    aggregatefunction : str
+        any aggregate function supported by the reducers module
+
+    Returns
+    -------
+    MaskedArray
+        aggregated values
+
+    """
+    #reduce in the same blocks of days as fan_out so the result matches the
+    #one read from the daily files
+    size = common.queryBlockDays
+    merged = None
+    with query_metrics.stage('reduce'):
+        for block, start in enumerate(range(0, len(data), size)):
+            reducer = reducers.create(aggregatefunction, data.shape[1:], block)
+            for day in data[start:start + size]:
+                reducer.update(day)
+            if merged is None:
+                merged = reducer
+            else:
+                merged.merge(reducer)
+        return merged.result()
+
+
+def read_box_totals(variable, querystartdate, queryenddate, lat_bounds, lon_bounds):
+    """
+    Read the sum and valid day count of each cell of a rectangle over a range
+
+    Parameters
+    ----------
+    variable : str
+        variable to read
+    querystartdate : date
+        first day
+    queryenddate : date
+        last day
+    lat_bounds : float[]
+        lower and upper bounds for lat
+    lon_bounds : float[]
+        lower and upper bounds for lon
+
+    Returns
+    -------
+    tuple
+        (lats, lons, sums, counts), None if the archive does not cover the
+        range
+
+    """
+    result = _read_totals(variable, querystartdate, queryenddate, _box_select(lat_bounds, lon_bounds))
+    if result is None:
+        return None
+    total, valid, (lats, lons) = result
+    return lats, lons, total, valid
+
+
+def read_point_totals(variable, querystartdate, queryenddate, lats, lons, tolerance=None):
+    """
+    Read the sum and valid day count of one or more coordinates over a range
+
+    Parameters
+    ----------
+    variable : str
+        variable to read
+    querystartdate : date
+        first day
+    queryenddate : date
+        last day
+    lats : float or float[]
+        lat of each coordinate
+    lons : float or float[]
+        lon of each coordinate
+    tolerance : float
+        max distance in degrees between a coordinate and the nearest grid
+        cell, None for half a grid cell
+
+    Returns
+    -------
+    tuple
+        (sums, counts) with one value per coordinate, scalars for a single
+        coordinate, None if the archive does not cover the range
+
+    """
+    result = _read_totals(variable, querystartdate, queryenddate, _point_select(lats, lons, tolerance))
+    if result is None:
+        return None
+    total, valid, (latindex, lonindex) = result
+    total = total[latindex, lonindex]
+    valid = valid[latindex, lonindex]
+    if np.ndim(lats) == 0:
+        return total[0], valid[0]
+    return total, valid
+
+
+def reduce_totals(total, count, days, aggregatefunction):
+    """
+    Get the avg, sum or count of a range from its running totals
+
+    Matches the reducers of the same name: an average is masked unless the
+    cell is valid on every day of the range, a sum is masked where the cell
+    has no valid days.
+
+    Parameters
+    ----------
+    total : ndarray
+        sum of the valid values over the range
+    count : ndarray
+        number of valid days in the range
+    days : int
+        number of days in the range
+    aggregatefunction : str
+        avg, sum or count
+
+    Returns
+    -------
+    MaskedArray
+        value of each cell
+
+    """
+    count = np.asarray(count)
+    if aggregatefunction == "count":
+        return np.ma.masked_array(count.astype(np.int64))
+    if aggregatefunction == "sum":
+        return np.ma.masked_array(np.asarray(total, dtype=np.float64), mask=count == 0)
+    complete = count == days
+    mean = np.asarray(total, dtype=np.float64) / np.where(complete, days, 1)
+    return np.ma.masked_array(mean.astype(np.float32), mask=~complete)
+
+
+def read_box_extreme(variable, querystartdate, queryenddate, aggregatefunction, lat_bounds, lon_bounds):
+    """
+    Read the min or max of each cell of a rectangle over a range
+
+    Parameters
+    ----------
+    variable : str
+        variable to read
+    querystartdate : date
+        first day
+    queryenddate : date
+        last day
+    aggregatefunction : str
+        min or max
+    lat_bounds : float[]
+        lower and upper bounds for lat
+    lon_bounds : float[]
+        lower and upper bounds for lon
+
+    Returns
+    -------
+    tuple
+        (lats, lons, MaskedArray), None if the archive does not cover the
+        range
+
+    """
+    result = _read_extreme(variable, querystartdate, queryenddate, aggregatefunction,
+                           _box_select(lat_bounds, lon_bounds))
+    if result is None:
+        return None
+    data, (lats, lons) = result
+    return lats, lons, data
+
+
+def read_point_extreme(variable, querystartdate, queryenddate, aggregatefunction, lats, lons, tolerance=None):
+    """
+    Read the min or max of one or more coordinates over a range
+
+    Parameters
+    ----------
+    variable : str
+        variable to read
+    querystartdate : date
+        first day
+    queryenddate : date
+        last day
+    aggregatefunction : str
+        min or max
+    lats : float or float[]
+        lat of each coordinate
+    lons : float or float[]
+        lon of each coordinate
+    tolerance : float
+        max distance in degrees between a coordinate and the nearest grid
+        cell, None for half a grid cell
+
+    Returns
+    -------
+    MaskedArray
+        one value per coordinate, a scalar for a single coordinate, None if
+        the archive does not cover the range
+
+    """
+    result = _read_extreme(variable, querystartdate, queryenddate, aggregatefunction,
+                           _point_select(lats, lons, tolerance))
+    if result is None:
+        return None
+    data, (latindex, lonindex) = result
+    data = data[latindex, lonindex]
+    if np.ndim(lats) == 0:
+        return data[0]
+    return data
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module builds the day of year climatology of the NLDAS variables and
+    answers anomaly and z-score queries from it
+
+    The builder streams a range of years once, from the time-major archive
+    where it covers a year (see archive.py) and from the daily files
+    otherwise, and keeps the count, mean and standard deviation of every
+    cell for each day of the year (Welford, see reducers.Std). Every day is
+    read once, common.climatologyReadDays days at a time, so the statistics
+    of every day of the year are kept in memory for the whole grid while
+    building (about 700 MB for NLDAS).
+
+    Days of the year are counted on a leap year calendar, so March 1 is
+    always day 60 and February 29 has a day of its own.
+
+    The climatology of a date pools the days of the year in a window of
+    common.climatologyWindow days centred on it, wrapping around the end of
+    the year, so the normals are smoothed over neighbouring days. The
+    window is chosen when querying, the file stores the unsmoothed days.
+
+    File layout:
+        netCDF/climatology/NLDAS_VARIABLE.nc
+            slot(slot)                          day of the year, 0 to 365
+            lat_110(lat_110), lon_110(lon_110)
+            COUNT_VARIABLE(slot, lat_110, lon_110)  number of valid days
+            MEAN_VARIABLE(slot, lat_110, lon_110)   mean of the valid days
+            STD_VARIABLE(slot, lat_110, lon_110)    population standard deviation
+
+    Usage:
+        climatology.build('MAX_TMP_110_HTGL', date(1981, 1, 1), date(2010, 12, 31))
+        query_NLDAS.queryAnomalyRectangle(date(2018, 7, 4), 'MAX_TMP_110_HTGL', [30, 33], [-100, -96], zscore=True)
+
+ """
+
+from datetime import date, timedelta
+import os
+from netCDF4 import Dataset
+import numpy as np
+import archive
+import common
+import dataset_pool
+import grid_index
+import query_engine
+
+SLOTS = 366
+
+
+def climatology_filename(variable):
+    """
+    Get the climatology filename of a variable
+
+    Parameters
+    ----------
+    variable : str
+        NLDAS variable name
+
+    Returns
+    -------
+    str
+        climatology netCDF filename
+
+    """
+    fullPath = os.path.dirname(os.path.abspath(__file__)) + common.climatologyPath
+    return fullPath + 'NLDAS_' + variable + '.nc'
+
+
+def day_slot(mydate):
+    """
+    Get the day of the year of a date on a leap year calendar
+
+    Parameters
+    ----------
+    mydate : date
+        date
+
+    Returns
+    -------
+    int
+        day of the year, 0 for January 1, 59 for February 29, 60 for March 1
+
+    """
+    return (date(2000, mydate.month, mydate.day) - date(2000, 1, 1)).days
+
+
+def _create(filename, variable, src):
+    ds = Dataset(filename, "w", format="NETCDF4")
+    ds.createDimension('slot', SLOTS)
+    ds.createDimension('lat_110', len(src.dimensions['lat_110']))
+    ds.createDimension('lon_110', len(src.dimensions['lon_110']))
+
+    slotVar = ds.createVariable('slot', 'i2', ('slot',))
+    slotVar.long_name = 'day of the year on a leap year calendar, 0 is January 1'
+    slotVar[:] = np.arange(SLOTS)
+    for coordinate in ('lat_110', 'lon_110'):
+        ds.createVariable(coordinate, 'f', (coordinate,))
+        ds.variables[coordinate][:] = src.variables[coordinate][:]
+
+    dimensions = ('slot', 'lat_110', 'lon_110')
+    ds.createVariable('COUNT_' + variable, 'i2', dimensions, chunksizes=common.climatologyChunks)
+    ds.createVariable('MEAN_' + variable, 'f', dimensions, fill_value=1.0e+20, chunksizes=common.climatologyChunks)
+    ds.createVariable('STD_' + variable, 'f', dimensions, fill_value=1.0e+20, chunksizes=common.climatologyChunks)
+    return ds
+
+
+def _read_days(variable, start, end):
+    #the archive when it covers the days, otherwise each daily file once
+    data = archive.read_rows(variable, start, end, slice(None))
+    if data is not None:
+        return data
+    days = []
+    for i in range((end - start).days + 1):
+        with dataset_pool.checkout(query_engine.NLDAS.filename(start + timedelta(days=i))) as ds:
+            days.append(np.ma.asarray(ds.variables[variable][:]))
+    return np.ma.stack(days)
+
+
+def build(variable, querystartdate, queryenddate):
+    """
+    Build the climatology of a variable
+
+    Parameters
+    ----------
+    variable : str
+        NLDAS variable name
+    querystartdate : date
+        first day of the climatology period
+    queryenddate : date
+        last day of the climatology period
+
+    Returns
+    -------
+    str
+        climatology netCDF filename
+
+    """
+    filename = climatology_filename(variable)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    #build under a temporary name so queries keep the old climatology until it is done
+    tmpFilename = filename + '.tmp'
+
+    source = query_engine.NLDAS.filename(querystartdate)
+    if not os.path.exists(source):
+        source = archive.archive_filename(variable)
+    with dataset_pool.checkout(source) as src:
+        ds = _create(tmpFilename, variable, src)
+    ds.period_start = querystartdate.isoformat()
+    ds.period_end = queryenddate.isoformat()
+
+    try:
+        shape = (SLOTS, len(ds.dimensions['lat_110']), len(ds.dimensions['lon_110']))
+        #Welford count, mean and sum of squared deviations of every day of the year (see reducers.Std)
+        count = np.zeros(shape, dtype=np.int16)
+        mean = np.zeros(shape, dtype=np.float64)
+        m2 = np.zeros(shape, dtype=np.float64)
+
+        #stream the period once, common.climatologyReadDays days at a time
+        start = querystartdate
+        while start <= queryenddate:
+            end = min(start + timedelta(days=common.climatologyReadDays - 1), queryenddate)
+            for i, dataSubset in enumerate(_read_days(variable, start, end)):
+                slot = day_slot(start + timedelta(days=i))
+                valid = ~np.ma.getmaskarray(dataSubset)
+                values = np.where(valid, np.ma.getdata(dataSubset), 0.0)
+                count[slot] += valid
+                delta = values - mean[slot]
+                mean[slot] += np.where(valid, delta / np.maximum(count[slot], 1), 0.0)
+                m2[slot] += np.where(valid, delta * (values - mean[slot]), 0.0)
+            start = end + timedelta(days=1)
+
+        #write a chunk of days of the year at a time
+        step = common.climatologyChunks[0]
+        for slotStart in range(0, SLOTS, step):
+            slots = slice(slotStart, min(slotStart + step, SLOTS))
+            empty = count[slots] == 0
+            ds.variables['COUNT_' + variable][slots] = count[slots]
+            ds.variables['MEAN_' + variable][slots] = np.ma.masked_array(mean[slots], mask=empty)
+            ds.variables['STD_' + variable][slots] = np.ma.masked_array(
+                np.sqrt(np.maximum(m2[slots] / np.maximum(count[slots], 1), 0.0)), mask=empty)
+    finally:
+        ds.close()
+
+    os.replace(tmpFilename, filename)
+    return filename
+
+
+def _window(querydate, window):
+    #days of the year pooled for a date, in increasing order for netCDF4
+    if window is None:
+        window = common.climatologyWindow
+    half = min(window // 2, SLOTS // 2)
+    return sorted(set((day_slot(querydate) + np.arange(-half, half + 1)) % SLOTS))
+
+
+def _pool(count, mean, std):
+    #combine the count, mean and std of the days of the window (axis 0)
+    count = np.ma.filled(count, 0).astype(np.float64)
+    mean = np.ma.filled(mean, 0.0).astype(np.float64)
+    std = np.ma.filled(std, 0.0).astype(np.float64)
+    total = count.sum(axis=0)
+    pooledMean = (count * mean).sum(axis=0) / np.maximum(total, 1)
+    #spread of each day plus the spread of the day means around the pooled mean
+    variance = (count * (std * std + (mean - pooledMean) ** 2)).sum(axis=0) / np.maximum(total, 1)
+    empty = total == 0
+    return (np.ma.masked_array(pooledMean, mask=empty),
+            np.ma.masked_array(np.sqrt(np.maximum(variance, 0.0)), mask=empty))
+
+
+def _read(variable, querydate, window, select):
+    filename = climatology_filename(variable)
+    if not os.path.exists(filename):
+        raise ValueError('no climatology of ' + variable + ', see climatology.build')
+    slots = _window(querydate, window)
+    with dataset_pool.checkout(filename) as ds:
+        grid = grid_index.for_product('NLDAS', ds)
+        latselect, lonselect, extra = select(grid)
+        stats = [ds.variables[name + variable][slots, latselect, lonselect] for name in ('COUNT_', 'MEAN_', 'STD_')]
+    return _pool(*stats), extra
+
+
+def read_box(variable, querydate, lat_bounds, lon_bounds, window=None):
+    """
+    Read the climatology of a date for a rectangle
+
+    Parameters
+    ----------
+    variable : str
+        NLDAS variable name
+    querydate : date
+        date, only the day of the year is used
+    lat_bounds : float[]
+        lower and upper bounds for lat
+    lon_bounds : float[]
+        lower and upper bounds for lon
+    window : int
+        days pooled around the day of the year, defaults to
+        common.climatologyWindow
+
+    Returns
+    -------
+    tuple
+        (mean, standard deviation) MaskedArrays of the rectangle
+
+    """
+    def select(grid):
+        latslice, lonslice = grid.slices(lat_bounds, lon_bounds)
+        return latslice, lonslice, None
+    return _read(variable, querydate, window, select)[0]
+
+
+def read_point(variable, querydate, lat, lon, window=None, tolerance=None):
+    """
+    Read the climatology of a date at the grid cell nearest a coordinate
+
+    Parameters
+    ----------
+    variable : str
+        NLDAS variable name
+    querydate : date
+        date, only the day of the year is used
+    lat : float
+        latitude of the coordinate
+    lon : float
+        longitude of the coordinate
+    window : int
+        days pooled around the day of the year, defaults to
+        common.climatologyWindow
+    tolerance : float
+        max distance in degrees from the nearest grid cell
+
+    Returns
+    -------
+    tuple
+        (mean, standard deviation) at the coordinate
+
+    """
+    def select(grid):
+        latindex, lonindex, snappedLat, snappedLon = grid.locate(lat, lon, tolerance)
+        return slice(int(latindex), int(latindex) + 1), slice(int(lonindex), int(lonindex) + 1), None
+    (mean, std), extra = _read(variable, querydate, window, select)
+    return mean[0, 0], std[0, 0]
+
+
+def anomaly(values, mean, std, zscore=False):
+    """
+    Get the anomaly of values from their climatology
+
+    Parameters
+    ----------
+    values : MaskedArray or float
+        values of a date
+    mean : MaskedArray or float
+        climatological mean of the date
+    std : MaskedArray or float
+        climatological standard deviation of the date
+    zscore : bool
+        True for the anomaly in standard deviations
+
+    Returns
+    -------
+    MaskedArray or float
+        values - mean, divided by std for a z-score, masked where there is
+        no climatology or (z-score) no variability
+
+    """
+    difference = np.ma.asarray(values, dtype=np.float64) - mean
+    if zscore:
+        std = np.ma.masked_equal(np.ma.asarray(std, dtype=np.float64), 0.0)
+        difference = difference / std
+    return difference
@@ -9,6 +9,8 @@
 
  """
 
+from datetime import date
+
 
 hotTemp = 20 #degrees celcius temperature for a day to be considered hot
 coldTemp = 0 #degrees celcius temperature for a day to be considered cold
@@ -22,11 +24,83 @@ NLDASLonCount = 464
 #number of lat/long coordinates in the GFS file
 GFSLatCount = 361
 GFSLonCount = 720
+#forecast leads of the GFS files, in hours after the issue date
+GFSLeadStep = 3
+GFSMaxLead = 384
 HOURS = 24  #hours in day
 
 #path to store netCDF files in
 netCDFpath = '/netCDF/'
 #path where NLDAS files downloaded from web will be stored in
 NLDASpath = '/hydro1.gesdisc.eosdis.nasa.gov/data/NLDAS/NLDAS_FORA0125_H.002/'
+#url of the NLDAS hourly forcing archive, files are under YYYY/DDD/
+NLDASurl = 'https://hydro1.gesdisc.eosdis.nasa.gov/data/NLDAS/NLDAS_FORA0125_H.002/'
 #path where GFS files downnloaded from the web will be stored
-GFSpath = '/nomads.ncdc.noaa.gov/data/gfs4/'
\ No newline at end of file
+GFSpath = '/nomads.ncdc.noaa.gov/data/gfs4/'
+#path of the shared store of raw downloaded files (see raw_store.py)
+rawStorePath = '/rawstore/'
+
+#settings for the built-in downloader
+downloadWorkers = 8 #number of files downloaded at the same time
+downloadConnectionsPerHost = 4 #max concurrent connections to a single host
+downloadRetries = 5 #number of times a failed download is retried
+downloadBackoff = 2 #seconds to wait before the first retry, doubled after each retry
+downloadTimeout = 60 #seconds to wait on the server before giving up on a request
+downloadChunkSize = 1024 * 1024 #bytes written to disk per chunk
+#host that handles NASA Earthdata logins (credentials come from .netrc)
+EarthdataHost = 'urs.earthdata.nasa.gov'
+#cookie jar shared with wget so an existing login session can be reused
+cookieFile = '~/.urs_cookies'
+
+#retention of raw GRB files once the daily netCDF files are verified (see retention.py)
+#action taken on raw files, possible values: keep, delete, compress, move
+retentionAction = 'keep'
+retentionMinAgeDays = 7 #days after aggregation before the action is applied
+#max bytes of raw files kept per product, older days are processed first
+#to stay under the budget even if they are not old enough yet, None for no budget
+retentionMaxBytes = {'NLDAS': None, 'GFS': None}
+#path raw files are moved to by the move action
+coldPath = '/cold/'
+
+#max number of netCDF files the query modules keep open at once, idle or checked out (see dataset_pool.py)
+maxOpenDatasets = 64
+
+#time-major archive of the daily NLDAS files (see archive.py)
+archivePath = '/netCDF/archive/'
+archiveOrigin = date(1979, 1, 1) #first day of NLDAS-2, day 0 of the archive time axis
+archiveChunks = (64, 16, 16) #chunk shape (days, lat, lon), long in time for point time series reads
+archiveLevels = 12 #levels of min/max blocks in the archive, level k blocks are 2**k days (up to 4096)
+
+#approximate percentiles (see reducers.py)
+percentileSamples = 256 #reservoir sample size per cell
+percentileSeed = 0 #seed of the reservoir sampling, fixed so queries are repeatable
+
+#parallel date range queries (see fan_out.py)
+queryWorkers = 4 #default number of worker processes, 1 to run in the calling process
+queryBlockDays = 32 #days reduced by each task, fixed so results do not depend on the worker count
+
+#cache of query results (see result_cache.py)
+resultCache = True #False to always run the queries
+resultCachePath = '/netCDF/cache/'
+resultCacheMemoryBytes = 256 * 1024 * 1024 #max bytes of results kept in memory
+resultCacheDiskBytes = 4 * 1024 * 1024 * 1024 #max bytes of results kept on disk
+
+#polygon region queries (see regions.py)
+regionSubsamples = 8 #subcells per grid cell along each axis for the cell fractions of a region
+regionMaskCacheSize = 256 #number of rasterized regions kept
+
+#day of year climatology of the NLDAS variables (see climatology.py)
+climatologyPath = '/netCDF/climatology/'
+climatologyWindow = 31 #days pooled around each day of the year, 1 for no smoothing
+climatologyReadDays = 64 #days read at a time by the builder, one chunk of the archive time axis
+climatologyChunks = (8, 32, 32) #chunk shape (day of year, lat, lon)
+
+#opt-in instrumentation of the queries (see query_metrics.py)
+queryMetrics = False #True to record the stage times and counters of every query
+queryMetricsFile = None #Prometheus text file the totals are written to, None to not write one
+queryMetricsInterval = 10 #min seconds between writes of the Prometheus file
+
+#regridding between the NLDAS and GFS grids (see regrid.py)
+regridPath = '/netCDF/regrid/'
+regridMinWeight = 0.5 #min fraction of the weight of a target cell from valid source cells, masked otherwise
+regridChunk = 8 #grids (days) multiplied at a time, bounds the memory used by a regrid
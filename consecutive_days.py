@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module contains the vectorized engine behind the consecutive days
+    queries (hot, cold, wet and dry runs)
+
+    The RunTracker keeps, for every cell, the length of the current run, the
+    longest run and the day it started, and the number of qualifying days,
+    and updates them with whole-array operations once per day.
+
+    A day without data for a cell (masked) does not qualify and ends the
+    run of that cell. Cells without data on any day are masked in the
+    results.
+
+ """
+
+import numpy as np
+from pyeto import convert
+import common
+
+#consecutive day functions supported by qualifying
+FUNCTIONS = ['hot', 'cold', 'wet', 'dry']
+
+
+def qualifying(dataSubset, aggregatefunction):
+    """
+    Get the cells that count towards a run for one day
+
+    Parameters
+    ----------
+    dataSubset : MaskedArray
+        values of the variable for the day (kelvin for hot/cold)
+    aggregatefunction : str
+        function for calculating concecutive days, possible values: cold, hot, wet, dry
+
+    Returns
+    -------
+    tuple
+        (qualifying, valid) boolean arrays, qualifying is False where the
+        data is masked
+
+    """
+    valid = ~np.ma.getmaskarray(dataSubset)
+    data = np.ma.getdata(dataSubset)
+
+    if aggregatefunction == "hot":
+        result = convert.kelvin2celsius(data) > common.hotTemp
+    elif aggregatefunction == "cold":
+        result = convert.kelvin2celsius(data) < common.coldTemp
+    elif aggregatefunction == "wet":
+        result = data > common.wetPrecip
+    elif aggregatefunction == "dry":
+        result = data < common.dryPrecip
+    else:
+        raise ValueError('unknown consecutive days function: ' + str(aggregatefunction))
+
+    return result & valid, valid
+
+
+class RunTracker:
+    """
+    Run statistics for every cell of a grid, updated one day at a time
+
+    Trackers over consecutive blocks of days can be merged, so a range can
+    be tracked in pieces.
+
+    Parameters
+    ----------
+    shape : tuple
+        shape of the grid (() for a single coordinate)
+    offset : int
+        index of the first day this tracker will be updated with, for
+        tracking a block of a longer range
+
+    """
+
+    def __init__(self, shape, offset=0):
+        self.offset = offset
+        self.days = offset
+        self.current = np.zeros(shape, dtype=np.int64)
+        self.currentStart = np.zeros(shape, dtype=np.int64)
+        self.longest = np.zeros(shape, dtype=np.int64)
+        self.longestStart = np.zeros(shape, dtype=np.int64)
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.valid = np.zeros(shape, dtype=bool)
+        #run at the start of the days added, needed to merge trackers
+        self.prefix = np.zeros(shape, dtype=np.int64)
+
+    def update(self, qualifies, valid):
+        """
+        Add the next day
+
+        Parameters
+        ----------
+        qualifies : ndarray
+            cells that count towards a run for the day
+        valid : ndarray
+            cells with data for the day
+
+        """
+        self.prefix = np.where(qualifies & (self.prefix == self.days - self.offset), self.prefix + 1, self.prefix)
+        self.current = np.where(qualifies, self.current + 1, 0)
+        self.currentStart = np.where(qualifies & (self.current == 1), self.days, self.currentStart)
+
+        longer = self.current > self.longest
+        self.longest = np.where(longer, self.current, self.longest)
+        self.longestStart = np.where(longer, self.currentStart, self.longestStart)
+
+        self.count += qualifies
+        self.valid |= valid
+        self.days += 1
+
+    def merge(self, other):
+        """
+        Add the days of a tracker whose block starts where this one ends
+
+        The result is the same as updating this tracker with the days of
+        other, including which of several equally long runs is reported.
+
+        Parameters
+        ----------
+        other : RunTracker
+            tracker over the following days
+
+        """
+        length = other.days - other.offset
+        if length == 0:
+            return
+
+        #the run crossing the boundary joins our trailing run to its leading run
+        bridge = self.current + other.prefix
+        bridgeStart = np.where(self.current > 0, self.currentStart, other.offset)
+
+        #ties go to the earliest run, as they do day by day
+        keepOurs = (self.longest >= bridge) & (self.longest >= other.longest)
+        takeBridge = ~keepOurs & (bridge >= other.longest)
+        self.longestStart = np.where(keepOurs, self.longestStart,
+                                     np.where(takeBridge, bridgeStart, other.longestStart))
+        self.longest = np.where(keepOurs, self.longest, np.where(takeBridge, bridge, other.longest))
+
+        otherAll = other.prefix == length
+        self.prefix = np.where(self.prefix == self.days - self.offset, self.prefix + other.prefix, self.prefix)
+        self.currentStart = np.where(otherAll, bridgeStart, other.currentStart)
+        self.current = np.where(otherAll, self.current + length, other.current)
+
+        self.count = self.count + other.count
+        self.valid = self.valid | other.valid
+        self.days = other.days
+
+    def results(self, dates):
+        """
+        Get the run statistics
+
+        Parameters
+        ----------
+        dates : date[]
+            date of each day added, in order
+
+        Returns
+        -------
+        tuple
+            (trailing run, longest run, longest run start date, qualifying
+            day count) as masked arrays, the start date is a datetime64[D]
+            array masked where there was no run
+
+        """
+        noData = ~self.valid
+        dates = np.array(dates, dtype='datetime64[D]')
+        if len(dates):
+            startDates = dates[self.longestStart]
+        else:
+            startDates = np.zeros(self.longest.shape, dtype='datetime64[D]')
+
+        return (np.ma.masked_array(self.current, mask=noData),
+                np.ma.masked_array(self.longest, mask=noData),
+                np.ma.masked_array(startDates, mask=noData | (self.longest == 0)),
+                np.ma.masked_array(self.count, mask=noData))
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module contains a process-wide pool of open netCDF4 Datasets used by
+    the query modules
+
+    Opening a daily netCDF file is the most expensive part of a small query,
+    so the pool keeps recently used files open in least recently used order.
+    At most common.maxOpenDatasets handles are open at once: the oldest idle
+    handle is closed to open another file, and when every handle is checked
+    out a checkout of a file that is not open waits for one to be released.
+
+    A handle is checked out exclusively (netCDF4/HDF5 handles must not be
+    read from two threads at once), and a file that was rewritten since it
+    was opened is reopened on the next checkout, after the checkouts of the
+    old handle are released. Files are opened outside the pool lock, the
+    handle is reserved first so checkouts of the same file wait for the open
+    and checkouts of other files go on.
+
+    Usage:
+        with dataset_pool.checkout(filename) as ds:
+            data = ds.variables[variable][...]
+
+ """
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import os
+import threading
+from netCDF4 import Dataset
+import common
+import query_metrics
+
+
+class _Entry:
+    """
+    An open Dataset and the state needed to share it, ds is None while the
+    file is being opened
+    """
+
+    def __init__(self, ds, stamp):
+        self.ds = ds
+        self.stamp = stamp
+        self.users = 0
+        self.lock = threading.Lock()
+
+
+def _stamp(filename):
+    #modification time and size identify the version of the file that is open
+    stat = os.stat(filename)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class DatasetPool:
+    """
+    LRU pool of open netCDF4 Datasets
+
+    Parameters
+    ----------
+    max_open : int
+        max number of handles open at once, idle or checked out
+
+    """
+
+    def __init__(self, max_open=common.maxOpenDatasets):
+        self.max_open = max_open
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.waits = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        #notified when a handle is released
+        self._released = threading.Condition(self._lock)
+
+    def _evict(self, limit):
+        #close the least recently used idle handles until at most limit are open
+        for filename in list(self._entries):
+            if len(self._entries) <= limit:
+                break
+            entry = self._entries[filename]
+            if entry.users == 0:
+                del self._entries[filename]
+                entry.ds.close()
+                self.evictions += 1
+
+    def _acquire(self, filename):
+        stamp = _stamp(filename)
+        opening = False
+        with self._released:
+            while True:
+                entry = self._entries.get(filename)
+                if entry is not None and entry.stamp != stamp:
+                    if entry.users:
+                        #the file was rewritten, never hand out the old handle, wait for its release
+                        self.waits += 1
+                        self._released.wait()
+                        continue
+                    del self._entries[filename]
+                    entry.ds.close()
+                    entry = None
+                if entry is not None:
+                    self.hits += 1
+                    query_metrics.count('dataset_hits')
+                    self._entries.move_to_end(filename)
+                    break
+
+                #make room for the new handle, or wait for a checked out handle to be released
+                self._evict(self.max_open - 1)
+                if len(self._entries) < self.max_open:
+                    self.misses += 1
+                    query_metrics.count('files_opened')
+                    #reserve the handle, checkouts of the file wait on its lock until it is open
+                    entry = _Entry(None, stamp)
+                    entry.lock.acquire()
+                    self._entries[filename] = entry
+                    opening = True
+                    break
+                self.waits += 1
+                self._released.wait()
+            entry.users += 1
+
+        if opening:
+            try:
+                entry.ds = Dataset(filename)
+            except BaseException:
+                with self._released:
+                    del self._entries[filename]
+                    entry.users -= 1
+                    self._released.notify_all()
+                entry.lock.release()
+                raise
+            return entry
+
+        entry.lock.acquire()
+        if entry.ds is None:
+            #the file could not be opened by the checkout that reserved the handle, try again
+            self._release(entry)
+            return self._acquire(filename)
+        return entry
+
+    def _release(self, entry):
+        entry.lock.release()
+        with self._released:
+            entry.users -= 1
+            self._evict(self.max_open)
+            self._released.notify_all()
+
+    @contextmanager
+    def checkout(self, filename):
+        """
+        Check out an open Dataset for exclusive use
+
+        Parameters
+        ----------
+        filename : str
+            netCDF file to open
+
+        Yields
+        ------
+        Dataset
+            open dataset, only valid inside the with block
+
+        """
+        with query_metrics.stage('open'):
+            entry = self._acquire(filename)
+        try:
+            yield entry.ds
+        finally:
+            self._release(entry)
+
+    def invalidate(self, filename=None):
+        """
+        Close idle handles so the files are reopened on the next checkout
+
+        Parameters
+        ----------
+        filename : str
+            file to close, None to close every idle handle
+
+        """
+        with self._lock:
+            for name in list(self._entries):
+                if filename is not None and name != filename:
+                    continue
+                entry = self._entries[name]
+                if entry.users == 0:
+                    del self._entries[name]
+                    entry.ds.close()
+
+    def stats(self):
+        """
+        Get the pool counters
+
+        Returns
+        -------
+        dict
+            hits, misses, evictions, waits for a free handle, number of
+            open handles and max_open
+
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'waits': self.waits,
+                    'open': len(self._entries), 'max_open': self.max_open}
+
+
+#pool shared by every query in the process
+pool = DatasetPool()
+
+
+def checkout(filename):
+    """
+    Check out an open Dataset from the process-wide pool
+
+    Parameters
+    ----------
+    filename : str
+        netCDF file to open
+
+    Returns
+    -------
+    context manager
+        yields the open Dataset
+
+    """
+    return pool.checkout(filename)
+
+
+def stats():
+    """
+    Get the counters of the process-wide pool
+
+    Returns
+    -------
+    dict
+        hits, misses, evictions, waits for a free handle, number of
+        open handles and max_open
+
+    """
+    return pool.stats()
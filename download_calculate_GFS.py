@@ -11,11 +11,11 @@
     It will do this in a loop for each day in a given date range
     (startDate, endDate).
 
-    The module uses wget to download the files.
+    The module uses the downloader module to download the files.
 
     The website that holds these GRB files does have indexing so he module will
-    build a txt file containing all the file names to download for each day
-    and wget will use that txt file to download all the files.
+    build a list containing all the file names to download for each day
+    and the downloader will fetch all the files in that list.
 
     The module also shells out to the os to perform the daily aggregation
 
@@ -33,11 +33,21 @@ from datetime import date, timedelta
 import os
 import gc
 import common
+import downloader
+import raw_store
+import retention
 
 startDate = date(2018, 1, 1)
 endDate = date(2018, 1, 1)
 myDate = startDate
 
+root = os.path.dirname(os.path.abspath(__file__))
+
+#one downloader for the whole run so connections are reused across days
+fetcher = downloader.Downloader()
+#files already in the shared raw store are only downloaded again if they changed upstream
+store = raw_store.RawStore()
+
 #loop over dates from startDate to endDate
 while myDate <= endDate:
     #split out the parts of the year
@@ -46,13 +56,10 @@ while myDate <= endDate:
     day = ("{date.day:02}".format(date=myDate))
 
     #get current path
-    fullPath = os.path.dirname(os.path.abspath(__file__)) + common.GFSpath
+    fullPath = root + common.GFSpath
 
-    #call wget to download files for given year/day
-    #create a filelist.txt file to contain the files that we need to download
-    if os.path.exists("filelist.txt"):
-        os.remove("filelist.txt")
-    url_list = open("filelist.txt", "w")
+    #build the list of files that we need to download for given year/day
+    url_list = []
 
     #populate filelist
     #outer loop is for the 6 hour intervals (0000, 0600, 1200, 1800)
@@ -60,16 +67,20 @@ while myDate <= endDate:
         #inner loop for the 3 hour forecast intervals (000, 003, 006, ....384)
         for j in range(129):
             filename = 'gfs_4_' + year + month + day + '_' + str(i*6).zfill(2) + '00_' + str(j*3).zfill(3) + '.grb2'
-            url_list.write('https://nomads.ncdc.noaa.gov/data/gfs4/' + year + month + '/' + year + month + day  + '/' + filename + '\n')
-
-    url_list.close()
+            url_list.append('https://nomads.ncdc.noaa.gov/data/gfs4/' + year + month + '/' + year + month + day  + '/' + filename)
 
-    #call wget to get all files in filelist.xt
-    #os.system('wget -x -i filelist.txt')
+    #download all files in url_list
+    downloader.check_results(store.fetch_all(fetcher, [(url, downloader.mirror_path(url, root)) for url in url_list]))
 
     #create daily averages and output netCDF file
     #loop over all forecast intervals for the given day (000, 003, 006, ....384)
     for j in range(129):
         os.system('python -c "import hourly_to_daily_GFS; hourly_to_daily_GFS.hourly_to_daily_one_day(\'' + fullPath + '\',\'' + year + '\',\'' + month + '\',\'' + day + '\',\'' + str(j*3).zfill(3) + '\')"')
         gc.collect()
-    myDate += timedelta(days=1)
\ No newline at end of file
+    myDate += timedelta(days=1)
+
+fetcher.close()
+
+#apply the raw file retention policy now that the days are aggregated
+retention.enforce('GFS', root)
+retention.print_disk_usage(root)
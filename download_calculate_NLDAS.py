@@ -11,10 +11,17 @@
     It will do this in a loop for each day in a given date range
     (startDate, endDate).
 
-    The module uses wget to download the files.
+    The module uses the downloader module to download the files.
 
-    The website that holds these GRB files has indexing so we can download
-    all files in a single directory at once
+    The GRB file names are fully determined by the date and hour, so the
+    url_planner module builds the exact list of hourly files for the whole
+    date range. Every hour is fetched through the raw_store module, which
+    revalidates the hours already on disk with conditional requests
+    (If-None-Match/If-Modified-Since) and only downloads them again if they
+    changed upstream.
+
+    The daily netCDF files are then copied into the time-major archive (see
+    the archive module) used by the NLDAS time series queries.
 
     The files are located at https://hydro1.gesdisc.eosdis.nasa.gov/data/NLDAS/NLDAS_FORA0125_H.002/YYYY/DDD
     The naming convention for the files is NLDAS_FORA0125_H.AYYYYMMDD.HHHH.002.grb
@@ -26,19 +33,33 @@
 
  """
 
-#files required for wget
+#files required for the downloader
 #.netrc - need to update with username/password to NLDAS data website
-#.usr_cookies
+#.urs_cookies
 
 import hourly_to_daily_NLDAS
+import query_NLDAS
 from datetime import date, timedelta
 import os
+import archive
 import common
+import downloader
+import raw_store
+import retention
+import url_planner
 
 startDate = date(2018, 1, 1)
 endDate = date(2018, 1, 3)
 myDate = startDate
 
+root = os.path.dirname(os.path.abspath(__file__))
+
+#download every hour in the date range in one batch
+#files already in the shared raw store are only revalidated, not downloaded again
+store = raw_store.RawStore()
+with downloader.Downloader(netrc_file=os.path.join(root, '.netrc')) as fetcher:
+    downloader.check_results(store.fetch_all(fetcher, url_planner.nldas_plan(startDate, endDate, root)))
+
 #loop over dates from startDate to endDate
 while myDate <= endDate:
     #split out the parts of the year
@@ -47,10 +68,16 @@ while myDate <= endDate:
     julianday = format(tt.tm_yday, '03')
 
     # get current path
-    fullPath = os.path.dirname(os.path.abspath(__file__)) + common.NLDASpath
-    #call wget to download files for given year/day
-    os.system('wget --load-cookies ~/.urs_cookies --save-cookies ~/.urs_cookies --auth-no-challenge=on --keep-session-cookies -np -r --content-disposition https://hydro1.gesdisc.eosdis.nasa.gov/data/NLDAS/NLDAS_FORA0125_H.002/' + year + '/' + julianday + '/ -A grb')
+    fullPath = root + common.NLDASpath
 
     #create daily averages and output netCDF file
     hourly_to_daily_NLDAS.hourly_to_daily_one_day(fullPath, year, julianday)
     myDate += timedelta(days=1)
+
+#copy the new days into the time-major archive used for time series queries
+dates = [startDate + timedelta(days=i) for i in range((endDate - startDate).days + 1)]
+archive.update(dates, query_NLDAS.getfilenames(startDate, endDate))
+
+#apply the raw file retention policy now that the days are aggregated
+retention.enforce('NLDAS', root)
+retention.print_disk_usage(root)
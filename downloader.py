@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module contains a concurrent HTTP downloader used by the
+    download_calculate_* drivers in place of wget
+
+    All requests go through a single pooled requests session so connections
+    (and the Earthdata login cookies) are reused across files and days.
+
+    Features:
+        - bounded number of concurrent downloads per host
+        - Earthdata authentication from .netrc, with the login cookies
+          loaded from and saved back to the same cookie jar wget uses
+        - retries with exponential backoff
+        - resumable partial files (FILENAME.part + HTTP Range requests),
+          the ETag or Last-Modified of the partial file is kept in
+          FILENAME.part.validator and sent as If-Range, so a file changed
+          on the server is downloaded again rather than appended to
+
+    Files are stored the same way wget -x stores them, so the GRB files end
+    up in the directory trees the hourly_to_daily_* modules expect:
+        ROOT/HOST/PATH/FILENAME
+
+ """
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import LoadError, MozillaCookieJar
+from netrc import netrc, NetrcParseError
+from urllib.parse import urlparse
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+import common
+
+#result of a single download
+#   url : url requested
+#   path : local file the url was written to
+#   ok : True if the file is complete on disk
+#   status : last HTTP status code received (None if no response)
+#   bytes : number of bytes transferred for this download
+#   attempts : number of requests made
+#   error : description of the last error (None on success)
+#   headers : headers of the last response (empty if no response)
+DownloadResult = namedtuple('DownloadResult', ['url', 'path', 'ok', 'status', 'bytes', 'attempts', 'error', 'headers'])
+
+#status codes that are worth retrying
+RETRY_STATUS = [408, 429, 500, 502, 503, 504]
+
+
+def _validator(response):
+    #strong ETag, or else Last-Modified, of a response, weak ETags can not be used in If-Range
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+
+def _discard(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class DownloadError(Exception):
+    """
+    Raised when a download fails in a way that should not be retried
+    """
+
+
+class EarthdataSession(requests.Session):
+    """
+    requests session that authenticates against NASA Earthdata
+
+    Credentials for the Earthdata login host are read from a .netrc file and
+    are only ever sent to that host. Cookies are loaded from and saved to a
+    Mozilla format cookie jar (the format used by wget --save-cookies).
+
+    Parameters
+    ----------
+    netrc_file : str
+        path to the .netrc file, None to use ~/.netrc
+    cookie_file : str
+        path to the cookie jar, None to keep cookies in memory only
+
+    """
+
+    def __init__(self, netrc_file=None, cookie_file=None):
+        super().__init__()
+        self.auth_host = common.EarthdataHost
+        self.login = self._read_login(netrc_file)
+
+        self.cookie_file = os.path.expanduser(cookie_file) if cookie_file else None
+        self.cookies = MozillaCookieJar(self.cookie_file)
+        if self.cookie_file and os.path.exists(self.cookie_file):
+            try:
+                self.cookies.load(ignore_discard=True, ignore_expires=True)
+            except (LoadError, OSError):
+                #a corrupt jar just means we have to log in again
+                pass
+        self._cookie_lock = threading.Lock()
+
+    def _read_login(self, netrc_file):
+        try:
+            auth = netrc(os.path.expanduser(netrc_file) if netrc_file else None).authenticators(self.auth_host)
+        except (FileNotFoundError, NetrcParseError):
+            return None
+        if auth is None:
+            return None
+        return (auth[0], auth[2])
+
+    def rebuild_auth(self, prepared_request, response):
+        """
+        Only send the Earthdata credentials to the Earthdata login host
+        """
+        headers = prepared_request.headers
+        host = urlparse(prepared_request.url).hostname
+        if 'Authorization' in headers and host != self.auth_host:
+            del headers['Authorization']
+        if host == self.auth_host and self.login is not None:
+            prepared_request.prepare_auth(self.login)
+
+    def save_cookies(self):
+        """
+        Write the session cookies back to the cookie jar
+        """
+        if not self.cookie_file:
+            return
+        with self._cookie_lock:
+            self.cookies.save(ignore_discard=True, ignore_expires=True)
+
+
+class Downloader:
+    """
+    Concurrent HTTP downloader with a pooled session
+
+    Parameters
+    ----------
+    workers : int
+        number of files downloaded at the same time
+    per_host : int
+        max number of concurrent connections to a single host
+    retries : int
+        number of times a failed download is retried
+    backoff : float
+        seconds to wait before the first retry, doubled after each retry
+    timeout : float
+        seconds to wait on the server before giving up on a request
+    netrc_file : str
+        path to the .netrc file holding Earthdata credentials
+    cookie_file : str
+        path to the Earthdata cookie jar
+    session : requests.Session
+        session to use instead of creating an EarthdataSession
+
+    """
+
+    def __init__(self, workers=common.downloadWorkers, per_host=common.downloadConnectionsPerHost,
+                 retries=common.downloadRetries, backoff=common.downloadBackoff, timeout=common.downloadTimeout,
+                 netrc_file=None, cookie_file=common.cookieFile, session=None):
+        self.workers = workers
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        if session is None:
+            session = EarthdataSession(netrc_file, cookie_file)
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=max(workers, per_host))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        self.session = session
+
+        self._host_locks = {}
+        self._lock = threading.Lock()
+
+    def _host_semaphore(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_locks:
+                self._host_locks[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_locks[host]
+
+    def _fetch(self, url, path, headers=None):
+        """
+        Make one attempt at downloading url to path
+
+        Appends to path.part when the server honours the Range header and
+        the file is unchanged (If-Range), and starts over otherwise.
+
+        Returns
+        -------
+        tuple
+            (HTTP status code, bytes transferred, response)
+
+        """
+        partPath = path + '.part'
+        validatorPath = partPath + '.validator'
+        offset = os.path.getsize(partPath) if os.path.exists(partPath) else 0
+
+        requestHeaders = dict(headers or {})
+        if offset:
+            requestHeaders['Range'] = 'bytes=%d-' % offset
+            if os.path.exists(validatorPath):
+                with open(validatorPath) as f:
+                    requestHeaders['If-Range'] = f.read()
+
+        with self._host_semaphore(url):
+            with self.session.get(url, headers=requestHeaders, stream=True, timeout=self.timeout) as response:
+                status = response.status_code
+
+                if status == 416 and offset:
+                    #the part file holds the whole file only if it has the size of the remote file
+                    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                    if total == str(offset):
+                        os.replace(partPath, path)
+                        _discard(validatorPath)
+                        return 206, 0, response
+                    _discard(partPath, validatorPath)
+                elif status not in (200, 206):
+                    return status, 0, response
+                else:
+                    if status == 200:
+                        #a new download, only resume it while the remote file is the same version
+                        validator = _validator(response)
+                        if validator:
+                            with open(validatorPath, 'w') as f:
+                                f.write(validator)
+                        else:
+                            _discard(validatorPath)
+
+                    mode = 'ab' if status == 206 else 'wb'
+                    transferred = 0
+                    with open(partPath, mode) as f:
+                        for chunk in response.iter_content(chunk_size=common.downloadChunkSize):
+                            f.write(chunk)
+                            transferred += len(chunk)
+
+        #the remote file changed size since the part file was written, start over
+        if status == 416:
+            return self._fetch(url, path, headers)
+
+        #make sure the body was not cut short before publishing the file
+        expected = response.headers.get('Content-Length')
+        if expected is not None and transferred < int(expected):
+            raise requests.exceptions.ChunkedEncodingError('incomplete body for ' + url)
+
+        os.replace(partPath, path)
+        _discard(validatorPath)
+        return status, transferred, response
+
+    def download(self, url, path, headers=None):
+        """
+        Download a single url to a local file
+
+        Parameters
+        ----------
+        url : str
+            url to download
+        path : str
+            local file to write
+        headers : dict
+            extra request headers
+
+        Returns
+        -------
+        DownloadResult
+            outcome of the download
+
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        status = None
+        transferred = 0
+        error = None
+        responseHeaders = CaseInsensitiveDict()
+        for attempt in range(1, self.retries + 2):
+            try:
+                status, count, response = self._fetch(url, path, headers)
+                transferred += count
+                responseHeaders = CaseInsensitiveDict(response.headers)
+                if status in (200, 206, 304):
+                    return DownloadResult(url, path, True, status, transferred, attempt, None, responseHeaders)
+                error = 'HTTP %d' % status
+                if status not in RETRY_STATUS:
+                    break
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                error = str(e)
+
+            if attempt <= self.retries:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+
+        return DownloadResult(url, path, False, status, transferred, attempt, error, responseHeaders)
+
+    def download_all(self, jobs):
+        """
+        Download a list of urls concurrently
+
+        Parameters
+        ----------
+        jobs : list
+            (url, path) tuples to download
+
+        Returns
+        -------
+        DownloadResult[]
+            one result per job, in the same order as jobs
+
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(lambda job: self.download(job[0], job[1]), jobs))
+
+        if isinstance(self.session, EarthdataSession):
+            self.session.save_cookies()
+
+        return results
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def mirror_path(url, root):
+    """
+    Get the local path for a url, mirroring the layout of wget -x
+
+    Parameters
+    ----------
+    url : str
+        url of the file
+    root : str
+        directory the mirrored tree is rooted at
+
+    Returns
+    -------
+    str
+        ROOT/HOST/PATH for the url
+
+    """
+    parts = urlparse(url)
+    return os.path.join(root, parts.netloc, parts.path.lstrip('/'))
+
+
+def check_results(results):
+    """
+    Raise a DownloadError describing every failed download
+
+    Parameters
+    ----------
+    results : DownloadResult[]
+        results returned by Downloader.download_all
+
+    """
+    failed = [r for r in results if not r.ok]
+    if failed:
+        raise DownloadError('%d of %d downloads failed:\n' % (len(failed), len(results)) +
+                            '\n'.join(r.url + ': ' + str(r.error) for r in failed))
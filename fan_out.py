@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module runs the date range queries over the daily netCDF files in
+    parallel
+
+    The files of a range are split into blocks of common.queryBlockDays
+    days. Each block is reduced on its own, by a reducer (see reducers.py)
+    for the aggregate queries or by a RunTracker (see consecutive_days.py)
+    for the consecutive days queries, and the partial results are merged in
+    date order. All the variables of a query are reduced in the same pass,
+    each day file is opened once and each variable read once. The forecast
+    curve queries stack the reads of each block instead of reducing them.
+
+    The blocks do not depend on the number of workers, so every worker
+    count, including workers=1 which runs the blocks in the calling
+    process, performs the same operations and returns exactly the same
+    result.
+
+    The blocks are run in a process pool: netCDF4/HDF5 must not be called
+    from two threads at once, so threads would take turns on the reads.
+    Each worker process keeps its own dataset_pool of open files. The pool
+    is shared by the queries of the process and sized to the largest worker
+    count asked for, each query runs at most its own worker count of blocks
+    at a time. The workers are started by a forkserver (spawn where there
+    is none), forking a threaded process holding HDF5 handles is unsafe.
+
+    A range without files gives an empty result: no coordinates and no
+    values, masked values for a coordinate, or trackers with no days.
+
+ """
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+import multiprocessing
+import threading
+import numpy as np
+import common
+import consecutive_days
+import dataset_pool
+import grid_index
+import query_metrics
+import reducers
+
+_executor = None
+_executorWorkers = 0
+#number of run calls using each executor, a replaced executor is shut down once unused
+_users = {}
+_lock = threading.Lock()
+
+
+def _context():
+    #start the workers from a clean process rather than forking the caller
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+@contextmanager
+def _pool(workers):
+    #check out the shared executor, replaced by a larger one when a query asks for more workers
+    global _executor, _executorWorkers
+    with _lock:
+        if _executor is None or _executorWorkers < workers:
+            if _executor is not None and not _users.get(_executor):
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=_context())
+            _executorWorkers = workers
+        executor = _executor
+        _users[executor] = _users.get(executor, 0) + 1
+    try:
+        yield executor
+    finally:
+        with _lock:
+            _users[executor] -= 1
+            if not _users[executor]:
+                del _users[executor]
+                if executor is not _executor:
+                    executor.shutdown(wait=False)
+
+
+def _map(executor, workers, function, jobs):
+    #run the jobs with at most workers of them submitted at a time, results in the order of jobs
+    futures = []
+    pending = set()
+    for job in jobs:
+        if len(pending) >= workers:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        future = executor.submit(function, *job)
+        futures.append(future)
+        pending.add(future)
+    return [future.result() for future in futures]
+
+
+def blocks(file_name_list, size=None):
+    """
+    Split the files of a range into blocks
+
+    Parameters
+    ----------
+    file_name_list : str[]
+        daily netCDF filenames in date order
+    size : int
+        days per block, defaults to common.queryBlockDays
+
+    Returns
+    -------
+    tuple[]
+        (block index, index of the first day, filenames) for each block
+
+    """
+    if size is None:
+        size = common.queryBlockDays
+    return [(start // size, start, file_name_list[start:start + size])
+            for start in range(0, len(file_name_list), size)]
+
+
+def run(function, jobs, workers=None):
+    """
+    Call a function for every job, in worker processes if workers > 1
+
+    Parameters
+    ----------
+    function : function
+        module level function, called as function(*job)
+    jobs : tuple[]
+        arguments of each call
+    workers : int
+        number of worker processes, defaults to common.queryWorkers
+
+    Returns
+    -------
+    list
+        result of each call, in the order of jobs
+
+    """
+    if workers is None:
+        workers = common.queryWorkers
+    if workers <= 1 or len(jobs) <= 1:
+        return [function(*job) for job in jobs]
+    with _pool(workers) as executor:
+        if not query_metrics.active():
+            return _map(executor, workers, function, jobs)
+        measured = _map(executor, workers, _measured, [(function,) + tuple(job) for job in jobs])
+
+    #bring the measurements of the workers back to the report of the query
+    results = []
+    for result, report in measured:
+        query_metrics.merge(report)
+        results.append(result)
+    return results
+
+
+def _measured(function, *job):
+    with query_metrics.collect() as report:
+        result = function(*job)
+    return result, report
+
+
+def _merge(partials):
+    #fold the partial results into the first, in date order
+    merged = partials[0]
+    for partial in partials[1:]:
+        merged.merge(partial)
+    return merged
+
+
+def _read_rectangle(product, filename, variables, lat_bounds, lon_bounds):
+    with dataset_pool.checkout(filename) as ds:
+        #look up the index slices of the rectangle on the shared grid index
+        grid = grid_index.for_product(product, ds)
+        latslice, lonslice = grid.slices(lat_bounds, lon_bounds)
+        lats, lons = grid.coordinates(latslice, lonslice)
+
+        #grab the dataset for each variable name and the rectangle
+        with query_metrics.stage('read'):
+            dataSubsets = [ds.variables[variable][latslice, lonslice] for variable in variables]
+    for dataSubset in dataSubsets:
+        query_metrics.record_read(dataSubset)
+    return lats, lons, dataSubsets
+
+
+def _read_point(product, filename, variables, lat, lon, method, tolerance):
+    with dataset_pool.checkout(filename) as ds:
+        #read the value at the grid cell nearest to the coordinate, or interpolate it
+        return [grid_index.read_point(ds, product, variable, lat, lon, method, tolerance) for variable in variables]
+
+
+def _reduce_rectangle(product, block, offset, filenames, variables, aggregatefunctions, lat_bounds, lon_bounds):
+    reducerList = None
+    for filename in filenames:
+        lats, lons, dataSubsets = _read_rectangle(product, filename, variables, lat_bounds, lon_bounds)
+        if reducerList is None:
+            reducerList = [reducers.create(aggregatefunction, dataSubset.shape, block)
+                           for aggregatefunction, dataSubset in zip(aggregatefunctions, dataSubsets)]
+        with query_metrics.stage('reduce'):
+            for reducer, dataSubset in zip(reducerList, dataSubsets):
+                reducer.update(dataSubset)
+    return lats, lons, reducerList
+
+
+def _reduce_point(product, block, offset, filenames, variables, aggregatefunctions, lat, lon, method, tolerance):
+    reducerList = [reducers.create(aggregatefunction, (), block) for aggregatefunction in aggregatefunctions]
+    for filename in filenames:
+        values = _read_point(product, filename, variables, lat, lon, method, tolerance)
+        with query_metrics.stage('reduce'):
+            for reducer, value in zip(reducerList, values):
+                reducer.update(value)
+    return reducerList
+
+
+def _track_rectangle(product, block, offset, filenames, variables, aggregatefunctions, lat_bounds, lon_bounds):
+    trackers = None
+    for filename in filenames:
+        lats, lons, dataSubsets = _read_rectangle(product, filename, variables, lat_bounds, lon_bounds)
+        if trackers is None:
+            trackers = [consecutive_days.RunTracker(dataSubset.shape, offset) for dataSubset in dataSubsets]
+        with query_metrics.stage('reduce'):
+            for tracker, aggregatefunction, dataSubset in zip(trackers, aggregatefunctions, dataSubsets):
+                tracker.update(*consecutive_days.qualifying(dataSubset, aggregatefunction))
+    return lats, lons, trackers
+
+
+def _track_point(product, block, offset, filenames, variables, aggregatefunctions, lat, lon, method, tolerance):
+    trackers = [consecutive_days.RunTracker((), offset) for aggregatefunction in aggregatefunctions]
+    for filename in filenames:
+        values = _read_point(product, filename, variables, lat, lon, method, tolerance)
+        with query_metrics.stage('reduce'):
+            for tracker, aggregatefunction, dataSubset in zip(trackers, aggregatefunctions, values):
+                tracker.update(*consecutive_days.qualifying(np.ma.asarray(dataSubset), aggregatefunction))
+    return trackers
+
+
+def _stack_rectangle(product, block, offset, filenames, variables, lat_bounds, lon_bounds):
+    leads = [_read_rectangle(product, filename, variables, lat_bounds, lon_bounds) for filename in filenames]
+    lats, lons = leads[0][:2]
+    return lats, lons, [np.ma.stack([dataSubsets[k] for lats, lons, dataSubsets in leads]) for k in range(len(variables))]
+
+
+def _stack_points(block, offset, filenames, variables, latindex, lonindex):
+    leads = []
+    for filename in filenames:
+        with dataset_pool.checkout(filename) as ds:
+            #gather all coordinates from a single read of each variable
+            leads.append([grid_index.read_points(ds, variable, latindex, lonindex) for variable in variables])
+    return [np.ma.stack([values[k] for values in leads]) for k in range(len(variables))]
+
+
+def _empty_rectangle(variables, shape):
+    #result of a range without files, no coordinates and no values
+    return np.empty(0), np.empty(0), [np.ma.masked_all(shape, dtype=np.float32) for variable in variables]
+
+
+def _merge_each(partials):
+    #merge the partial results of each variable
+    with query_metrics.stage('reduce'):
+        return [_merge(variablePartials) for variablePartials in zip(*partials)]
+
+
+def aggregate_rectangle(product, file_name_list, variables, aggregatefunctions, lat_bounds, lon_bounds, workers=None):
+    """
+    Aggregate variables over a rectangle and the days of a list of files
+
+    Each file is opened once and each variable read once per day.
+
+    Parameters
+    ----------
+    product : str
+        NLDAS or GFS
+    file_name_list : str[]
+        daily netCDF filenames in date order
+    variables : str[]
+        variables to query from the netCDF files
+    aggregatefunctions : str[]
+        aggregate function of each variable, see reducers.py
+    lat_bounds : float[]
+        lower and upper bounds for lat
+    lon_bounds : float[]
+        lower and upper bounds for lon
+    workers : int
+        number of worker processes, defaults to common.queryWorkers
+
+    Returns
+    -------
+    tuple
+        (lats, lons, MaskedArray of results of each variable)
+
+    """
+    if not file_name_list:
+        return _empty_rectangle(variables, (0, 0))
+    jobs = [(product, block, offset, filenames, variables, aggregatefunctions, lat_bounds, lon_bounds)
+            for block, offset, filenames in blocks(file_name_list)]
+    partials = run(_reduce_rectangle, jobs, workers)
+    lats, lons = partials[0][:2]
+    return lats, lons, [reducer.result() for reducer in _merge_each([reducerList for lats, lons, reducerList in partials])]
+
+
+def aggregate_point(product, file_name_list, variables, aggregatefunctions, lat, lon, method='nearest', tolerance=None, workers=None):
+    """
+    Aggregate variables at a coordinate over the days of a list of files
+
+    Parameters
+    ----------
+    product : str
+        NLDAS or GFS
+    file_name_list : str[]
+        daily netCDF filenames in date order
+    variables : str[]
+        variables to query from the netCDF files
+    aggregatefunctions : str[]
+        aggregate function of each variable, see reducers.py
+    lat : float
+        latitude of the coordinate
+    lon : float
+        longitude of the coordinate
+    method : str
+        nearest or bilinear, see grid_index.read_point
+    tolerance : float
+        max distance in degrees from the nearest grid cell
+    workers : int
+        number of worker processes, defaults to common.queryWorkers
+
+    Returns
+    -------
+    float[]
+        result of each variable for the coordinate
+
+    """
+    if not file_name_list:
+        return [np.ma.masked for variable in variables]
+    jobs = [(product, block, offset, filenames, variables, aggregatefunctions, lat, lon, method, tolerance)
+            for block, offset, filenames in blocks(file_name_list)]
+    return [reducer.result()[()] for reducer in _merge_each(run(_reduce_point, jobs, workers))]
+
+
+def track_rectangle(product, file_name_list, variables, aggregatefunctions, lat_bounds, lon_bounds, workers=None):
+    """
+    Track the consecutive day runs of every cell of a rectangle
+
+    Parameters
+    ----------
+    product : str
+        NLDAS or GFS
+    file_name_list : str[]
+        daily netCDF filenames in date order
+    variables : str[]
+        variables to query from the netCDF files
+    aggregatefunctions : str[]
+        consecutive days function of each variable, see
+        consecutive_days.qualifying
+    lat_bounds : float[]
+        lower and upper bounds for lat
+    lon_bounds : float[]
+        lower and upper bounds for lon
+    workers : int
+        number of worker processes, defaults to common.queryWorkers
+
+    Returns
+    -------
+    tuple
+        (lats, lons, RunTracker over all the days of each variable)
+
+    """
+    if not file_name_list:
+        return np.empty(0), np.empty(0), [consecutive_days.RunTracker((0, 0)) for variable in variables]
+    jobs = [(product, block, offset, filenames, variables, aggregatefunctions, lat_bounds, lon_bounds)
+            for block, offset, filenames in blocks(file_name_list)]
+    partials = run(_track_rectangle, jobs, workers)
+    lats, lons = partials[0][:2]
+    return lats, lons, _merge_each([trackers for lats, lons, trackers in partials])
+
+
+def track_point(product, file_name_list, variables, aggregatefunctions, lat, lon, method='nearest', tolerance=None, workers=None):
+    """
+    Track the consecutive day runs at a coordinate
+
+    Parameters
+    ----------
+    product : str
+        NLDAS or GFS
+    file_name_list : str[]
+        daily netCDF filenames in date order
+    variables : str[]
+        variables to query from the netCDF files
+    aggregatefunctions : str[]
+        consecutive days function of each variable, see
+        consecutive_days.qualifying
+    lat : float
+        latitude of the coordinate
+    lon : float
+        longitude of the coordinate
+    method : str
+        nearest or bilinear, see grid_index.read_point
+    tolerance : float
+        max distance in degrees from the nearest grid cell
+    workers : int
+        number of worker processes, defaults to common.queryWorkers
+
+    Returns
+    -------
+    RunTracker[]
+        tracker over all the days of each variable
+
+    """
+    if not file_name_list:
+        return [consecutive_days.RunTracker(()) for variable in variables]
+    jobs = [(product, block, offset, filenames, variables, aggregatefunctions, lat, lon, method, tolerance)
+            for block, offset, filenames in blocks(file_name_list)]
+    return _merge_each(run(_track_point, jobs, workers))
+
+
+def stack_rectangle(product, file_name_list, variables, lat_bounds, lon_bounds, workers=None):
+    """
+    Read variables over a rectangle from every file of a list
+
+    Parameters
+    ----------
+    product : str
+        NLDAS or GFS
+    file_name_list : str[]
+        netCDF filenames in order
+    variables : str[]
+        variables to query from the netCDF files
+    lat_bounds : float[]
+        lower and upper bounds for lat
+    lon_bounds : float[]
+        lower and upper bounds for lon
+    workers : int
+        number of worker processes, defaults to common.queryWorkers
+
+    Returns
+    -------
+    tuple
+        (lats, lons, (files x lat x lon) MaskedArray of each variable)
+
+    """
+    if not file_name_list:
+        return _empty_rectangle(variables, (0, 0, 0))
+    jobs = [(product, block, offset, filenames, variables, lat_bounds, lon_bounds)
+            for block, offset, filenames in blocks(file_name_list)]
+    partials = run(_stack_rectangle, jobs, workers)
+    lats, lons = partials[0][:2]
+    return lats, lons, [np.ma.concatenate(values) for values in zip(*[stacked for lats, lons, stacked in partials])]
+
+
+def stack_points(product, file_name_list, variables, lats, lons, tolerance=None, workers=None):
+    """
+    Read variables at many coordinates from every file of a list
+
+    The coordinates are snapped to their nearest grid cells once, then
+    each file is read once per variable for all of them.
+
+    Parameters
+    ----------
+    product : str
+        NLDAS or GFS
+    file_name_list : str[]
+        netCDF filenames in order
+    variables : str[]
+        variables to query from the netCDF files
+    lats : float[]
+        latitude of each coordinate
+    lons : float[]
+        longitude of each coordinate
+    tolerance : float
+        max distance in degrees from the nearest grid cell
+    workers : int
+        number of worker processes, defaults to common.queryWorkers
+
+    Returns
+    -------
+    MaskedArray[]
+        (files x coordinates) array of each variable
+
+    """
+    if not file_name_list:
+        return [np.ma.masked_all((0, len(lats)), dtype=np.float32) for variable in variables]
+    with dataset_pool.checkout(file_name_list[0]) as ds:
+        grid = grid_index.for_product(product, ds)
+    latindex, lonindex, snappedLats, snappedLons = grid.locate(lats, lons, tolerance)
+    return stack_cells([(file_name_list, variables, latindex, lonindex)], workers)[0]
+
+
+def stack_cells(requests, workers=None):
+    """
+    Read variables at grid cells from every file of several lists
+
+    The blocks of every list are run together, so files of different
+    products are read at the same time.
+
+    Parameters
+    ----------
+    requests : tuple[]
+        (filenames, variables, lat index of each cell, lon index of each
+        cell) of each list
+    workers : int
+        number of worker processes, defaults to common.queryWorkers
+
+    Returns
+    -------
+    list
+        for each request, the (files x cells) MaskedArray of each variable
+
+    """
+    jobs = []
+    owners = []
+    for k, (file_name_list, variables, latindex, lonindex) in enumerate(requests):
+        for block, offset, filenames in blocks(file_name_list):
+            jobs.append((block, offset, filenames, variables, latindex, lonindex))
+            owners.append(k)
+    partials = run(_stack_points, jobs, workers)
+
+    results = []
+    for k, (file_name_list, variables, latindex, lonindex) in enumerate(requests):
+        own = [partial for partial, owner in zip(partials, owners) if owner == k]
+        if own:
+            results.append([np.ma.concatenate(values) for values in zip(*own)])
+        else:
+            results.append([np.ma.masked_all((0, len(latindex)), dtype=np.float32) for variable in variables])
+    return results
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module contains the GridIndex used by the query modules to turn
+    lat/lon bounds into array indices
+
+    NLDAS (0.125 degree) and GFS (0.5 degree) are both regular grids, so the
+    nearest index of a coordinate is computed with grid arithmetic instead
+    of searching the coordinate arrays. The index for a product is built
+    once, from the coordinate variables of the first file queried, and is
+    shared by every query afterwards.
+
+    GFS longitudes are stored as 0 to 359.5 and are reported as -180 to 180
+    like the query modules always have, so the GFS longitude axis wraps.
+
+    Single coordinates are snapped to the nearest grid cell within a
+    tolerance (half a grid cell by default) or interpolated bilinearly from
+    the four surrounding cells.
+
+ """
+
+import threading
+import numpy as np
+import query_metrics
+
+#coordinate variable names and whether the longitude axis wraps for each product
+PRODUCTS = {'NLDAS': ('lat_110', 'lon_110', False),
+            'GFS': ('lat_0', 'lon_0', True)}
+
+
+class Axis:
+    """
+    A coordinate axis with O(1) nearest-index lookups
+
+    Parameters
+    ----------
+    values : ndarray
+        coordinate values along the axis
+    period : float
+        period of the axis (360 for a wrapping longitude axis), None if the
+        axis does not wrap
+
+    """
+
+    def __init__(self, values, period=None):
+        self.values = np.asarray(values)
+        self.size = len(self.values)
+        self.period = period
+        self.start = float(self.values[0])
+        self.step = float(self.values[1] - self.values[0]) if self.size > 1 else 1.0
+
+        #fall back to searching the values if the axis is not regular
+        expected = self.start + self.step * np.arange(self.size)
+        if period is not None:
+            expected = np.mod(expected - self.start, period) + self.start
+            actual = np.mod(self.values - self.start, period) + self.start
+        else:
+            actual = self.values
+        self.regular = self.size > 1 and np.allclose(actual, expected, rtol=0, atol=abs(self.step) * 1e-3)
+
+    def position(self, coord):
+        """
+        Get the fractional index of a coordinate
+
+        Parameters
+        ----------
+        coord : float or ndarray
+            coordinate(s) in the units of the axis
+
+        Returns
+        -------
+        float or ndarray
+            fractional index, not clipped to the axis
+
+        """
+        if not self.regular:
+            #interpolate the index between the stored coordinates
+            index = np.arange(self.size, dtype=np.float64)
+            if self.step < 0:
+                return np.interp(coord, self.values[::-1], index[::-1])
+            return np.interp(coord, self.values, index)
+
+        offset = np.asarray(coord, dtype=np.float64) - self.start
+        if self.period is not None:
+            offset = np.mod(offset, self.period)
+        return offset / self.step
+
+    def distance(self, coord, index):
+        """
+        Get the distance between a coordinate and a grid point
+
+        Parameters
+        ----------
+        coord : float or ndarray
+            coordinate(s) in the units of the axis
+        index : int or ndarray
+            index of the grid point(s)
+
+        Returns
+        -------
+        float or ndarray
+            absolute distance, measured around the axis if it wraps
+
+        """
+        distance = np.abs(np.asarray(coord, dtype=np.float64) - self.values[index])
+        if self.period is not None:
+            distance = np.minimum(distance, self.period - np.mod(distance, self.period))
+        return distance
+
+    def nearest(self, coord):
+        """
+        Get the index of the grid point nearest to a coordinate
+
+        Parameters
+        ----------
+        coord : float or ndarray
+            coordinate(s) in the units of the axis
+
+        Returns
+        -------
+        int or ndarray
+            index of the nearest grid point, clipped to the axis
+
+        """
+        if not self.regular:
+            coord = np.asarray(coord, dtype=np.float64)
+            index = np.argmin(np.abs(self.values[np.newaxis, :] - coord.reshape(-1, 1)), axis=1)
+            return index.reshape(coord.shape)[()]
+
+        #ties go to the lower index, the same as np.argmin on the values
+        index = np.ceil(self.position(coord) - 0.5).astype(np.int64)
+        if self.period is not None:
+            return np.mod(index, self.size)[()]
+        return np.clip(index, 0, self.size - 1)[()]
+
+
+class GridIndex:
+    """
+    Index of a regular lat/lon grid
+
+    Parameters
+    ----------
+    lats : ndarray
+        latitudes of the grid
+    lons : ndarray
+        longitudes of the grid
+    wrap_lon : bool
+        True if the longitude axis covers the whole globe (GFS)
+
+    """
+
+    def __init__(self, lats, lons, wrap_lon=False):
+        self.lats = np.ma.getdata(lats)
+        lons = np.ma.getdata(lons)
+        if wrap_lon:
+            lons = np.mod(lons - 180.0, 360.0) - 180.0
+        self.lons = lons
+        self.latAxis = Axis(self.lats)
+        self.lonAxis = Axis(np.ma.getdata(lons), 360.0 if wrap_lon else None)
+
+    def slices(self, lat_bounds, lon_bounds):
+        """
+        Get the index slices covering a lat/lon rectangle
+
+        The lower and upper bounds are snapped to the nearest grid point and
+        the upper grid point is excluded, as the queries have always done.
+
+        Parameters
+        ----------
+        lat_bounds : float[]
+            lower and upper bounds for lat
+        lon_bounds : float[]
+            lower and upper bounds for lon
+
+        Returns
+        -------
+        tuple
+            (lat slice, lon slice)
+
+        """
+        with query_metrics.stage('index'):
+            latlowerindex = int(self.latAxis.nearest(lat_bounds[0]))
+            latupperindex = int(self.latAxis.nearest(lat_bounds[1]))
+            #latitudes can be stored north to south (GFS)
+            if latupperindex < latlowerindex:
+                latlowerindex, latupperindex = latupperindex, latlowerindex
+
+            lonlowerindex = int(self.lonAxis.nearest(lon_bounds[0]))
+            lonupperindex = int(self.lonAxis.nearest(lon_bounds[1]))
+
+        return slice(latlowerindex, latupperindex), slice(lonlowerindex, lonupperindex)
+
+    def locate(self, lat, lon, tolerance=None):
+        """
+        Snap coordinates to the nearest grid cell
+
+        Parameters
+        ----------
+        lat : float or ndarray
+            latitude(s) to snap
+        lon : float or ndarray
+            longitude(s) to snap
+        tolerance : float
+            max distance in degrees along each axis between a coordinate and
+            its grid cell, None for half a grid cell
+
+        Returns
+        -------
+        tuple
+            (lat index, lon index, snapped lat, snapped lon)
+
+        Raises
+        ------
+        ValueError
+            if a coordinate is further than tolerance from every grid cell
+
+        """
+        with query_metrics.stage('index'):
+            latindex = self.latAxis.nearest(lat)
+            lonindex = self.lonAxis.nearest(lon)
+
+        latTolerance = abs(self.latAxis.step) / 2 if tolerance is None else tolerance
+        lonTolerance = abs(self.lonAxis.step) / 2 if tolerance is None else tolerance
+        #allow for float32 rounding of the stored coordinates
+        outside = ((self.latAxis.distance(lat, latindex) > latTolerance + 1e-4) |
+                   (self.lonAxis.distance(lon, lonindex) > lonTolerance + 1e-4))
+        if np.any(outside):
+            raise ValueError('%d coordinate(s) not within tolerance of a grid cell, first is (%s, %s)' %
+                             (np.count_nonzero(outside), np.ravel(lat)[np.argmax(np.ravel(outside))],
+                              np.ravel(lon)[np.argmax(np.ravel(outside))]))
+
+        return latindex, lonindex, self.lats[latindex][()], self.lons[lonindex][()]
+
+    def bilinear(self, lat, lon, tolerance=None):
+        """
+        Get the cells and weights for bilinear interpolation at a coordinate
+
+        Parameters
+        ----------
+        lat : float
+            latitude to interpolate at
+        lon : float
+            longitude to interpolate at
+        tolerance : float
+            max distance in degrees from the nearest grid cell, see locate
+
+        Returns
+        -------
+        tuple
+            (lat indices, lon indices, weights) where the indices are the two
+            surrounding rows and columns and weights is a 2x2 array
+
+        """
+        self.locate(lat, lon, tolerance)
+
+        t = float(self.latAxis.position(lat))
+        latlowerindex = int(np.clip(np.floor(t), 0, self.latAxis.size - 2))
+        latfraction = float(np.clip(t - latlowerindex, 0.0, 1.0))
+        latindices = [latlowerindex, latlowerindex + 1]
+
+        u = float(self.lonAxis.position(lon))
+        if self.lonAxis.period is not None and self.lonAxis.regular:
+            lonlowerindex = int(np.floor(u)) % self.lonAxis.size
+            lonfraction = u - np.floor(u)
+            lonindices = [lonlowerindex, (lonlowerindex + 1) % self.lonAxis.size]
+        else:
+            lonlowerindex = int(np.clip(np.floor(u), 0, self.lonAxis.size - 2))
+            lonfraction = float(np.clip(u - lonlowerindex, 0.0, 1.0))
+            lonindices = [lonlowerindex, lonlowerindex + 1]
+
+        weights = np.outer([1.0 - latfraction, latfraction], [1.0 - lonfraction, lonfraction])
+        return latindices, lonindices, weights
+
+    def coordinates(self, latslice, lonslice):
+        """
+        Get the coordinates covered by a pair of slices
+
+        Parameters
+        ----------
+        latslice : slice
+            lat index slice
+        lonslice : slice
+            lon index slice
+
+        Returns
+        -------
+        tuple
+            (lats, lons) as views of the grid coordinate arrays
+
+        """
+        return self.lats[latslice], self.lons[lonslice]
+
+
+_grids = {}
+_lock = threading.Lock()
+
+
+def for_product(product, ds):
+    """
+    Get the shared GridIndex of a product
+
+    The index is built from the coordinate variables of ds the first time
+    it is requested and reused afterwards.
+
+    Parameters
+    ----------
+    product : str
+        NLDAS or GFS
+    ds : Dataset
+        open netCDF file of the product
+
+    Returns
+    -------
+    GridIndex
+        index of the product grid
+
+    """
+    grid = _grids.get(product)
+    if grid is None:
+        latName, lonName, wrapLon = PRODUCTS[product]
+        with _lock:
+            grid = _grids.get(product)
+            if grid is None:
+                with query_metrics.stage('coordinates'):
+                    grid = GridIndex(ds.variables[latName][:], ds.variables[lonName][:], wrapLon)
+                _grids[product] = grid
+    return grid
+
+
+def read_point(ds, product, variable, lat, lon, method='nearest', tolerance=None):
+    """
+    Read the value of a variable at a single coordinate
+
+    Parameters
+    ----------
+    ds : Dataset
+        open netCDF file of the product
+    product : str
+        NLDAS or GFS
+    variable : str
+        variable to read
+    lat : float
+        latitude of the coordinate
+    lon : float
+        longitude of the coordinate
+    method : str
+        nearest to read the nearest grid cell, bilinear to interpolate from
+        the four surrounding cells
+    tolerance : float
+        max distance in degrees from the nearest grid cell, see GridIndex.locate
+
+    Returns
+    -------
+    float
+        value at the coordinate, masked if no valid cell contributes
+
+    """
+    grid = for_product(product, ds)
+    if method == 'nearest':
+        latindex, lonindex, snappedLat, snappedLon = grid.locate(lat, lon, tolerance)
+        with query_metrics.stage('read'):
+            value = ds.variables[variable][latindex, lonindex]
+        query_metrics.record_read(value)
+        return value
+    if method != 'bilinear':
+        raise ValueError('unknown point lookup method: ' + str(method))
+
+    latindices, lonindices, weights = grid.bilinear(lat, lon, tolerance)
+    #netCDF4 reads need increasing indices, the wrapped GFS column pair is reordered afterwards
+    order = np.argsort(lonindices)
+    with query_metrics.stage('read'):
+        cells = ds.variables[variable][latindices[0]:latindices[1] + 1, sorted(lonindices)]
+    query_metrics.record_read(cells)
+    cells = np.ma.masked_invalid(cells)[:, np.argsort(order)]
+
+    #cells without data do not contribute, the remaining weights are renormalised
+    valid = ~np.ma.getmaskarray(cells)
+    total = weights[valid].sum()
+    if total == 0:
+        return np.ma.masked
+    return float((np.ma.getdata(cells)[valid] * weights[valid]).sum() / total)
+
+
+def read_points(ds, variable, latindex, lonindex):
+    """
+    Read the values of a variable at many grid cells with one read
+
+    Only the hyperslab bounding the cells is read from the file, the cells
+    are then gathered from it with fancy indexing.
+
+    Parameters
+    ----------
+    ds : Dataset
+        open netCDF file
+    variable : str
+        variable to read
+    latindex : ndarray
+        lat index of each cell
+    lonindex : ndarray
+        lon index of each cell
+
+    Returns
+    -------
+    MaskedArray
+        one value per cell
+
+    """
+    latlowerindex, latupperindex = int(latindex.min()), int(latindex.max()) + 1
+    lonlowerindex, lonupperindex = int(lonindex.min()), int(lonindex.max()) + 1
+    with query_metrics.stage('read'):
+        block = ds.variables[variable][latlowerindex:latupperindex, lonlowerindex:lonupperindex]
+    query_metrics.record_read(block)
+    return np.ma.asarray(block)[latindex - latlowerindex, lonindex - lonlowerindex]
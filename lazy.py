@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module contains the lazy results returned by the rectangle and
+    region queries
+
+    A LazyResult records a query (a QueryEngine method and its QuerySpec)
+    and the operations chained on it, and only runs the query when the
+    result is used. Operations that narrow what is read are pushed down
+    into the QuerySpec, so they shrink the netCDF reads:
+        crop(lat_bounds, lon_bounds)    read a smaller rectangle
+        select(variables)               read fewer variables
+
+    The other operations are applied to the values once they are read:
+        where(function)                 apply a function to the values
+        threshold(value)                True where the values are above value
+        reduce(statistic)               reduce the cells to one value
+
+    A LazyResult acts like the list the query returns ([lats, lons, values]),
+    indexing, unpacking, len() or printing materialize it, and compute()
+    returns the list itself. The result is materialized once and kept.
+
+    Usage:
+        result = query_NLDAS.queryAggregateDateRangeRectangle(start, end, 'MAX_TMP_110_HTGL', 'avg', [25, 50], [-125, -65])
+        hot = result.crop([30, 33], [-100, -96]).threshold(300)
+        lats, lons, values = hot
+
+ """
+
+from collections.abc import Sequence
+import copy
+import numpy as np
+
+
+class LazyResult(Sequence):
+    """
+    A query result that is computed when it is first used
+
+    Parameters
+    ----------
+    engine : QueryEngine
+        engine running the query
+    kind : str
+        name of the engine method, read or aggregate
+    spec : QuerySpec
+        query over a rectangle or region
+    steps : tuple
+        functions applied in order to the values of each variable
+
+    """
+
+    def __init__(self, engine, kind, spec, steps=()):
+        self.engine = engine
+        self.kind = kind
+        self.spec = spec
+        self.steps = tuple(steps)
+        self._result = None
+
+    def _derive(self, spec=None, step=None):
+        steps = self.steps if step is None else self.steps + (step,)
+        return LazyResult(self.engine, self.kind, self.spec if spec is None else spec, steps)
+
+    def crop(self, lat_bounds, lon_bounds):
+        """
+        Narrow the rectangle of the query
+
+        The bounds are intersected with the bounds of the query, the result
+        is the same as querying the intersection.
+
+        Parameters
+        ----------
+        lat_bounds : float[]
+            lower and upper bounds for lat
+        lon_bounds : float[]
+            lower and upper bounds for lon
+
+        Returns
+        -------
+        LazyResult
+            result over the cropped rectangle
+
+        """
+        if self.spec.region is not None or not self.spec.rectangle:
+            raise ValueError('crop needs a rectangle query')
+        if self.steps:
+            raise ValueError('crop before applying operations to the values')
+        spec = copy.copy(self.spec)
+        spec.lat_bounds = [max(min(self.spec.lat_bounds), min(lat_bounds)), min(max(self.spec.lat_bounds), max(lat_bounds))]
+        spec.lon_bounds = [max(min(self.spec.lon_bounds), min(lon_bounds)), min(max(self.spec.lon_bounds), max(lon_bounds))]
+        #reversed bounds would be read as a north to south rectangle by GridIndex.slices
+        if spec.lat_bounds[0] > spec.lat_bounds[1] or spec.lon_bounds[0] > spec.lon_bounds[1]:
+            raise ValueError('crop does not overlap the rectangle of the query')
+        return self._derive(spec)
+
+    def select(self, variables):
+        """
+        Keep only some of the variables of the query
+
+        Parameters
+        ----------
+        variables : str or str[]
+            variable, or list of variables, of the query to keep
+
+        Returns
+        -------
+        LazyResult
+            result of those variables, a single variable gives the values
+            rather than a dict
+
+        """
+        keep = [variables] if isinstance(variables, str) else list(variables)
+        missing = [variable for variable in keep if variable not in self.spec.variables]
+        if missing:
+            raise ValueError('variables not in the query: ' + ', '.join(missing))
+        functions = dict(zip(self.spec.variables, self.spec.functions))
+        spec = copy.copy(self.spec)
+        spec.variable = variables if isinstance(variables, str) else keep
+        if self.spec.function is not None and not isinstance(self.spec.function, str):
+            spec.function = functions[variables] if isinstance(variables, str) else [functions[v] for v in keep]
+        return self._derive(spec)
+
+    def where(self, function):
+        """
+        Apply a function to the values
+
+        Parameters
+        ----------
+        function : function
+            called with the MaskedArray of values of each variable
+
+        Returns
+        -------
+        LazyResult
+            result with the function applied
+
+        """
+        return self._derive(step=function)
+
+    def threshold(self, value, above=True):
+        """
+        Compare the values with a threshold
+
+        Parameters
+        ----------
+        value : float
+            threshold
+        above : bool
+            True for values above the threshold, False for values below it
+
+        Returns
+        -------
+        LazyResult
+            MaskedArray of booleans, masked where the values are masked
+
+        """
+        return self.where(lambda values: values > value if above else values < value)
+
+    def reduce(self, statistic):
+        """
+        Reduce the cells of the values to a single value
+
+        Parameters
+        ----------
+        statistic : str
+            mean, min, max, sum or count of the valid cells
+
+        Returns
+        -------
+        LazyResult
+            result with one value in place of the values
+
+        """
+        if statistic not in ('mean', 'min', 'max', 'sum', 'count'):
+            raise ValueError('unknown statistic: ' + str(statistic))
+        return self.where(lambda values: getattr(np.ma.asarray(values), statistic)())
+
+    def compute(self):
+        """
+        Run the query and apply the operations
+
+        Returns
+        -------
+        list
+            [lats, lons, values] as returned by the query, with a dict of
+            values by variable for a list of variables
+
+        """
+        if self._result is None:
+            returnLatTuple, returnLonTuple, values = getattr(self.engine, self.kind)(self.spec)
+            for step in self.steps:
+                values = {variable: step(value) for variable, value in values.items()} if self.spec.multiple else step(values)
+            self._result = [returnLatTuple, returnLonTuple, values]
+        return self._result
+
+    def __getitem__(self, index):
+        return self.compute()[index]
+
+    def __len__(self):
+        return len(self.compute())
+
+    def __repr__(self):
+        return repr(self.compute())
+
+
+def query(engine, kind, spec):
+    """
+    Get the lazy result of a rectangle or region query
+
+    Region statistics are small and are computed right away.
+
+    Parameters
+    ----------
+    engine : QueryEngine
+        engine running the query
+    kind : str
+        name of the engine method, read or aggregate
+    spec : QuerySpec
+        query over a rectangle or region
+
+    Returns
+    -------
+    LazyResult or dict
+        lazy [lats, lons, values], or the statistics of a region
+
+    """
+    if spec.statistics:
+        return getattr(engine, kind)(spec)
+    return LazyResult(engine, kind, spec)
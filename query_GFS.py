@@ -12,6 +12,9 @@
 
     Each function has a docstring describing the query it performs
 
+    The queries are run by the shared query_engine module, each function
+    describes its query with a QuerySpec
+
     variables included in the NLDAS netCDF file:
         Name                        Description                             Units
         APCP_P8_L1_GLL0_acc6h       Total Precipitation                     kg/m^2
@@ -31,12 +34,14 @@
 
  """
 
-from datetime import date, timedelta
-import os
-import numpy as np
-from netCDF4 import Dataset
-from pyeto import convert
-import common
+from datetime import date
+import lazy
+import query_engine
+import zonal_stats
+
+#engine running every query against the GFS files
+_engine = query_engine.QueryEngine(query_engine.GFS)
+
 
 def getfilename(querydate, forecastinterval):
     """
@@ -57,17 +62,7 @@ def getfilename(querydate, forecastinterval):
         GFS netCDF filename
 
     """
-    fullPath = os.path.dirname(os.path.abspath(__file__)) + common.netCDFpath
-
-    #split out the parts of the year
-    year = ("{date.year:04}".format(date=querydate))
-    month = ("{date.month:02}".format(date=querydate))
-    day = ("{date.day:02}".format(date=querydate))
-    hour = str(forecastinterval).zfill(3)
-
-    fileName = fullPath + "GFS_" + year + month + day + "_" + hour + ".nc"
-
-    return fileName
+    return query_engine.GFS.filename(querydate, forecastinterval)
 
 
 def getfilenames(querydate, days):
@@ -89,20 +84,37 @@ def getfilenames(querydate, days):
         an array of GFS netCDF filenames
 
     """
-    file_name_list = []
-    fullPath = os.path.dirname(os.path.abspath(__file__)) + common.netCDFpath
+    return query_engine.GFS.files(query_engine.QuerySpec(None, querydate, days=days))[0]
+
 
-    #split out the parts of the year
-    year = ("{date.year:04}".format(date=querydate))
-    month = ("{date.month:02}".format(date=querydate))
-    day = ("{date.day:02}".format(date=querydate))
+def locateCoordinate(querydate, forecastinterval, lat, lon, tolerance=None):
+    """
+    Find the GFS grid cell a coordinate snaps to
 
-    for i in range(1, days):
-        hour = str(i * 24).zfill(3)
-        fileName = fullPath + "GFS_" + year + month + day + "_" + hour + ".nc"
-        file_name_list.append(fileName)
+    will return the indices and coordinates of the grid cell the single
+    coordinate queries read for the supplied lat/lon
+
+    Parameters
+    ----------
+    querydate : date
+        date of a file to read the grid from
+    forecastinterval : int
+        forecast interval of a file to read the grid from
+    lat : int
+        lat in radians
+    lon : int
+        lon in radians
+    tolerance : float
+        max distance in degrees between lat/lon and the nearest grid cell,
+        None for half a grid cell
 
-    return file_name_list
+    Returns
+    -------
+    tuple
+        (lat index, lon index, snapped lat, snapped lon)
+
+    """
+    return _engine.locate(query_engine.QuerySpec(None, querydate, forecastinterval=forecastinterval, lat=lat, lon=lon, tolerance=tolerance))
 
 
 def querySingleDateRectangle(querydate, forecastinterval, variable, lat_bounds, lon_bounds):
@@ -117,8 +129,9 @@ def querySingleDateRectangle(querydate, forecastinterval, variable, lat_bounds,
         date to query
     forecastinterval : int
         number of hours in the future to forecast
-    variable : str
-        variable to query from the netCDF file
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
     lat_bounds : int[]
         an array with to variables to represent the lower and upper bounds
         for lat in radians
@@ -128,53 +141,19 @@ def querySingleDateRectangle(querydate, forecastinterval, variable, lat_bounds,
 
     Returns
     -------
-    tuple[]
-        0 index is a tuple of lats included in the query
-        1 index is a tuple of lons included in the query
+    LazyResult
+        acts as a tuple[], computed when first used (see lazy.py)
+        0 index is an array of lats included in the query
+        1 index is an array of lons included in the query
         2 index is a tuple of numeric results
 
     """
-    ds = Dataset(getfilename(querydate, forecastinterval))
-    returnTuple = []
-
-    #grab the lat and lon variable arrays
-    lats = ds.variables['lat_0'][:]
-    lons = ds.variables['lon_0'][:]
-    lons = np.mod(lons - 180.0, 360.0) - 180.0
-
-
-    #calculate the lower and upper indicies of the lat array
-    latlowerindex = np.argmin(np.abs(lats - lat_bounds[0]))
-    latupperindex = np.argmin(np.abs(lats - lat_bounds[1]))
-    if latupperindex<latlowerindex:
-        latlowerindex, latupperindex = latupperindex, latlowerindex
-
-    #calculate the lower and upper indices of the lon array
-    lonlowerindex = np.argmin(np.abs(lons - lon_bounds[0]))
-    lonupperindex = np.argmin(np.abs(lons - lon_bounds[1]))
-
-    #populate the tuple of lats included in the query
-    returnLatTuple = []
-    for i in range(latlowerindex, latupperindex):
-        returnLatTuple.append(lats[i])
-
-    #populate the tuple of lons included in the query
-    returnLonTuple = []
-    for i in range(lonlowerindex, lonupperindex):
-        returnLonTuple.append(lons[i])
+    spec = query_engine.QuerySpec(variable, querydate, forecastinterval=forecastinterval,
+                                  lat_bounds=lat_bounds, lon_bounds=lon_bounds)
+    return lazy.query(_engine, 'read', spec)
 
-    #grab the dataset for the given variable name and rectangle
-    dataSubset = ds.variables[variable][latlowerindex:latupperindex, lonlowerindex:lonupperindex]
 
-    returnTuple.append(returnLatTuple)
-    returnTuple.append(returnLonTuple)
-    returnTuple.append(dataSubset)
-
-
-    return returnTuple
-
-
-def querySingleDateSingleCoordinate(querydate, forecastinterval, variable, lat, lon):
+def querySingleDateSingleCoordinate(querydate, forecastinterval, variable, lat, lon, method='nearest', tolerance=None):
     """
     Query for a GFS variable, single date/forecast, single coordinate
 
@@ -186,12 +165,19 @@ def querySingleDateSingleCoordinate(querydate, forecastinterval, variable, lat,
         date to query
     forecastinterval : int
         number of hours in the future to forecast
-    variable : str
-        variable to query from the netCDF file
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
     lat : int
         lat in radians
     lon : int
         lon in radians
+    method : str
+        nearest to use the grid cell nearest to lat/lon, bilinear to
+        interpolate from the four surrounding cells
+    tolerance : float
+        max distance in degrees between lat/lon and the nearest grid cell,
+        None for half a grid cell
 
     Returns
     -------
@@ -199,26 +185,11 @@ def querySingleDateSingleCoordinate(querydate, forecastinterval, variable, lat,
         result for the query
 
     """
-    ds = Dataset(getfilename(querydate, forecastinterval))
-
-    #grab the lat and lon variable arrays
-    lats = ds.variables['lat_0'][:]
-    lons = ds.variables['lon_0'][:]
-    lons = np.mod(lons - 180.0, 360.0) - 180.0
-
-    #calculate the lower and upper indicies of the lat array
-    latindex = np.nonzero(lats == lat)[0][0]
-
-    #calculate the lower and upper indices of the lon array
-    lonindex = np.nonzero(lons == lon)[0][0]
+    return _engine.read(query_engine.QuerySpec(variable, querydate, forecastinterval=forecastinterval,
+                                               lat=lat, lon=lon, method=method, tolerance=tolerance))
 
-    #grab the dataset for the given variable name and rectangle
-    dataSubset = ds.variables[variable][latindex, lonindex]
 
-    return dataSubset
-
-
-def queryAggregateDateRangeRectangle(querydate, days, variable, aggregatefunction, lat_bounds, lon_bounds):
+def queryAggregateDateRangeRectangle(querydate, days, variable, aggregatefunction, lat_bounds, lon_bounds, workers=None):
     """
     Query for a GFS variable, date, number of forecast days, rectanglar area
 
@@ -230,89 +201,170 @@ def queryAggregateDateRangeRectangle(querydate, days, variable, aggregatefunctio
         date for query
     days : int
         number of days to forecast
-    variable : str
-        variable to query from the netCDF file
-    aggregatefunction : str
-        function for aggregating th data possible values: min, max, avg
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
+    aggregatefunction : str or str[]
+        function for aggregating th data possible values: min, max, avg,
+        sum, count, std, pNN (percentile, for example p90), see reducers.py, or a list
+        of one function per variable
     lat_bounds : int[]
         an array with to variables to represent the lower and upper bounds
         for lat in radians
     lon_bounds : int[]
         an array with to variables to represent the lower and upper bounds
         for lon in radians
+    workers : int
+        number of worker processes reading blocks of days in parallel,
+        defaults to common.queryWorkers
 
     Returns
     -------
-    tuple[]
-        0 index is a tuple of lats included in the query
-        1 index is a tuple of lons included in the query
+    LazyResult
+        acts as a tuple[], computed when first used (see lazy.py)
+        0 index is an array of lats included in the query
+        1 index is an array of lons included in the query
         2 index is a tuple of numeric results
 
     """
+    spec = query_engine.QuerySpec(variable, querydate, days=days, function=aggregatefunction,
+                                  lat_bounds=lat_bounds, lon_bounds=lon_bounds, workers=workers)
+    return lazy.query(_engine, 'aggregate', spec)
 
-    file_name_list = getfilenames(querydate, days)
 
-    aggregate = []
-    returnTuple = []
+def queryAggregateDateRangeSingleCoordinate(querydate, days, variable, aggregatefunction, lat, lon, method='nearest', tolerance=None, workers=None):
+    """
+    Query for a GFS variable, date, number of forecast days, single coordinate
 
-    filecount = 0
-    for filename in file_name_list:
-        filecount += 1
-        ds = Dataset(filename)
+    will return a 2d array of values for the supplied parameters
 
-        #grab the lat and lon variable arrays
-        lats = ds.variables['lat_0'][:]
-        lons = ds.variables['lon_0'][:]
-        lons = np.mod(lons - 180.0, 360.0) - 180.0
+    Parameters
+    ----------
+    querydate : date
+        date for query
+    days : int
+        number of days to forecast
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
+    aggregatefunction : str or str[]
+        function for aggregating th data possible values: min, max, avg,
+        sum, count, std, pNN (percentile, for example p90), see reducers.py, or a list
+        of one function per variable
+    lat : int
+        lat in radians
+    lon : int
+        lon in radians
+    method : str
+        nearest to use the grid cell nearest to lat/lon, bilinear to
+        interpolate from the four surrounding cells
+    tolerance : float
+        max distance in degrees between lat/lon and the nearest grid cell,
+        None for half a grid cell
+    workers : int
+        number of worker processes reading blocks of days in parallel,
+        defaults to common.queryWorkers
 
-        #calculate the lower and upper indicies of the lat array
-        latlowerindex = np.argmin(np.abs(lats - lat_bounds[0]))
-        latupperindex = np.argmin(np.abs(lats - lat_bounds[1]))
-        if latupperindex<latlowerindex:
-            latlowerindex, latupperindex = latupperindex, latlowerindex
+    Returns
+    -------
+    float
+        result for the query
 
-        #calculate the lower and upper indices of the lon array
-        lonlowerindex = np.argmin(np.abs(lons - lon_bounds[0]))
-        lonupperindex = np.argmin(np.abs(lons - lon_bounds[1]))
+    """
+    return _engine.aggregate(query_engine.QuerySpec(variable, querydate, days=days, function=aggregatefunction,
+                                                    lat=lat, lon=lon, method=method, tolerance=tolerance, workers=workers))
 
-        #populate the tuple of lats included in the query
-        returnLatTuple = []
-        for i in range(latlowerindex, latupperindex):
-            returnLatTuple.append(lats[i])
 
-        #populate the tuple of lons included in the query
-        returnLonTuple = []
-        for i in range(lonlowerindex, lonupperindex):
-            returnLonTuple.append(lons[i])
+def querySingleDateRegion(querydate, forecastinterval, variable, region, statistics=False):
+    """
+    Query for a GFS variable, single date, polygon region
 
-        #grab the dataset for the given variable name and rectangle
-        dataSubset = ds.variables[variable][latlowerindex:latupperindex, lonlowerindex:lonupperindex]
+    will return a 2d array of values for the cells of the region, only the
+    rectangle bounding the region is read
 
-        if aggregate == []:
-            aggregate = dataSubset
-        else:
-            if aggregatefunction  == "max":
-                aggregate = np.maximum(dataSubset, aggregate)
-            elif aggregatefunction == "min":
-                aggregate = np.minimum(dataSubset, aggregate)
-            elif aggregatefunction == "avg":
-                aggregate += dataSubset
+    Parameters
+    ----------
+    querydate : date
+        date to query
+    forecastinterval : int
+        number of hours in the future to forecast
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
+    region : dict or list
+        GeoJSON Polygon, MultiPolygon or Feature with [lon, lat]
+        coordinates, or a list of [lon, lat] points, see regions.py
+    statistics : bool
+        True to return the area weighted statistics of the region instead
+        of its cells
 
-    if aggregatefunction == "avg":
-        aggregate = aggregate / filecount
+    Returns
+    -------
+    LazyResult or dict
+        acts as a tuple[], computed when first used (see lazy.py)
+        0 index is an array of lats of the rectangle bounding the region
+        1 index is an array of lons of the rectangle bounding the region
+        2 index is a tuple of numeric results, masked outside the region
+        or with statistics, a dict of mean, min, max, cells and coverage
+        (see regions.RegionMask.statistics)
 
-    returnTuple.append(returnLatTuple)
-    returnTuple.append(returnLonTuple)
-    returnTuple.append(aggregate)
+    """
+    spec = query_engine.QuerySpec(variable, querydate, forecastinterval=forecastinterval,
+                                  region=region, statistics=statistics)
+    return lazy.query(_engine, 'read', spec)
 
-    return returnTuple
 
+def queryAggregateDateRangeRegion(querydate, days, variable, aggregatefunction, region, statistics=False, workers=None):
+    """
+    Query for a GFS variable, date, number of forecast days, polygon region
+
+    will return a 2d array of values for the cells of the region, only the
+    rectangle bounding the region is read
+
+    Parameters
+    ----------
+    querydate : date
+        date for query
+    days : int
+        number of days to forecast
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
+    aggregatefunction : str or str[]
+        function for aggregating th data possible values: min, max, avg,
+        sum, count, std, pNN (percentile, for example p90), see reducers.py, or a list
+        of one function per variable
+    region : dict or list
+        GeoJSON Polygon, MultiPolygon or Feature with [lon, lat]
+        coordinates, or a list of [lon, lat] points, see regions.py
+    statistics : bool
+        True to return the area weighted statistics of the region instead
+        of its cells
+    workers : int
+        number of worker processes reading blocks of days in parallel,
+        defaults to common.queryWorkers
+
+    Returns
+    -------
+    LazyResult or dict
+        acts as a tuple[], computed when first used (see lazy.py)
+        0 index is an array of lats of the rectangle bounding the region
+        1 index is an array of lons of the rectangle bounding the region
+        2 index is a tuple of numeric results, masked outside the region
+        or with statistics, a dict of mean, min, max, cells and coverage
+        (see regions.RegionMask.statistics)
 
-def queryAggregateDateRangeSingleCoordinate(querydate, days, variable, aggregatefunction, lat, lon):
     """
-    Query for a GFS variable, date, number of forecast days, single coordinate
+    spec = query_engine.QuerySpec(variable, querydate, days=days, function=aggregatefunction,
+                                  region=region, statistics=statistics, workers=workers)
+    return lazy.query(_engine, 'aggregate', spec)
 
-    will return a 2d array of values for the supplied parameters
+
+def queryZonalStatisticsDateRange(querydate, days, variable, labels, statistics=None, tablefilename=None, workers=None):
+    """
+    Query for statistics of many regions for each forecast day
+
+    will read each forecast file once and reduce every region from that read
 
     Parameters
     ----------
@@ -322,60 +374,147 @@ def queryAggregateDateRangeSingleCoordinate(querydate, days, variable, aggregate
         number of days to forecast
     variable : str
         variable to query from the netCDF file
-    aggregatefunction : str
-        function for aggregating th data possible values: min, max, avg
-    lat : int
-        lat in radians
-    lon : int
-        lon in radians
+    labels : ndarray
+        integer label of each grid cell in the order of the file grid,
+        negative for cells outside every region, see zonal_stats.py
+    statistics : str[]
+        statistics to compute: mean, min, max, sum, count, None for all
+    tablefilename : str
+        if given, the results are also written to this netCDF file as a
+        regions x days table
+    workers : int
+        number of worker processes reading blocks of days in parallel,
+        defaults to common.queryWorkers
 
     Returns
     -------
-    float
-        result for the query
+    tuple
+        0 index is the label of each region
+        1 index is the date of each day
+        2 index is a dict of a (regions x days) array for each statistic
 
     """
+    spec = query_engine.QuerySpec(variable, querydate, days=days, function=statistics, workers=workers)
+    regionLabels, dates, table = _engine.zonal(spec, labels)
+    if tablefilename is not None:
+        zonal_stats.write_table(tablefilename, variable, regionLabels, dates, table)
+    return regionLabels, dates, table
 
-    file_name_list = getfilenames(querydate, days)
 
-    aggregate = 0
+def queryDateRangeMultiCoordinate(querydate, days, variables, lats, lons, tolerance=None):
+    """
+    Query for one or more GFS variables, date, number of forecast days, many coordinates
 
-    filecount = 0
-    for filename in file_name_list:
-        filecount += 1
-        ds = Dataset(filename)
+    will return the daily forecast values of every variable at every
+    coordinate, reading each forecast file once for all coordinates
 
-        #grab the lat and lon variable arrays
-        lats = ds.variables['lat_0'][:]
-        lons = ds.variables['lon_0'][:]
-        lons = np.mod(lons - 180.0, 360.0) - 180.0
+    Parameters
+    ----------
+    querydate : date
+        date for query
+    days : int
+        number of days to forecast
+    variables : str[]
+        variables to query from the netCDF file
+    lats : float[]
+        lat of each coordinate in radians
+    lons : float[]
+        lon of each coordinate in radians
+    tolerance : float
+        max distance in degrees between a coordinate and the nearest grid
+        cell, None for half a grid cell
 
-        # calculate the lower and upper indicies of the lat array
-        latindex = np.nonzero(lats == lat)[0][0]
+    Returns
+    -------
+    MaskedArray
+        (coordinates x forecast days x variables) array of results
 
-        # calculate the lower and upper indices of the lon array
-        lonindex = np.nonzero(lons == lon)[0][0]
+    """
+    return _engine.series(query_engine.QuerySpec(variables, querydate, days=days, lat=lats, lon=lons, tolerance=tolerance))
 
-        # grab the dataset for the given variable name and rectangle
-        dataSubset = ds.variables[variable][latindex, lonindex]
 
-        if aggregate == 0:
-            aggregate = dataSubset
-        else:
-            if aggregatefunction  == "max":
-                aggregate = np.maximum(dataSubset, aggregate)
-            elif aggregatefunction == "min":
-                aggregate = np.minimum(dataSubset, aggregate)
-            elif aggregatefunction == "avg":
-                aggregate += dataSubset
+def queryForecastCurveRectangle(querydate, variable, lat_bounds, lon_bounds, leads=None, workers=None):
+    """
+    Query for the forecast curve of a GFS variable, every forecast lead, rectanglar area
 
-    if aggregatefunction == "avg":
-        aggregate = aggregate / filecount
+    will return the values of every forecast lead of an issue date, the
+    leads are read in parallel
 
-    return aggregate
+    Parameters
+    ----------
+    querydate : date
+        issue date of the forecast
+    variable : str or str[]
+        variable to query from the netCDF files, or a list of variables read
+        in the same pass, the results are then a dict by variable
+    lat_bounds : int[]
+        an array with to variables to represent the lower and upper bounds
+        for lat in radians
+    lon_bounds : int[]
+        an array with to variables to represent the lower and upper bounds
+        for lon in radians
+    leads : int[]
+        forecast hours to read, None for every lead with a file (every
+        common.GFSLeadStep hours up to common.GFSMaxLead)
+    workers : int
+        number of worker processes reading blocks of leads in parallel,
+        defaults to common.queryWorkers
 
+    Returns
+    -------
+    tuple[]
+        0 index is the valid time (datetime) of each lead
+        1 index is an array of lats included in the query
+        2 index is an array of lons included in the query
+        3 index is a (lead x lat x lon) array of results
 
-def queryConsecutiveDaysDateRangeRectangle(querydate, days, variable, aggregatefunction, lat_bounds, lon_bounds):
+    """
+    return _engine.curve(query_engine.QuerySpec(variable, querydate, forecastinterval=leads,
+                                                lat_bounds=lat_bounds, lon_bounds=lon_bounds, workers=workers))
+
+
+def queryForecastCurveMultiCoordinate(querydate, variable, lats, lons, leads=None, tolerance=None, workers=None):
+    """
+    Query for the forecast curve of a GFS variable, every forecast lead, one or many coordinates
+
+    will return the values of every forecast lead of an issue date at
+    every coordinate, the leads are read in parallel and each file is read
+    once for all coordinates
+
+    Parameters
+    ----------
+    querydate : date
+        issue date of the forecast
+    variable : str or str[]
+        variable to query from the netCDF files, or a list of variables read
+        in the same pass, the results are then a dict by variable
+    lats : float or float[]
+        lat of the coordinate(s) in radians
+    lons : float or float[]
+        lon of the coordinate(s) in radians
+    leads : int[]
+        forecast hours to read, None for every lead with a file (every
+        common.GFSLeadStep hours up to common.GFSMaxLead)
+    tolerance : float
+        max distance in degrees between a coordinate and the nearest grid
+        cell, None for half a grid cell
+    workers : int
+        number of worker processes reading blocks of leads in parallel,
+        defaults to common.queryWorkers
+
+    Returns
+    -------
+    tuple[]
+        0 index is the valid time (datetime) of each lead
+        1 index is a (lead x coordinates) array of results, (lead) for a
+        single coordinate
+
+    """
+    return _engine.curve(query_engine.QuerySpec(variable, querydate, forecastinterval=leads,
+                                                lat=lats, lon=lons, tolerance=tolerance, workers=workers))
+
+
+def queryConsecutiveDaysDateRangeRectangle(querydate, days, variable, aggregatefunction, lat_bounds, lon_bounds, workers=None):
     """
     Query for number of consecutive days for a given GFS variable, date, number of forecast days, cunction, rectanglar area
 
@@ -387,110 +526,38 @@ def queryConsecutiveDaysDateRangeRectangle(querydate, days, variable, aggregatef
         date for query
     days : int
         number of days to forecast
-    variable : str
-        variable to query from the netCDF file
-    aggregatefunction : str
-        function for calculating concecutive days, possible values: cold, hot, wet, dry
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
+    aggregatefunction : str or str[]
+        function for calculating concecutive days, possible values: cold, hot, wet, dry,
+        or a list of one function per variable
     lat_bounds : int[]
         an array with to variables to represent the lower and upper bounds
         for lat in radians
     lon_bounds : int[]
         an array with to variables to represent the lower and upper bounds
         for lon in radians
+    workers : int
+        number of worker processes reading blocks of days in parallel,
+        defaults to common.queryWorkers
 
     Returns
     -------
     tuple[]
-        0 index is a tuple of lats included in the query
-        1 index is a tuple of lons included in the query
-        2 index is a tuple of numeric results
+        0 index is an array of lats included in the query
+        1 index is an array of lons included in the query
+        2 index is the number of consecutive days at the end of the range
+        3 index is the longest run of consecutive days
+        4 index is the start date of the longest run
+        5 index is the number of qualifying days
 
     """
+    return _engine.consecutive(query_engine.QuerySpec(variable, querydate, days=days, function=aggregatefunction,
+                                                      lat_bounds=lat_bounds, lon_bounds=lon_bounds, workers=workers))
+
 
-    file_name_list = getfilenames(querydate, days)
-
-    aggregate = []
-    returnTuple = []
-    firstLoop = 0
-
-    filecount = 0
-    for filename in file_name_list:
-        filecount += 1
-        ds = Dataset(filename)
-
-        #grab the lat and lon variable arrays
-        lats = ds.variables['lat_0'][:]
-        lons = ds.variables['lon_0'][:]
-        lons = np.mod(lons - 180.0, 360.0) - 180.0
-
-        #calculate the lower and upper indicies of the lat array
-        latlowerindex = np.argmin(np.abs(lats - lat_bounds[0]))
-        latupperindex = np.argmin(np.abs(lats - lat_bounds[1]))
-        if latupperindex<latlowerindex:
-            latlowerindex, latupperindex = latupperindex, latlowerindex
-
-        #calculate the lower and upper indices of the lon array
-        lonlowerindex = np.argmin(np.abs(lons - lon_bounds[0]))
-        lonupperindex = np.argmin(np.abs(lons - lon_bounds[1]))
-
-        #populate the tuple of lats included in the query
-        returnLatTuple = []
-        for i in range(latlowerindex, latupperindex):
-            returnLatTuple.append(lats[i])
-
-        #populate the tuple of lons included in the query
-        returnLonTuple = []
-        for i in range(lonlowerindex, lonupperindex):
-            returnLonTuple.append(lons[i])
-
-        #grab the dataset for the given variable name and rectangle
-        dataSubset = ds.variables[variable][latlowerindex:latupperindex, lonlowerindex:lonupperindex]
-
-        #initialize return aggregate
-        if firstLoop == 0:
-            firstLoop = 1
-            rows = dataSubset.shape[0]  # calculate number of rows in array
-            cols = dataSubset.shape[1]  # calculate number of columns in array
-            aggregate = np.zeros((rows,cols))
-
-        rows = aggregate.shape[0]  # calculate number of rows in array
-        cols = aggregate.shape[1]  # calculate number of columns in array
-        for i in range(0, rows):
-            for j in range(0, cols):
-
-                if aggregatefunction == "hot":
-                    dataSubset[i, j] = convert.kelvin2celsius(dataSubset[i, j])
-                    if dataSubset[i, j] > common.hotTemp:
-                        aggregate[i, j] += 1
-                    else:
-                        aggregate[i, j] = 0
-
-                elif aggregatefunction == "cold":
-                    dataSubset[i, j] = convert.kelvin2celsius(dataSubset[i, j])
-                    if dataSubset[i, j] < common.coldTemp:
-                        aggregate[i, j] += 1
-                    else:
-                        aggregate[i, j] = 0
-                elif aggregatefunction == "wet":
-                    if dataSubset[i, j] > common.wetPrecip:
-                        aggregate[i, j] += 1
-                    else:
-                        aggregate[i, j] = 0
-
-                elif aggregatefunction == "dry":
-                    if dataSubset[i, j] < common.dryPrecip:
-                        aggregate[i, j] += 1
-                    else:
-                        aggregate[i, j] = 0
-
-    returnTuple.append(returnLatTuple)
-    returnTuple.append(returnLonTuple)
-    returnTuple.append(aggregate)
-
-    return returnTuple
-
-
-def queryConsecutivedDateRangeSingleCoordinate(querydate, days, variable, aggregatefunction, lat, lon):
+def queryConsecutivedDateRangeSingleCoordinate(querydate, days, variable, aggregatefunction, lat, lon, method='nearest', tolerance=None, workers=None):
     """
     Query for number of consecutive days for a given GFS variable, date, number of forecast days, cunction, single coordinate
 
@@ -502,14 +569,25 @@ def queryConsecutivedDateRangeSingleCoordinate(querydate, days, variable, aggreg
         date for query
     days : int
         number of days to forecast
-    variable : str
-        variable to query from the netCDF file
-    aggregatefunction : str
-        function for calculating concecutive days, possible values: cold, hot, wet, dry
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
+    aggregatefunction : str or str[]
+        function for calculating concecutive days, possible values: cold, hot, wet, dry,
+        or a list of one function per variable
     lat : int
         lat in radians
     lon : int
         lon in radians
+    method : str
+        nearest to use the grid cell nearest to lat/lon, bilinear to
+        interpolate from the four surrounding cells
+    tolerance : float
+        max distance in degrees between lat/lon and the nearest grid cell,
+        None for half a grid cell
+    workers : int
+        number of worker processes reading blocks of days in parallel,
+        defaults to common.queryWorkers
 
     Returns
     -------
@@ -517,76 +595,27 @@ def queryConsecutivedDateRangeSingleCoordinate(querydate, days, variable, aggreg
         result for the query
 
     """
-
-    file_name_list = getfilenames(querydate, days)
-
-    aggregate = 0
-
-    filecount = 0
-    for filename in file_name_list:
-        filecount += 1
-        ds = Dataset(filename)
-
-        #grab the lat and lon variable arrays
-        lats = ds.variables['lat_0'][:]
-        lons = ds.variables['lon_0'][:]
-        lons = np.mod(lons - 180.0, 360.0) - 180.0
-
-        # calculate the lower and upper indicies of the lat array
-        latindex = np.nonzero(lats == lat)[0][0]
-
-        # calculate the lower and upper indices of the lon array
-        lonindex = np.nonzero(lons == lon)[0][0]
-
-        # grab the dataset for the given variable name and rectangle
-        dataSubset = ds.variables[variable][latindex, lonindex]
-
-        if aggregatefunction == "hot":
-            dataSubset = convert.kelvin2celsius(dataSubset)
-            if dataSubset>common.hotTemp:
-                aggregate += 1
-            else:
-                aggregate = 0
-
-        elif aggregatefunction == "cold":
-            dataSubset = convert.kelvin2celsius(dataSubset)
-            if dataSubset<common.coldTemp:
-                aggregate += 1
-            else:
-                aggregate = 0
-
-        elif aggregatefunction == "wet":
-            if dataSubset>common.wetPrecip:
-                aggregate += 1
-            else:
-                aggregate = 0
-
-        elif aggregatefunction == "dry":
-            if dataSubset<common.dryPrecip:
-                aggregate += 1
-            else:
-                aggregate = 0
-
-
-    return aggregate
-
+    return _engine.consecutive(query_engine.QuerySpec(variable, querydate, days=days, function=aggregatefunction,
+                                                      lat=lat, lon=lon, method=method, tolerance=tolerance, workers=workers))
 
 
-lat_bnds = [20.0, 26.0]
-lon_bnds = [-110, -102]
+if __name__ == "__main__":
+    #example queries
+    lat_bnds = [20.0, 26.0]
+    lon_bnds = [-110, -102]
 
-#print(querySingleDateRectangle(date(2018, 1, 1), 24, 'MAX_TMP_P0_L1_GLL0', lat_bnds, lon_bnds))
-#print(querySingleDateSingleCoordinate(date(2018, 1, 1), 24, 'MAX_TMP_P0_L1_GLL0', 25, -107))
+    #print(querySingleDateRectangle(date(2018, 1, 1), 24, 'MAX_TMP_P0_L1_GLL0', lat_bnds, lon_bnds))
+    #print(querySingleDateSingleCoordinate(date(2018, 1, 1), 24, 'MAX_TMP_P0_L1_GLL0', 25, -107))
 
-#print(queryAggregateDateRangeRectangle(date(2018, 1, 1), 3, 'AVG_MAX_MIN_TMP_P0_L1_GLL0', 'avg', lat_bnds, lon_bnds))
+    #print(queryAggregateDateRangeRectangle(date(2018, 1, 1), 3, 'AVG_MAX_MIN_TMP_P0_L1_GLL0', 'avg', lat_bnds, lon_bnds))
 
-#print(queryAggregateDateRangeSingleCoordinate(date(2018, 1, 1), 3, 'MAX_TMP_P0_L1_GLL0', 'min', 25, -107))
+    #print(queryAggregateDateRangeSingleCoordinate(date(2018, 1, 1), 3, 'MAX_TMP_P0_L1_GLL0', 'min', 25, -107))
 
 
-#print(queryConsecutiveHotColdDateRangeSingleCoordinate(date(2018, 1, 1), 5, 'AVG_MAX_MIN_TMP_P0_L1_GLL0', 'cold', 25, -107))
+    #print(queryConsecutiveHotColdDateRangeSingleCoordinate(date(2018, 1, 1), 5, 'AVG_MAX_MIN_TMP_P0_L1_GLL0', 'cold', 25, -107))
 
 
-print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), 5, 'AVG_MAX_MIN_TMP_P0_L1_GLL0', 'hot', lat_bnds, lon_bnds))
-print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), 5, 'AVG_MAX_MIN_TMP_P0_L1_GLL0', 'cold', lat_bnds, lon_bnds))
-print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), 5, 'APCP_P8_L1_GLL0_acc6h', 'wet', lat_bnds, lon_bnds))
-print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), 5, 'APCP_P8_L1_GLL0_acc6h', 'dry', lat_bnds, lon_bnds))
\ No newline at end of file
+    print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), 5, 'AVG_MAX_MIN_TMP_P0_L1_GLL0', 'hot', lat_bnds, lon_bnds))
+    print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), 5, 'AVG_MAX_MIN_TMP_P0_L1_GLL0', 'cold', lat_bnds, lon_bnds))
+    print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), 5, 'APCP_P8_L1_GLL0_acc6h', 'wet', lat_bnds, lon_bnds))
+    print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), 5, 'APCP_P8_L1_GLL0_acc6h', 'dry', lat_bnds, lon_bnds))
@@ -12,6 +12,9 @@
 
     Each function has a docstring describing the query it performs
 
+    The queries are run by the shared query_engine module, each function
+    describes its query with a QuerySpec
+
     variables included in the NLDAS netCDF file:
         Name                        Description                             Units
         A_PCP_110_SFC_acc1h         Total Precipitation                     kg/m^2
@@ -32,12 +35,14 @@
 
  """
 
-from datetime import date, timedelta
-import os
-import numpy as np
-from netCDF4 import Dataset
-from pyeto import convert
-import common
+from datetime import date
+import climatology
+import lazy
+import query_engine
+import zonal_stats
+
+#engine running every query against the NLDAS files
+_engine = query_engine.QueryEngine(query_engine.NLDAS)
 
 
 def getfilename(querydate):
@@ -57,16 +62,7 @@ def getfilename(querydate):
         NLDAS netCDF filename
 
     """
-    fullPath = os.path.dirname(os.path.abspath(__file__)) + common.netCDFpath
-
-    #split out the parts of the year
-    year = ("{date.year:04}".format(date=querydate))
-    tt = querydate.timetuple()
-    julianday = format(tt.tm_yday, '03')
-
-    fileName = fullPath + "NLDAS_" + year + "_" + julianday + ".nc"
-
-    return fileName
+    return query_engine.NLDAS.filename(querydate)
 
 
 def getfilenames(querystartdate, queryenddate):
@@ -88,23 +84,35 @@ def getfilenames(querystartdate, queryenddate):
         an array of NLDAS netCDF filenames
 
     """
-    file_name_list = []
-    fullPath = os.path.dirname(os.path.abspath(__file__)) + common.netCDFpath
+    return query_engine.NLDAS.files(query_engine.QuerySpec(None, querystartdate, end=queryenddate))[0]
 
-    mydate = querystartdate
 
-    while mydate <= queryenddate:
-        #split out the parts of the year
-        year = ("{date.year:04}".format(date=mydate))
-        tt = mydate.timetuple()
-        julianday = format(tt.tm_yday, '03')
+def locateCoordinate(querydate, lat, lon, tolerance=None):
+    """
+    Find the NLDAS grid cell a coordinate snaps to
+
+    will return the indices and coordinates of the grid cell the single
+    coordinate queries read for the supplied lat/lon
 
-        fileName = fullPath + "NLDAS_" + year + "_" + julianday + ".nc"
+    Parameters
+    ----------
+    querydate : date
+        date of a file to read the grid from
+    lat : int
+        lat in radians
+    lon : int
+        lon in radians
+    tolerance : float
+        max distance in degrees between lat/lon and the nearest grid cell,
+        None for half a grid cell
 
-        file_name_list.append(fileName)
-        mydate += timedelta(days=1)
+    Returns
+    -------
+    tuple
+        (lat index, lon index, snapped lat, snapped lon)
 
-    return file_name_list
+    """
+    return _engine.locate(query_engine.QuerySpec(None, querydate, lat=lat, lon=lon, tolerance=tolerance))
 
 
 def querySingleDateRectangle(querydate, variable, lat_bounds, lon_bounds):
@@ -117,8 +125,9 @@ def querySingleDateRectangle(querydate, variable, lat_bounds, lon_bounds):
     ----------
     querydate : date
         date to query
-    variable : str
-        variable to query from the netCDF file
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
     lat_bounds : int[]
         an array with to variables to represent the lower and upper bounds
         for lat in radians
@@ -128,49 +137,18 @@ def querySingleDateRectangle(querydate, variable, lat_bounds, lon_bounds):
 
     Returns
     -------
-    tuple[]
-        0 index is a tuple of lats included in the query
-        1 index is a tuple of lons included in the query
+    LazyResult
+        acts as a tuple[], computed when first used (see lazy.py)
+        0 index is an array of lats included in the query
+        1 index is an array of lons included in the query
         2 index is a tuple of numeric results
 
     """
-    ds = Dataset(getfilename(querydate))
-    returnTuple = []
+    spec = query_engine.QuerySpec(variable, querydate, lat_bounds=lat_bounds, lon_bounds=lon_bounds)
+    return lazy.query(_engine, 'read', spec)
 
-    #grab the lat and lon variable arrays
-    lats = ds.variables['lat_110'][:]
-    lons = ds.variables['lon_110'][:]
 
-    #calculate the lower and upper indicies of the lat array
-    latlowerindex = np.argmin(np.abs(lats - lat_bounds[0]))
-    latupperindex = np.argmin(np.abs(lats - lat_bounds[1]))
-
-    #calculate the lower and upper indices of the lon array
-    lonlowerindex = np.argmin(np.abs(lons - lon_bounds[0]))
-    lonupperindex = np.argmin(np.abs(lons - lon_bounds[1]))
-
-    #populate the tuple of lats included in the query
-    returnLatTuple = []
-    for i in range(latlowerindex, latupperindex):
-        returnLatTuple.append(lats[i])
-
-    #populate the tuple of lons included in the query
-    returnLonTuple = []
-    for i in range(lonlowerindex, lonupperindex):
-        returnLonTuple.append(lons[i])
-
-    #grab the dataset for the given variable name and rectangle
-    dataSubset = ds.variables[variable][latlowerindex:latupperindex, lonlowerindex:lonupperindex]
-
-    returnTuple.append(returnLatTuple)
-    returnTuple.append(returnLonTuple)
-    returnTuple.append(dataSubset)
-
-
-    return returnTuple
-
-
-def querySingleDateSingleCoordinate(querydate, variable, lat, lon):
+def querySingleDateSingleCoordinate(querydate, variable, lat, lon, method='nearest', tolerance=None):
     """
     Query for a netCDF variable, single date, single coordinate
 
@@ -180,12 +158,19 @@ def querySingleDateSingleCoordinate(querydate, variable, lat, lon):
     ----------
     querydate : date
         date to query
-    variable : str
-        variable to query from the netCDF file
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
     lat : int
         lat in radians
     lon : int
         lon in radians
+    method : str
+        nearest to use the grid cell nearest to lat/lon, bilinear to
+        interpolate from the four surrounding cells
+    tolerance : float
+        max distance in degrees between lat/lon and the nearest grid cell,
+        None for half a grid cell
 
     Returns
     -------
@@ -193,25 +178,10 @@ def querySingleDateSingleCoordinate(querydate, variable, lat, lon):
         result for the query
 
     """
-    ds = Dataset(getfilename(querydate))
-
-    #grab the lat and lon variable arrays
-    lats = ds.variables['lat_110'][:]
-    lons = ds.variables['lon_110'][:]
-
-    #calculate the lower and upper indicies of the lat array
-    latindex = np.nonzero(lats == lat)[0][0]
-
-    #calculate the lower and upper indices of the lon array
-    lonindex = np.nonzero(lons == lon)[0][0]
-
-    #grab the dataset for the given variable name and rectangle
-    dataSubset = ds.variables[variable][latindex, lonindex]
+    return _engine.read(query_engine.QuerySpec(variable, querydate, lat=lat, lon=lon, method=method, tolerance=tolerance))
 
-    return dataSubset
 
-
-def queryAggregateDateRangeRectangle(querystartdate, queryenddate, variable, aggregatefunction, lat_bounds, lon_bounds):
+def queryAggregateDateRangeRectangle(querystartdate, queryenddate, variable, aggregatefunction, lat_bounds, lon_bounds, workers=None):
     """
     Query for a netCDF variable, date range, rectanglar area
 
@@ -223,86 +193,167 @@ def queryAggregateDateRangeRectangle(querystartdate, queryenddate, variable, agg
         start date for query
     queryenddate : date
         end date for query
-    variable : str
-        variable to query from the netCDF file
-    aggregatefunction : str
-        function for aggregating th data possible values: min, max, avg
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
+    aggregatefunction : str or str[]
+        function for aggregating th data possible values: min, max, avg,
+        sum, count, std, pNN (percentile, for example p90), see reducers.py, or a list
+        of one function per variable
     lat_bounds : int[]
         an array with to variables to represent the lower and upper bounds
         for lat in radians
     lon_bounds : int[]
         an array with to variables to represent the lower and upper bounds
         for lon in radians
+    workers : int
+        number of worker processes reading blocks of days in parallel,
+        defaults to common.queryWorkers
 
     Returns
     -------
-    tuple[]
-        0 index is a tuple of lats included in the query
-        1 index is a tuple of lons included in the query
+    LazyResult
+        acts as a tuple[], computed when first used (see lazy.py)
+        0 index is an array of lats included in the query
+        1 index is an array of lons included in the query
         2 index is a tuple of numeric results
 
     """
+    spec = query_engine.QuerySpec(variable, querystartdate, end=queryenddate, function=aggregatefunction,
+                                  lat_bounds=lat_bounds, lon_bounds=lon_bounds, workers=workers)
+    return lazy.query(_engine, 'aggregate', spec)
 
-    file_name_list = getfilenames(querystartdate, queryenddate)
 
-    aggregate = []
-    returnTuple = []
+def queryAggregateDateRangeSingleCoordinate(querystartdate, queryenddate, variable, aggregatefunction, lat, lon, method='nearest', tolerance=None, workers=None):
+    """
+    Query for a netCDF variable, date range, single coordinate
+
+    will return a 2d array of values for the supplied parameters
+
+    Parameters
+    ----------
+    querystartdate : date
+        start date for query
+    queryenddate : date
+        end date for query
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
+    aggregatefunction : str or str[]
+        function for aggregating th data possible values: min, max, avg,
+        sum, count, std, pNN (percentile, for example p90), see reducers.py, or a list
+        of one function per variable
+    lat : int
+        lat in radians
+    lon : int
+        lon in radians
+    method : str
+        nearest to use the grid cell nearest to lat/lon, bilinear to
+        interpolate from the four surrounding cells
+    tolerance : float
+        max distance in degrees between lat/lon and the nearest grid cell,
+        None for half a grid cell
+    workers : int
+        number of worker processes reading blocks of days in parallel,
+        defaults to common.queryWorkers
+
+    Returns
+    -------
+    float
+        result for the query
 
-    filecount = 0
-    for filename in file_name_list:
-        filecount += 1
-        ds = Dataset(filename)
+    """
+    return _engine.aggregate(query_engine.QuerySpec(variable, querystartdate, end=queryenddate, function=aggregatefunction,
+                                                    lat=lat, lon=lon, method=method, tolerance=tolerance, workers=workers))
 
-        #grab the lat and lon variable arrays
-        lats = ds.variables['lat_110'][:]
-        lons = ds.variables['lon_110'][:]
 
-        #calculate the lower and upper indicies of the lat array
-        latlowerindex = np.argmin(np.abs(lats - lat_bounds[0]))
-        latupperindex = np.argmin(np.abs(lats - lat_bounds[1]))
+def querySingleDateRegion(querydate, variable, region, statistics=False):
+    """
+    Query for a netCDF variable, single date, polygon region
 
-        #calculate the lower and upper indices of the lon array
-        lonlowerindex = np.argmin(np.abs(lons - lon_bounds[0]))
-        lonupperindex = np.argmin(np.abs(lons - lon_bounds[1]))
+    will return a 2d array of values for the cells of the region, only the
+    rectangle bounding the region is read
 
-        #populate the tuple of lats included in the query
-        returnLatTuple = []
-        for i in range(latlowerindex, latupperindex):
-            returnLatTuple.append(lats[i])
+    Parameters
+    ----------
+    querydate : date
+        date to query
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
+    region : dict or list
+        GeoJSON Polygon, MultiPolygon or Feature with [lon, lat]
+        coordinates, or a list of [lon, lat] points, see regions.py
+    statistics : bool
+        True to return the area weighted statistics of the region instead
+        of its cells
 
-        #populate the tuple of lons included in the query
-        returnLonTuple = []
-        for i in range(lonlowerindex, lonupperindex):
-            returnLonTuple.append(lons[i])
+    Returns
+    -------
+    LazyResult or dict
+        acts as a tuple[], computed when first used (see lazy.py)
+        0 index is an array of lats of the rectangle bounding the region
+        1 index is an array of lons of the rectangle bounding the region
+        2 index is a tuple of numeric results, masked outside the region
+        or with statistics, a dict of mean, min, max, cells and coverage
+        (see regions.RegionMask.statistics)
 
-        #grab the dataset for the given variable name and rectangle
-        dataSubset = ds.variables[variable][latlowerindex:latupperindex, lonlowerindex:lonupperindex]
+    """
+    spec = query_engine.QuerySpec(variable, querydate, region=region, statistics=statistics)
+    return lazy.query(_engine, 'read', spec)
 
-        if aggregate == []:
-            aggregate = dataSubset
-        else:
-            if aggregatefunction  == "max":
-                aggregate = np.maximum(dataSubset, aggregate)
-            elif aggregatefunction == "min":
-                aggregate = np.minimum(dataSubset, aggregate)
-            elif aggregatefunction == "avg":
-                aggregate += dataSubset
 
-    if aggregatefunction == "avg":
-        aggregate = aggregate / filecount
+def queryAggregateDateRangeRegion(querystartdate, queryenddate, variable, aggregatefunction, region, statistics=False, workers=None):
+    """
+    Query for a netCDF variable, date range, polygon region
+
+    will return a 2d array of values for the cells of the region, only the
+    rectangle bounding the region is read
+
+    Parameters
+    ----------
+    querystartdate : date
+        start date for query
+    queryenddate : date
+        end date for query
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
+    aggregatefunction : str or str[]
+        function for aggregating th data possible values: min, max, avg,
+        sum, count, std, pNN (percentile, for example p90), see reducers.py, or a list
+        of one function per variable
+    region : dict or list
+        GeoJSON Polygon, MultiPolygon or Feature with [lon, lat]
+        coordinates, or a list of [lon, lat] points, see regions.py
+    statistics : bool
+        True to return the area weighted statistics of the region instead
+        of its cells
+    workers : int
+        number of worker processes reading blocks of days in parallel,
+        defaults to common.queryWorkers
 
-    returnTuple.append(returnLatTuple)
-    returnTuple.append(returnLonTuple)
-    returnTuple.append(aggregate)
+    Returns
+    -------
+    LazyResult or dict
+        acts as a tuple[], computed when first used (see lazy.py)
+        0 index is an array of lats of the rectangle bounding the region
+        1 index is an array of lons of the rectangle bounding the region
+        2 index is a tuple of numeric results, masked outside the region
+        or with statistics, a dict of mean, min, max, cells and coverage
+        (see regions.RegionMask.statistics)
 
-    return returnTuple
+    """
+    spec = query_engine.QuerySpec(variable, querystartdate, end=queryenddate, function=aggregatefunction,
+                                  region=region, statistics=statistics, workers=workers)
+    return lazy.query(_engine, 'aggregate', spec)
 
 
-def queryAggregateDateRangeSingleCoordinate(querystartdate, queryenddate, variable, aggregatefunction, lat, lon):
+def queryZonalStatisticsDateRange(querystartdate, queryenddate, variable, labels, statistics=None, tablefilename=None, workers=None):
     """
-    Query for a netCDF variable, date range, single coordinate
+    Query for statistics of many regions for each date of a range
 
-    will return a 2d array of values for the supplied parameters
+    will read each daily file once and reduce every region from that read
 
     Parameters
     ----------
@@ -312,59 +363,143 @@ def queryAggregateDateRangeSingleCoordinate(querystartdate, queryenddate, variab
         end date for query
     variable : str
         variable to query from the netCDF file
-    aggregatefunction : str
-        function for aggregating th data possible values: min, max, avg
+    labels : ndarray
+        integer label of each grid cell in the order of the file grid,
+        negative for cells outside every region, see zonal_stats.py
+    statistics : str[]
+        statistics to compute: mean, min, max, sum, count, None for all
+    tablefilename : str
+        if given, the results are also written to this netCDF file as a
+        regions x days table
+    workers : int
+        number of worker processes reading blocks of days in parallel,
+        defaults to common.queryWorkers
+
+    Returns
+    -------
+    tuple
+        0 index is the label of each region
+        1 index is the date of each day
+        2 index is a dict of a (regions x days) array for each statistic
+
+    """
+    spec = query_engine.QuerySpec(variable, querystartdate, end=queryenddate, function=statistics, workers=workers)
+    regionLabels, dates, table = _engine.zonal(spec, labels)
+    if tablefilename is not None:
+        zonal_stats.write_table(tablefilename, variable, regionLabels, dates, table)
+    return regionLabels, dates, table
+
+
+def queryAnomalyRectangle(querydate, variable, lat_bounds, lon_bounds, zscore=False, window=None):
+    """
+    Query for the anomaly of a netCDF variable from its climatology, single date, rectanglar area
+
+    will return a 2d array of the difference between the values of the date
+    and the day of year climatology (see climatology.py), reading one daily
+    file and the climatology
+
+    Parameters
+    ----------
+    querydate : date
+        date to query
+    variable : str
+        variable to query from the netCDF file
+    lat_bounds : int[]
+        an array with to variables to represent the lower and upper bounds
+        for lat in radians
+    lon_bounds : int[]
+        an array with to variables to represent the lower and upper bounds
+        for lon in radians
+    zscore : bool
+        True for the anomaly in climatological standard deviations
+    window : int
+        days of the year pooled around the date, defaults to
+        common.climatologyWindow
+
+    Returns
+    -------
+    tuple[]
+        0 index is an array of lats included in the query
+        1 index is an array of lons included in the query
+        2 index is a tuple of anomalies
+
+    """
+    returnLatTuple, returnLonTuple, dataSubset = querySingleDateRectangle(querydate, variable, lat_bounds, lon_bounds)
+    mean, std = climatology.read_box(variable, querydate, lat_bounds, lon_bounds, window)
+    return [returnLatTuple, returnLonTuple, climatology.anomaly(dataSubset, mean, std, zscore)]
+
+
+def queryAnomalySingleCoordinate(querydate, variable, lat, lon, zscore=False, window=None, tolerance=None):
+    """
+    Query for the anomaly of a netCDF variable from its climatology, single date, single coordinate
+
+    will return the difference between the value of the date and the day of
+    year climatology (see climatology.py) at the grid cell nearest to the
+    coordinate
+
+    Parameters
+    ----------
+    querydate : date
+        date to query
+    variable : str
+        variable to query from the netCDF file
     lat : int
         lat in radians
     lon : int
         lon in radians
+    zscore : bool
+        True for the anomaly in climatological standard deviations
+    window : int
+        days of the year pooled around the date, defaults to
+        common.climatologyWindow
+    tolerance : float
+        max distance in degrees between lat/lon and the nearest grid cell,
+        None for half a grid cell
 
     Returns
     -------
     float
-        result for the query
+        anomaly for the query
 
     """
+    value = querySingleDateSingleCoordinate(querydate, variable, lat, lon, tolerance=tolerance)
+    mean, std = climatology.read_point(variable, querydate, lat, lon, window, tolerance)
+    return climatology.anomaly(value, mean, std, zscore)[()]
 
-    file_name_list = getfilenames(querystartdate, queryenddate)
-
-    aggregate = 0
-
-    filecount = 0
-    for filename in file_name_list:
-        filecount += 1
-        ds = Dataset(filename)
-
-        #grab the lat and lon variable arrays
-        lats = ds.variables['lat_110'][:]
-        lons = ds.variables['lon_110'][:]
-
-        # calculate the lower and upper indicies of the lat array
-        latindex = np.nonzero(lats == lat)[0][0]
 
-        # calculate the lower and upper indices of the lon array
-        lonindex = np.nonzero(lons == lon)[0][0]
+def queryDateRangeMultiCoordinate(querystartdate, queryenddate, variables, lats, lons, tolerance=None):
+    """
+    Query for one or more netCDF variables, date range, many coordinates
 
-        # grab the dataset for the given variable name and rectangle
-        dataSubset = ds.variables[variable][latindex, lonindex]
+    will return the daily values of every variable at every coordinate,
+    reading each daily file once for all coordinates
 
-        if aggregate == 0:
-            aggregate = dataSubset
-        else:
-            if aggregatefunction  == "max":
-                aggregate = np.maximum(dataSubset, aggregate)
-            elif aggregatefunction == "min":
-                aggregate = np.minimum(dataSubset, aggregate)
-            elif aggregatefunction == "avg":
-                aggregate += dataSubset
+    Parameters
+    ----------
+    querystartdate : date
+        start date for query
+    queryenddate : date
+        end date for query
+    variables : str[]
+        variables to query from the netCDF file
+    lats : float[]
+        lat of each coordinate in radians
+    lons : float[]
+        lon of each coordinate in radians
+    tolerance : float
+        max distance in degrees between a coordinate and the nearest grid
+        cell, None for half a grid cell
 
-    if aggregatefunction == "avg":
-        aggregate = aggregate / filecount
+    Returns
+    -------
+    MaskedArray
+        (coordinates x days x variables) array of results
 
-    return aggregate
+    """
+    return _engine.series(query_engine.QuerySpec(variables, querystartdate, end=queryenddate, lat=lats, lon=lons, tolerance=tolerance))
 
 
-def queryConsecutiveDaysDateRangeRectangle(querystartdate, queryenddate, variable, aggregatefunction, lat_bounds, lon_bounds):
+def queryConsecutiveDaysDateRangeRectangle(querystartdate, queryenddate, variable, aggregatefunction, lat_bounds, lon_bounds, workers=None):
     """
     Query for number of consecutive days for a given netCDF variable, date range, cunction, rectanglar area
 
@@ -376,107 +511,38 @@ def queryConsecutiveDaysDateRangeRectangle(querystartdate, queryenddate, variabl
         start date for query
     queryenddate : date
         end date for query
-    variable : str
-        variable to query from the netCDF file
-    aggregatefunction : str
-        function for calculating concecutive days, possible values: cold, hot, wet, dry
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
+    aggregatefunction : str or str[]
+        function for calculating concecutive days, possible values: cold, hot, wet, dry,
+        or a list of one function per variable
     lat_bounds : int[]
         an array with to variables to represent the lower and upper bounds
         for lat in radians
     lon_bounds : int[]
         an array with to variables to represent the lower and upper bounds
         for lon in radians
+    workers : int
+        number of worker processes reading blocks of days in parallel,
+        defaults to common.queryWorkers
 
     Returns
     -------
     tuple[]
-        0 index is a tuple of lats included in the query
-        1 index is a tuple of lons included in the query
-        2 index is a tuple of numeric results
+        0 index is an array of lats included in the query
+        1 index is an array of lons included in the query
+        2 index is the number of consecutive days at the end of the range
+        3 index is the longest run of consecutive days
+        4 index is the start date of the longest run
+        5 index is the number of qualifying days
 
     """
+    return _engine.consecutive(query_engine.QuerySpec(variable, querystartdate, end=queryenddate, function=aggregatefunction,
+                                                      lat_bounds=lat_bounds, lon_bounds=lon_bounds, workers=workers))
+
 
-    file_name_list = getfilenames(querystartdate, queryenddate)
-
-    aggregate = []
-    returnTuple = []
-    firstLoop = 0
-
-    filecount = 0
-    for filename in file_name_list:
-        filecount += 1
-        ds = Dataset(filename)
-
-        #grab the lat and lon variable arrays
-        lats = ds.variables['lat_110'][:]
-        lons = ds.variables['lon_110'][:]
-
-        #calculate the lower and upper indicies of the lat array
-        latlowerindex = np.argmin(np.abs(lats - lat_bounds[0]))
-        latupperindex = np.argmin(np.abs(lats - lat_bounds[1]))
-
-        #calculate the lower and upper indices of the lon array
-        lonlowerindex = np.argmin(np.abs(lons - lon_bounds[0]))
-        lonupperindex = np.argmin(np.abs(lons - lon_bounds[1]))
-
-        #populate the tuple of lats included in the query
-        returnLatTuple = []
-        for i in range(latlowerindex, latupperindex):
-            returnLatTuple.append(lats[i])
-
-        #populate the tuple of lons included in the query
-        returnLonTuple = []
-        for i in range(lonlowerindex, lonupperindex):
-            returnLonTuple.append(lons[i])
-
-        #grab the dataset for the given variable name and rectangle
-        dataSubset = ds.variables[variable][latlowerindex:latupperindex, lonlowerindex:lonupperindex]
-
-        #initialize return aggregate
-        if firstLoop == 0:
-            firstLoop = 1
-            rows = dataSubset.shape[0]  # calculate number of rows in array
-            cols = dataSubset.shape[1]  # calculate number of columns in array
-            aggregate = np.zeros((rows,cols))
-
-        rows = aggregate.shape[0]  # calculate number of rows in array
-        cols = aggregate.shape[1]  # calculate number of columns in array
-        for i in range(0, rows):
-            for j in range(0, cols):
-
-                if aggregatefunction == "hot":
-                    dataSubset[i, j] = convert.kelvin2celsius(dataSubset[i, j])
-                    if dataSubset[i, j] > common.hotTemp:
-                        aggregate[i, j] += 1
-                    else:
-                        aggregate[i, j] = 0
-
-                elif aggregatefunction == "cold":
-                    dataSubset[i, j] = convert.kelvin2celsius(dataSubset[i, j])
-                    if dataSubset[i, j] < common.coldTemp:
-                        aggregate[i, j] += 1
-                    else:
-                        aggregate[i, j] = 0
-                elif aggregatefunction == "wet":
-                    if dataSubset[i, j] > common.wetPrecip:
-                        aggregate[i, j] += 1
-                    else:
-                        aggregate[i, j] = 0
-
-                elif aggregatefunction == "dry":
-                    if dataSubset[i, j] < common.dryPrecip:
-                        aggregate[i, j] += 1
-                    else:
-                        aggregate[i, j] = 0
-
-    returnTuple.append(returnLatTuple)
-    returnTuple.append(returnLonTuple)
-    returnTuple.append(aggregate)
-
-    return returnTuple
-
-
-def queryConsecutiveDaysDateRangeSingleCoordinate(querystartdate, queryenddate, variable, aggregatefunction, lat, lon):
+def queryConsecutiveDaysDateRangeSingleCoordinate(querystartdate, queryenddate, variable, aggregatefunction, lat, lon, method='nearest', tolerance=None, workers=None):
     """
     Query for number of consecutive days for a given netCDF variable, date range, function, single coordinate
 
@@ -488,14 +554,25 @@ def queryConsecutiveDaysDateRangeSingleCoordinate(querystartdate, queryenddate,
         start date for query
     queryenddate : date
         end date for query
-    variable : str
-        variable to query from the netCDF file
-    aggregatefunction : str
-        function for calculating concecutive days, possible values: cold, hot, wet, dry
+    variable : str or str[]
+        variable to query from the netCDF file, or a list of variables read
+        in the same pass, the results are then a dict by variable
+    aggregatefunction : str or str[]
+        function for calculating concecutive days, possible values: cold, hot, wet, dry,
+        or a list of one function per variable
     lat : int
         lat in radians
     lon : int
         lon in radians
+    method : str
+        nearest to use the grid cell nearest to lat/lon, bilinear to
+        interpolate from the four surrounding cells
+    tolerance : float
+        max distance in degrees between lat/lon and the nearest grid cell,
+        None for half a grid cell
+    workers : int
+        number of worker processes reading blocks of days in parallel,
+        defaults to common.queryWorkers
 
     Returns
     -------
@@ -503,73 +580,27 @@ def queryConsecutiveDaysDateRangeSingleCoordinate(querystartdate, queryenddate,
         result for the query
 
     """
+    return _engine.consecutive(query_engine.QuerySpec(variable, querystartdate, end=queryenddate, function=aggregatefunction,
+                                                      lat=lat, lon=lon, method=method, tolerance=tolerance, workers=workers))
 
-    file_name_list = getfilenames(querystartdate, queryenddate)
-
-    aggregate = 0
-
-    filecount = 0
-    for filename in file_name_list:
-        filecount += 1
-        ds = Dataset(filename)
-
-        #grab the lat and lon variable arrays
-        lats = ds.variables['lat_110'][:]
-        lons = ds.variables['lon_110'][:]
-
-        # calculate the lower and upper indicies of the lat array
-        latindex = np.nonzero(lats == lat)[0][0]
-
-        # calculate the lower and upper indices of the lon array
-        lonindex = np.nonzero(lons == lon)[0][0]
-
-        # grab the dataset for the given variable name and rectangle
-        dataSubset = ds.variables[variable][latindex, lonindex]
-
-        if aggregatefunction == "hot":
-            dataSubset = convert.kelvin2celsius(dataSubset)
-            if dataSubset>common.hotTemp:
-                aggregate += 1
-            else:
-                aggregate = 0
-
-        elif aggregatefunction == "cold":
-            dataSubset = convert.kelvin2celsius(dataSubset)
-            if dataSubset<common.coldTemp:
-                aggregate += 1
-            else:
-                aggregate = 0
-
-        elif aggregatefunction == "wet":
-            if dataSubset>common.wetPrecip:
-                aggregate += 1
-            else:
-                aggregate = 0
-
-        elif aggregatefunction == "dry":
-            if dataSubset<common.dryPrecip:
-                aggregate += 1
-            else:
-                aggregate = 0
-
-
-    return aggregate
 
-lat_bnds = [25.0, 26.0]
-lon_bnds = [-103, -102]
+if __name__ == "__main__":
+    #example queries
+    lat_bnds = [25.0, 26.0]
+    lon_bnds = [-103, -102]
 
-print(querySingleDateRectangle(date(2018, 1, 1), 'MAX_TMP_110_HTGL', lat_bnds, lon_bnds))
-#print(querySingleDateSingleCoordinate(date(2018, 1, 1), 'MAX_TMP_110_HTGL', 25.063, -107.938))
+    print(querySingleDateRectangle(date(2018, 1, 1), 'MAX_TMP_110_HTGL', lat_bnds, lon_bnds))
+    #print(querySingleDateSingleCoordinate(date(2018, 1, 1), 'MAX_TMP_110_HTGL', 25.063, -107.938))
 
-#print(queryAggregateDateRangeRectangle(date(2018, 1, 1), date(2018, 1, 3), 'AVG_MAX_MIN_TMP_110_HTGL', 'avg', lat_bnds, lon_bnds))
+    #print(queryAggregateDateRangeRectangle(date(2018, 1, 1), date(2018, 1, 3), 'AVG_MAX_MIN_TMP_110_HTGL', 'avg', lat_bnds, lon_bnds))
 
-#print(queryAggregateDateRangeSingleCoordinate(date(2018, 1, 1), date(2018, 1, 3), 'MAX_TMP_110_HTGL', 'min', 25.063, -107.938))
+    #print(queryAggregateDateRangeSingleCoordinate(date(2018, 1, 1), date(2018, 1, 3), 'MAX_TMP_110_HTGL', 'min', 25.063, -107.938))
 
 
-#print(queryConsecutiveHotColdDateRangeSingleCoordinate(date(2018, 1, 1), date(2018, 1, 3), 'AVG_MAX_MIN_TMP_110_HTGL', 'cold', 25.063, -107.938))
+    #print(queryConsecutiveHotColdDateRangeSingleCoordinate(date(2018, 1, 1), date(2018, 1, 3), 'AVG_MAX_MIN_TMP_110_HTGL', 'cold', 25.063, -107.938))
 
 
-#print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), date(2018, 1, 3), 'AVG_MAX_MIN_TMP_110_HTGL', 'hot', lat_bnds, lon_bnds))
-#print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), date(2018, 1, 3), 'AVG_MAX_MIN_TMP_110_HTGL', 'cold', lat_bnds, lon_bnds))
-#print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), date(2018, 1, 3), 'A_PCP_110_SFC_acc1h', 'wet', lat_bnds, lon_bnds))
-#print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), date(2018, 1, 3), 'A_PCP_110_SFC_acc1h', 'dry', lat_bnds, lon_bnds))
\ No newline at end of file
+    #print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), date(2018, 1, 3), 'AVG_MAX_MIN_TMP_110_HTGL', 'hot', lat_bnds, lon_bnds))
+    #print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), date(2018, 1, 3), 'AVG_MAX_MIN_TMP_110_HTGL', 'cold', lat_bnds, lon_bnds))
+    #print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), date(2018, 1, 3), 'A_PCP_110_SFC_acc1h', 'wet', lat_bnds, lon_bnds))
+    #print(queryConsecutiveDaysDateRangeRectangle(date(2018, 1, 1), date(2018, 1, 3), 'A_PCP_110_SFC_acc1h', 'dry', lat_bnds, lon_bnds))
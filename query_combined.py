@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module contains queries combining the NLDAS history with the GFS
+    forecast into one daily series
+
+    The history is read from the NLDAS files from the first date up to the
+    forecast issue date, then the forecast days are read from the GFS files
+    of the issue date (the same forecast days as the query_GFS date range
+    queries). Each coordinate is snapped to its NLDAS cell and the GFS
+    values are regridded to that cell (see regrid.py), so both parts of the
+    series describe the same area. The NLDAS and GFS files are read at the
+    same time by the fan_out worker processes.
+
+    Days whose file does not exist (NLDAS is published a few days late)
+    are masked and have no source.
+
+    variables with an equivalent in both products:
+        NLDAS                       GFS                             Description
+        MAX_TMP_110_HTGL            MAX_TMP_P0_L1_GLL0              Maximum temperature
+        MIN_TMP_110_HTGL            MIN_TMP_P0_L1_GLL0              Minimum temperature
+        AVG_MAX_MIN_TMP_110_HTGL    AVG_MAX_MIN_TMP_P0_L1_GLL0      Avg of Min/Max Temp
+        A_PCP_110_SFC_acc1h         APCP_P8_L1_GLL0_acc6h           Total Precipitation
+        DSWRF_110_SFC               DSWRF_P8_L1_GLL0_avg6h          Avg Downward shortwave radiation
+        U_GRD_110_HTGL              UGRD_P0_L104_GLL0               Avg u-component of wind
+        V_GRD_110_HTGL              VGRD_P0_L104_GLL0               Avg v-component of wind
+        WIND_SPEED                  WIND_SPEED                      Avg Wind Speed
+
+ """
+
+from datetime import date, timedelta
+import os
+import numpy as np
+import dataset_pool
+import fan_out
+import grid_index
+import query_engine
+import query_metrics
+import regrid
+
+#GFS variable of each NLDAS variable
+VARIABLES = {'MAX_TMP_110_HTGL': 'MAX_TMP_P0_L1_GLL0',
+             'MIN_TMP_110_HTGL': 'MIN_TMP_P0_L1_GLL0',
+             'AVG_MAX_MIN_TMP_110_HTGL': 'AVG_MAX_MIN_TMP_P0_L1_GLL0',
+             'A_PCP_110_SFC_acc1h': 'APCP_P8_L1_GLL0_acc6h',
+             'DSWRF_110_SFC': 'DSWRF_P8_L1_GLL0_avg6h',
+             'U_GRD_110_HTGL': 'UGRD_P0_L104_GLL0',
+             'V_GRD_110_HTGL': 'VGRD_P0_L104_GLL0',
+             'WIND_SPEED': 'WIND_SPEED'}
+
+
+def equivalentVariables(variable):
+    """
+    Get the NLDAS and GFS names of a variable
+
+    Parameters
+    ----------
+    variable : str
+        NLDAS or GFS variable name
+
+    Returns
+    -------
+    tuple
+        (NLDAS variable, GFS variable)
+
+    """
+    if variable in VARIABLES:
+        return variable, VARIABLES[variable]
+    for nldasVariable, gfsVariable in VARIABLES.items():
+        if gfsVariable == variable:
+            return nldasVariable, gfsVariable
+    raise ValueError('no NLDAS and GFS equivalent of ' + str(variable))
+
+
+def _existing(file_name_list, dates):
+    #positions, filenames and dates of the files that exist
+    keep = [k for k, filename in enumerate(file_name_list) if os.path.exists(filename)]
+    return keep, [file_name_list[k] for k in keep], [dates[k] for k in keep]
+
+
+def queryHistoryForecastMultiCoordinate(querystartdate, forecastdate, days, variable, lats, lons,
+                                        method='bilinear', tolerance=None, workers=None):
+    """
+    Query for one continuous daily series of NLDAS history then GFS forecast, one or many coordinates
+
+    will return the NLDAS values from querystartdate to forecastdate and
+    then the GFS forecast issued on forecastdate, regridded to the NLDAS cell
+    of each coordinate
+
+    Parameters
+    ----------
+    querystartdate : date
+        first day of the history
+    forecastdate : date
+        last day of the history and issue date of the forecast
+    days : int
+        number of days to forecast, see query_GFS.getfilenames
+    variable : str or str[]
+        NLDAS or GFS variable name (see VARIABLES), or a list of variables
+        read in the same pass, the results are then a dict by variable
+    lats : float or float[]
+        lat of the coordinate(s) in radians
+    lons : float or float[]
+        lon of the coordinate(s) in radians
+    method : str
+        bilinear or conservative, how the GFS values are regridded to the
+        NLDAS cell, see regrid.py
+    tolerance : float
+        max distance in degrees between a coordinate and the nearest NLDAS
+        grid cell, None for half a grid cell
+    workers : int
+        number of worker processes reading blocks of days of both products
+        in parallel, defaults to common.queryWorkers
+
+    Returns
+    -------
+    tuple[]
+        0 index is the date of each day
+        1 index is the source of each day: NLDAS, GFS or None if its file
+        does not exist
+        2 index is a (days x coordinates) array of results, (days) for a
+        single coordinate, masked on days without a file
+
+    """
+    spec = query_engine.QuerySpec(variable, querystartdate, end=forecastdate)
+    pairs = [equivalentVariables(name) for name in spec.variables]
+    nldasVariables = [nldasVariable for nldasVariable, gfsVariable in pairs]
+    gfsVariables = [gfsVariable for nldasVariable, gfsVariable in pairs]
+
+    with query_metrics.query('combined', 'series', variable):
+        history = query_engine.NLDAS.files(spec)
+        forecast = query_engine.GFS.files(query_engine.QuerySpec(variable, forecastdate, days=days))
+        historyKeep, historyFiles, historyDates = _existing(*history)
+        forecastKeep, forecastFiles, forecastDates = _existing(*forecast)
+        #the grids are read from the files, so both products need at least one
+        if not historyFiles:
+            raise ValueError('no NLDAS files from ' + querystartdate.isoformat() + ' to ' + forecastdate.isoformat())
+        if not forecastFiles:
+            raise ValueError('no GFS forecast files issued on ' + forecastdate.isoformat())
+
+        #snap the coordinates to their NLDAS cells, and find the GFS cells regridded to them
+        with dataset_pool.checkout(historyFiles[0]) as ds:
+            nldasGrid = grid_index.for_product('NLDAS', ds)
+        with dataset_pool.checkout(forecastFiles[0]) as ds:
+            gfsGrid = grid_index.for_product('GFS', ds)
+        latitudes = np.asarray(lats, dtype=np.float64)
+        latindex, lonindex, snappedLats, snappedLons = nldasGrid.locate(latitudes.ravel(), np.ravel(lons), tolerance)
+        regridWeights = regrid.for_grids('GFS', gfsGrid, 'NLDAS', nldasGrid, method)
+        gfsLatIndex, gfsLonIndex, matrix = regridWeights.cells(latindex, lonindex)
+
+        #read both products in the same parallel run
+        nldasValues, gfsValues = fan_out.stack_cells([(historyFiles, nldasVariables, latindex, lonindex),
+                                                      (forecastFiles, gfsVariables, gfsLatIndex, gfsLonIndex)],
+                                                     workers)
+
+        dates = history[1] + forecast[1]
+        sources = [None] * len(dates)
+        for k in historyKeep:
+            sources[k] = 'NLDAS'
+        for k in forecastKeep:
+            sources[len(history[1]) + k] = 'GFS'
+
+        results = []
+        with query_metrics.stage('reduce'):
+            for nldasValue, gfsValue in zip(nldasValues, gfsValues):
+                series = np.ma.masked_all((len(dates), len(latindex)), dtype=np.float32)
+                series[historyKeep] = nldasValue
+                valid = ~np.ma.getmaskarray(gfsValue)
+                weighted = np.where(valid, np.ma.getdata(gfsValue), 0.0) @ matrix.T
+                series[[len(history[1]) + k for k in forecastKeep]] = regrid.normalise(weighted, valid @ matrix.T)
+                results.append(series if latitudes.ndim else series[:, 0])
+
+    return [dates, sources, spec.results(results)]
+
+
+if __name__ == "__main__":
+    #example query
+    print(queryHistoryForecastMultiCoordinate(date(2018, 1, 1) - timedelta(days=5), date(2018, 1, 1), 5,
+                                              'MAX_TMP_110_HTGL', 31.0625, -99.9375))
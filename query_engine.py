@@ -0,0 +1,660 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module contains the query engine behind query_NLDAS and query_GFS
+
+    A DatasetDescriptor describes a product: how its netCDF files are named,
+    which grid it is on (see grid_index.PRODUCTS) and whether its time axis
+    is one file per day (NLDAS) or forecast leads from an issue date (GFS).
+    A QuerySpec describes one query: the variable, the dates, the rectangle,
+    coordinates or polygon region and the function to apply.
+
+    The QueryEngine of a descriptor runs every kind of query: the subset
+    reads, the reductions (fanned out over blocks of days, see fan_out.py),
+    the consecutive days tracking and the shortcuts through the time-major
+    archive for archived products. The functions of the query modules are
+    thin wrappers that build a QuerySpec.
+
+    Results are kept in result_cache.cache, keyed by the product, the kind
+    of query and the QuerySpec, and recomputed when one of the daily files
+    they were computed from is rewritten.
+
+    Usage:
+        engine = query_engine.QueryEngine(query_engine.NLDAS)
+        spec = query_engine.QuerySpec('ET', date(2018, 1, 1), end=date(2018, 1, 31),
+                                      function='avg', lat_bounds=[30, 33], lon_bounds=[-100, -96])
+        lats, lons, data = engine.aggregate(spec)
+
+ """
+
+import copy
+from datetime import datetime, time, timedelta
+import os
+import numpy as np
+import archive
+import common
+import consecutive_days
+import dataset_pool
+import fan_out
+import grid_index
+import query_metrics
+import regions
+import result_cache
+import zonal_stats
+
+
+class DatasetDescriptor:
+    """
+    Description of the daily netCDF files of a product
+
+    Parameters
+    ----------
+    product : str
+        product name, the key of its grid in grid_index.PRODUCTS
+    pattern : str
+        file name pattern, formatted with date (the file date), yday (its
+        day of the year) and lead (the forecast hours as 3 digits)
+    axis : str
+        date if there is one file per day, lead if the files are forecast
+        leads from an issue date
+    archived : bool
+        True if the product is kept in the time-major archive (see archive.py)
+    leads : int[]
+        forecast hours of the files of an issue date, for a lead axis
+
+    """
+
+    def __init__(self, product, pattern, axis, archived=False, leads=()):
+        self.product = product
+        self.pattern = pattern
+        self.axis = axis
+        self.archived = archived
+        self.leads = list(leads)
+
+    def filename(self, querydate, forecastinterval=None):
+        """
+        Get the netCDF filename of a date
+
+        Parameters
+        ----------
+        querydate : date
+            file date, the issue date for forecast files
+        forecastinterval : int
+            forecast hours, for forecast files
+
+        Returns
+        -------
+        str
+            netCDF filename
+
+        """
+        fullPath = os.path.dirname(os.path.abspath(__file__)) + common.netCDFpath
+        return fullPath + self.pattern.format(date=querydate, yday=querydate.timetuple().tm_yday,
+                                              lead=str(forecastinterval).zfill(3))
+
+    def files(self, spec):
+        """
+        Get the files of the date range of a query
+
+        Parameters
+        ----------
+        spec : QuerySpec
+            query with start and end (date axis) or start and days (lead axis)
+
+        Returns
+        -------
+        tuple
+            (filenames, date of each file), forecast files are dated by
+            their valid date
+
+        """
+        if self.axis == 'date':
+            dates = [spec.start + timedelta(days=i) for i in range((spec.end - spec.start).days + 1)]
+            return [self.filename(mydate) for mydate in dates], dates
+
+        #one forecast file per whole day after the issue date
+        leads = range(1, spec.days)
+        return ([self.filename(spec.start, i * 24) for i in leads],
+                [spec.start + timedelta(days=i) for i in leads])
+
+
+    def lead_files(self, spec):
+        """
+        Get the forecast files of an issue date
+
+        Parameters
+        ----------
+        spec : QuerySpec
+            query with start (the issue date) and forecastinterval, the
+            list of leads or None for every lead whose file exists
+
+        Returns
+        -------
+        tuple
+            (filenames, forecast hours, valid time of each file)
+
+        """
+        if self.axis != 'lead':
+            raise ValueError(self.product + ' files are not forecast leads')
+        if spec.forecastinterval is None:
+            leads = [lead for lead in self.leads if os.path.exists(self.filename(spec.start, lead))]
+        else:
+            leads = [int(lead) for lead in spec.forecastinterval]
+        if not leads:
+            raise ValueError('no forecast files of ' + spec.start.isoformat())
+
+        issued = datetime.combine(spec.start, time())
+        return ([self.filename(spec.start, lead) for lead in leads], leads,
+                [issued + timedelta(hours=lead) for lead in leads])
+
+
+NLDAS = DatasetDescriptor('NLDAS', 'NLDAS_{date:%Y}_{yday:03d}.nc', 'date', archived=True)
+GFS = DatasetDescriptor('GFS', 'GFS_{date:%Y%m%d}_{lead}.nc', 'lead',
+                        leads=range(0, common.GFSMaxLead + 1, common.GFSLeadStep))
+
+
+class QuerySpec:
+    """
+    Description of a query
+
+    Parameters
+    ----------
+    variable : str or str[]
+        variable to query from the netCDF files, or a list of variables read
+        in the same pass whose results are returned in a dict by variable
+    start : date
+        date queried, first day of a range, or forecast issue date
+    end : date
+        last day of a range, for products with a date axis
+    days : int
+        number of forecast days, for products with a lead axis
+    forecastinterval : int or int[]
+        forecast hours of a single date query, or the leads of a forecast
+        curve, for products with a lead axis
+    lat_bounds : float[]
+        lower and upper bounds for lat of a rectangle
+    lon_bounds : float[]
+        lower and upper bounds for lon of a rectangle
+    lat : float or float[]
+        lat of the coordinate(s), when not querying a rectangle
+    lon : float or float[]
+        lon of the coordinate(s), when not querying a rectangle
+    function : str or str[]
+        aggregate function (see reducers.py) or consecutive days function
+        (see consecutive_days.py), or one function per variable
+    method : str
+        nearest or bilinear, see grid_index.read_point
+    tolerance : float
+        max distance in degrees between a coordinate and the nearest grid
+        cell, None for half a grid cell
+    workers : int
+        number of worker processes for date ranges, see fan_out.py
+    region : dict or list
+        polygon region, when querying a region, see regions.py
+    statistics : bool
+        True to reduce a region to its weighted statistics rather than
+        return its cells
+
+    """
+
+    def __init__(self, variable, start, end=None, days=None, forecastinterval=None,
+                 lat_bounds=None, lon_bounds=None, lat=None, lon=None, function=None,
+                 method='nearest', tolerance=None, workers=None, region=None, statistics=False):
+        self.variable = variable
+        self.start = start
+        self.end = end
+        self.days = days
+        self.forecastinterval = forecastinterval
+        self.lat_bounds = lat_bounds
+        self.lon_bounds = lon_bounds
+        self.lat = lat
+        self.lon = lon
+        self.function = function
+        self.method = method
+        self.tolerance = tolerance
+        self.workers = workers
+        self.region = region
+        self.statistics = statistics
+
+    @property
+    def rectangle(self):
+        """
+        True if the query is over a rectangle rather than coordinates
+        """
+        return self.lat_bounds is not None
+
+    @property
+    def multiple(self):
+        """
+        True if the query is for a list of variables
+        """
+        return isinstance(self.variable, (list, tuple))
+
+    @property
+    def variables(self):
+        """
+        Variables of the query as a list
+        """
+        return list(self.variable) if self.multiple else [self.variable]
+
+    @property
+    def functions(self):
+        """
+        Function of each variable, a single function applies to all of them
+        """
+        if self.function is None or isinstance(self.function, str):
+            return [self.function] * len(self.variables)
+        if len(self.function) != len(self.variables):
+            raise ValueError('expected one function per variable')
+        return list(self.function)
+
+    def results(self, values):
+        """
+        Result of each variable, as a dict by variable for a list of variables
+        """
+        return dict(zip(self.variables, values)) if self.multiple else values[0]
+
+    def key(self):
+        """
+        Key of the query in the result cache, every field except workers,
+        which does not change the result
+        """
+        return tuple(_plain(getattr(self, name)) for name in
+                     ('variable', 'start', 'end', 'days', 'forecastinterval', 'lat_bounds', 'lon_bounds',
+                      'lat', 'lon', 'function', 'method', 'tolerance'))
+
+
+def _plain(value):
+    #same repr for equal lists, tuples, arrays and numpy scalars
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return tuple(_plain(v) for v in value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class QueryEngine:
+    """
+    Runs queries against the files of a dataset
+
+    Parameters
+    ----------
+    descriptor : DatasetDescriptor
+        dataset to query
+
+    """
+
+    def __init__(self, descriptor):
+        self.descriptor = descriptor
+
+    def _archived(self, spec):
+        #the archive holds whole days of date axis products, read at the nearest cell
+        return self.descriptor.archived and (spec.rectangle or spec.method == 'nearest')
+
+    def locate(self, spec):
+        """
+        Find the grid cell a coordinate snaps to
+
+        Returns
+        -------
+        tuple
+            (lat index, lon index, snapped lat, snapped lon)
+
+        """
+        with dataset_pool.checkout(self.descriptor.filename(spec.start, spec.forecastinterval)) as ds:
+            grid = grid_index.for_product(self.descriptor.product, ds)
+
+        return grid.locate(spec.lat, spec.lon, spec.tolerance)
+
+    def _cached(self, kind, spec, file_name_list, query):
+        """
+        Get a result from the result cache, or run the query and cache it
+
+        Parameters
+        ----------
+        kind : str
+            kind of query, the name of the public method
+        spec : QuerySpec
+            query
+        file_name_list : str[]
+            daily netCDF files the result is computed from
+        query : function
+            runs the query, called as query(spec)
+
+        """
+        with query_metrics.query(self.descriptor.product, kind, spec.variable):
+            if not common.resultCache:
+                return query(spec)
+
+            key = (self.descriptor.product, kind) + spec.key()
+            with query_metrics.stage('cache'):
+                hit, result = result_cache.cache.get(key, file_name_list)
+            query_metrics.count('cache_hits' if hit else 'cache_misses')
+            if not hit:
+                result = query(spec)
+                with query_metrics.stage('cache'):
+                    result_cache.cache.put(key, file_name_list, result)
+            return result
+
+    def _regional(self, spec, query):
+        """
+        Run a rectangle query over the cells bounding a region, then mask
+        the cells outside the region or reduce them to its statistics
+
+        Returns
+        -------
+        list or dict
+            [lats, lons, masked values] or the statistics of the region (see
+            regions.RegionMask.statistics), by variable for a list of
+            variables
+
+        """
+        with query_metrics.query(self.descriptor.product, query.__name__, spec.variable):
+            #the grid is read from the first file of the query
+            if spec.end is None and spec.days is None:
+                filename = self.descriptor.filename(spec.start, spec.forecastinterval)
+            else:
+                filename = self.descriptor.files(spec)[0][0]
+            with dataset_pool.checkout(filename) as ds:
+                grid = grid_index.for_product(self.descriptor.product, ds)
+            with query_metrics.stage('index'):
+                regionMask = regions.for_region(self.descriptor.product, grid, spec.region)
+
+            bounded = copy.copy(spec)
+            bounded.region = None
+            bounded.lat_bounds, bounded.lon_bounds = regionMask.lat_bounds, regionMask.lon_bounds
+            returnLatTuple, returnLonTuple, values = query(bounded)
+
+            reduce = regionMask.statistics if spec.statistics else regionMask.mask
+            with query_metrics.stage('reduce'):
+                values = {variable: reduce(value) for variable, value in values.items()} if spec.multiple else reduce(values)
+            return values if spec.statistics else [returnLatTuple, returnLonTuple, values]
+
+    def read(self, spec):
+        """
+        Read one or more variables on a single date
+
+        Returns
+        -------
+        list or float
+            [lats, lons, values] for a rectangle or region, the value for a
+            coordinate, with a dict of values by variable for a list of
+            variables, see _regional for region statistics
+
+        """
+        if spec.region is not None:
+            return self._regional(spec, self.read)
+        return self._cached('read', spec, [self.descriptor.filename(spec.start, spec.forecastinterval)], self._read)
+
+    def _read(self, spec):
+        with dataset_pool.checkout(self.descriptor.filename(spec.start, spec.forecastinterval)) as ds:
+            if not spec.rectangle:
+                #read the value at the grid cell nearest to the coordinate, or interpolate it
+                return spec.results([grid_index.read_point(ds, self.descriptor.product, variable, spec.lat, spec.lon,
+                                                           spec.method, spec.tolerance) for variable in spec.variables])
+
+            #look up the index slices of the rectangle on the shared grid index
+            grid = grid_index.for_product(self.descriptor.product, ds)
+            latslice, lonslice = grid.slices(spec.lat_bounds, spec.lon_bounds)
+            returnLatTuple, returnLonTuple = grid.coordinates(latslice, lonslice)
+
+            #grab the dataset for each variable name and the rectangle
+            with query_metrics.stage('read'):
+                dataSubsets = [ds.variables[variable][latslice, lonslice] for variable in spec.variables]
+        for dataSubset in dataSubsets:
+            query_metrics.record_read(dataSubset)
+
+        return [returnLatTuple, returnLonTuple, spec.results(dataSubsets)]
+
+    def _aggregate_archive(self, spec, variable, function):
+        """
+        Aggregate a variable over a date range from the archive, None if it
+        does not cover it
+        """
+        days = (spec.end - spec.start).days + 1
+        if spec.rectangle:
+            where = (spec.lat_bounds, spec.lon_bounds)
+            readTotals, readExtreme, readSeries = archive.read_box_totals, archive.read_box_extreme, archive.read_box_series
+        else:
+            where = (spec.lat, spec.lon, spec.tolerance)
+            readTotals, readExtreme, readSeries = archive.read_point_totals, archive.read_point_extreme, archive.read_point_series
+
+        #an average, sum or count only needs two reads of the running totals
+        if function in ("avg", "sum", "count"):
+            totals = readTotals(variable, spec.start, spec.end, *where)
+            if totals is not None:
+                return totals[:-2] + (archive.reduce_totals(totals[-2], totals[-1], days, function),)
+
+        #a min or max combines O(log n) precomputed blocks
+        if function in ("min", "max"):
+            extreme = readExtreme(variable, spec.start, spec.end, function, *where)
+            if extreme is not None:
+                return extreme if spec.rectangle else (extreme,)
+
+        #otherwise reduce the daily series read from the archive
+        series = readSeries(variable, spec.start, spec.end, *where)
+        if series is not None:
+            if spec.rectangle:
+                return series[:2] + (archive.reduce_series(series[2], function),)
+            return (archive.reduce_series(series, function),)
+        return None
+
+    def aggregate(self, spec):
+        """
+        Aggregate one or more variables over a date range
+
+        Returns
+        -------
+        list or float
+            [lats, lons, aggregated values] for a rectangle or region, the
+            aggregated value for a coordinate, with a dict of values by
+            variable for a list of variables, see _regional for region
+            statistics
+
+        """
+        if spec.region is not None:
+            return self._regional(spec, self.aggregate)
+        return self._cached('aggregate', spec, self.descriptor.files(spec)[0], self._aggregate)
+
+    def _aggregate(self, spec):
+        #aggregate the variables the archive covers from it, the others from the daily files
+        archived = [None] * len(spec.variables)
+        if self._archived(spec):
+            archived = [self._aggregate_archive(spec, variable, function)
+                        for variable, function in zip(spec.variables, spec.functions)]
+        missing = [k for k, result in enumerate(archived) if result is None]
+
+        if missing:
+            file_name_list, dates = self.descriptor.files(spec)
+            variables = [spec.variables[k] for k in missing]
+            functions = [spec.functions[k] for k in missing]
+
+            #reduce blocks of days in parallel and merge them in date order
+            if spec.rectangle:
+                returnLatTuple, returnLonTuple, values = fan_out.aggregate_rectangle(
+                    self.descriptor.product, file_name_list, variables, functions,
+                    spec.lat_bounds, spec.lon_bounds, spec.workers)
+                for k, value in zip(missing, values):
+                    archived[k] = (returnLatTuple, returnLonTuple, value)
+            else:
+                values = fan_out.aggregate_point(self.descriptor.product, file_name_list, variables, functions,
+                                                 spec.lat, spec.lon, spec.method, spec.tolerance, spec.workers)
+                for k, value in zip(missing, values):
+                    archived[k] = (value,)
+
+        if spec.rectangle:
+            return list(archived[0][:2]) + [spec.results([result[2] for result in archived])]
+        return spec.results([result[0][()] for result in archived])
+
+    def consecutive(self, spec):
+        """
+        Track the runs of consecutive qualifying days over a date range
+
+        Returns
+        -------
+        list or int
+            for a rectangle [lats, lons, trailing run, longest run, longest
+            run start date, qualifying day count], for a coordinate the
+            trailing run; for a list of variables [lats, lons, dict of the
+            four results by variable] for a rectangle, a dict of trailing
+            runs by variable for a coordinate
+
+        """
+        return self._cached('consecutive', spec, self.descriptor.files(spec)[0], self._consecutive)
+
+    def _consecutive(self, spec):
+        file_name_list, dates = self.descriptor.files(spec)
+
+        #read each variable from the time-major archive when it covers the range
+        series = [None] * len(spec.variables)
+        if self._archived(spec):
+            if spec.rectangle:
+                series = [archive.read_box_series(variable, spec.start, spec.end, spec.lat_bounds, spec.lon_bounds)
+                          for variable in spec.variables]
+            else:
+                series = [archive.read_point_series(variable, spec.start, spec.end, spec.lat, spec.lon, spec.tolerance)
+                          for variable in spec.variables]
+
+        trackers = [None] * len(spec.variables)
+        for k, (variableSeries, function) in enumerate(zip(series, spec.functions)):
+            if variableSeries is None:
+                continue
+            if spec.rectangle:
+                returnLatTuple, returnLonTuple, variableSeries = variableSeries
+
+            #update the runs of every cell with the qualifying cells of each day
+            trackers[k] = consecutive_days.RunTracker(variableSeries.shape[1:])
+            with query_metrics.stage('reduce'):
+                for dataSubset in variableSeries:
+                    trackers[k].update(*consecutive_days.qualifying(dataSubset, function))
+
+        missing = [k for k, tracker in enumerate(trackers) if tracker is None]
+        if missing:
+            variables = [spec.variables[k] for k in missing]
+            functions = [spec.functions[k] for k in missing]
+            if spec.rectangle:
+                #track blocks of days in parallel and merge them in date order
+                returnLatTuple, returnLonTuple, tracked = fan_out.track_rectangle(
+                    self.descriptor.product, file_name_list, variables, functions,
+                    spec.lat_bounds, spec.lon_bounds, spec.workers)
+            else:
+                tracked = fan_out.track_point(self.descriptor.product, file_name_list, variables, functions,
+                                              spec.lat, spec.lon, spec.method, spec.tolerance, spec.workers)
+            for k, tracker in zip(missing, tracked):
+                trackers[k] = tracker
+
+        if not spec.rectangle:
+            return spec.results([int(tracker.current) for tracker in trackers])
+
+        results = [list(tracker.results(dates)) for tracker in trackers]
+        if spec.multiple:
+            return [returnLatTuple, returnLonTuple, spec.results(results)]
+        return [returnLatTuple, returnLonTuple] + results[0]
+
+    def zonal(self, spec, labels):
+        """
+        Compute statistics of many regions for every day of a range
+
+        Parameters
+        ----------
+        spec : QuerySpec
+            query of the variable and date range, function is the list of
+            statistics (see zonal_stats.STATISTICS), None for all of them
+        labels : ndarray
+            integer label raster on the grid, see zonal_stats.Zones
+
+        Returns
+        -------
+        tuple
+            (label of each region, date of each day, dict of a (regions x
+            days) MaskedArray for each statistic)
+
+        """
+        with query_metrics.query(self.descriptor.product, 'zonal', spec.variable):
+            file_name_list, dates = self.descriptor.files(spec)
+            statistics = zonal_stats.STATISTICS if spec.function is None else spec.function
+            regionLabels, table = zonal_stats.reduce_files(file_name_list, spec.variable, labels, statistics, spec.workers)
+            return regionLabels, dates, table
+
+    def curve(self, spec):
+        """
+        Read one or more variables at every forecast lead of an issue date
+
+        The leads are spec.forecastinterval, or every lead whose file
+        exists, read in blocks in parallel (see fan_out.py).
+
+        Returns
+        -------
+        list
+            for a rectangle [valid times, lats, lons, (lead x lat x lon)
+            values], for coordinates [valid times, (lead x coordinates)
+            values, (lead) for a single coordinate], with a dict of values
+            by variable for a list of variables
+
+        """
+        file_name_list, leads, validTimes = self.descriptor.lead_files(spec)
+        #the resolved leads are part of the cache key, a new lead file is a new query
+        leadSpec = copy.copy(spec)
+        leadSpec.forecastinterval = leads
+        return self._cached('curve', leadSpec, file_name_list, self._curve)
+
+    def _curve(self, spec):
+        file_name_list, leads, validTimes = self.descriptor.lead_files(spec)
+        if spec.rectangle:
+            returnLatTuple, returnLonTuple, values = fan_out.stack_rectangle(
+                self.descriptor.product, file_name_list, spec.variables, spec.lat_bounds, spec.lon_bounds, spec.workers)
+            return [validTimes, returnLatTuple, returnLonTuple, spec.results(values)]
+
+        lats = np.asarray(spec.lat, dtype=np.float64)
+        lons = np.asarray(spec.lon, dtype=np.float64)
+        values = fan_out.stack_points(self.descriptor.product, file_name_list, spec.variables,
+                                      lats.ravel(), lons.ravel(), spec.tolerance, spec.workers)
+        if lats.ndim == 0:
+            values = [value[:, 0] for value in values]
+        return [validTimes, spec.results(values)]
+
+    def series(self, spec):
+        """
+        Read the daily values of one or more variables at many coordinates
+
+        Returns
+        -------
+        MaskedArray
+            (coordinates x days x variables) array of results
+
+        """
+        return self._cached('series', spec, self.descriptor.files(spec)[0], self._series)
+
+    def _series(self, spec):
+        variables = spec.variables
+        lats = np.asarray(spec.lat, dtype=np.float64).ravel()
+        lons = np.asarray(spec.lon, dtype=np.float64).ravel()
+
+        #read each variable from the time-major archive when it covers the range
+        if self.descriptor.archived:
+            series = [archive.read_point_series(variable, spec.start, spec.end, lats, lons, spec.tolerance)
+                      for variable in variables]
+            if all(s is not None for s in series):
+                return np.ma.stack(series, axis=-1).transpose(1, 0, 2)
+
+        file_name_list, dates = self.descriptor.files(spec)
+
+        aggregate = np.ma.masked_all((len(lats), len(file_name_list), len(variables)), dtype=np.float32)
+
+        for day, filename in enumerate(file_name_list):
+            with dataset_pool.checkout(filename) as ds:
+                #snap every coordinate to its grid cell once
+                if day == 0:
+                    grid = grid_index.for_product(self.descriptor.product, ds)
+                    latindex, lonindex, snappedLats, snappedLons = grid.locate(lats, lons, spec.tolerance)
+
+                #gather all coordinates from a single read of each variable
+                for k, variable in enumerate(variables):
+                    aggregate[:, day, k] = grid_index.read_points(ds, variable, latindex, lonindex)
+
+        return aggregate
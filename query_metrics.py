@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module contains the opt-in instrumentation of the queries
+
+    When common.queryMetrics is True every query run by the query engine
+    records a Report: the wall time of the query and of each stage, and
+    counters of the work done. The report of the last query of a thread is
+    returned by last_report(), and every report is added to process-wide
+    totals that can be written in the Prometheus text format, to
+    common.queryMetricsFile at most every common.queryMetricsInterval
+    seconds or with write_prometheus().
+
+    Stages:
+        open            opening (or checking out) netCDF files
+        coordinates     reading the lat/lon coordinates to build a grid index
+        index           turning bounds and coordinates into array indices
+        read            reading the data of the variables
+        reduce          reducing the days (reducers, run trackers, archive totals)
+        cache           looking up and storing results in the result cache
+
+    Counters:
+        bytes_read      bytes of variable data read
+        files_opened    netCDF files opened
+        dataset_hits    checkouts served by an already open file
+        cache_hits      results served by the result cache
+        cache_misses    results computed because they were not cached
+
+    Blocks of days run in worker processes (see fan_out.py) record their
+    stages and counters there and return them to the query, so the stage
+    times add up the time of every worker.
+
+ """
+
+from collections import defaultdict
+from contextlib import contextmanager
+import os
+import threading
+import time
+import common
+
+STAGES = ('open', 'coordinates', 'index', 'read', 'reduce', 'cache')
+COUNTERS = ('bytes_read', 'files_opened', 'dataset_hits', 'cache_hits', 'cache_misses')
+
+
+class Report:
+    """
+    The measurements of one query
+
+    Parameters
+    ----------
+    product : str
+        NLDAS or GFS
+    kind : str
+        kind of query, the name of the query engine method
+    variable : str or str[]
+        variable(s) of the query
+
+    """
+
+    def __init__(self, product=None, kind=None, variable=None):
+        self.product = product
+        self.kind = kind
+        self.variable = variable
+        self.wall = 0.0
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def add(self, other):
+        """
+        Add the stage times and counters of another report
+        """
+        for name, seconds in other.stages.items():
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+        for name, value in other.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self):
+        """
+        Get the report as plain values
+
+        Returns
+        -------
+        dict
+            product, kind, variable, wall seconds, seconds of each stage and
+            the counters
+
+        """
+        return {'product': self.product, 'kind': self.kind, 'variable': self.variable, 'wall': self.wall,
+                'stages': dict(self.stages), 'counters': dict(self.counters)}
+
+    def __repr__(self):
+        return 'Report(%r)' % (self.as_dict(),)
+
+
+_local = threading.local()
+_lock = threading.Lock()
+#process-wide totals by (product, kind)
+_queries = defaultdict(int)
+_totals = defaultdict(Report)
+_lastWrite = 0.0
+
+
+def active():
+    """
+    True if the current thread is recording a report
+    """
+    return getattr(_local, 'report', None) is not None
+
+
+@contextmanager
+def stage(name):
+    """
+    Add the wall time of the with block to a stage of the current report
+    """
+    report = getattr(_local, 'report', None)
+    if report is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        report.stages[name] += time.perf_counter() - start
+
+
+def count(name, value=1):
+    """
+    Add to a counter of the current report
+    """
+    report = getattr(_local, 'report', None)
+    if report is not None:
+        report.counters[name] += value
+
+
+def record_read(data):
+    """
+    Count the bytes of data read from a file
+    """
+    report = getattr(_local, 'report', None)
+    if report is not None:
+        report.counters['bytes_read'] += getattr(data, 'nbytes', 0)
+
+
+@contextmanager
+def collect():
+    """
+    Record a report of the with block, used by the worker processes
+
+    Yields
+    ------
+    Report
+        the report being recorded
+
+    """
+    previous = getattr(_local, 'report', None)
+    _local.report = Report()
+    try:
+        yield _local.report
+    finally:
+        _local.report = previous
+
+
+def merge(report):
+    """
+    Add a report recorded elsewhere (a worker process) to the current report
+    """
+    current = getattr(_local, 'report', None)
+    if current is not None:
+        current.add(report)
+
+
+@contextmanager
+def query(product, kind, variable):
+    """
+    Record the report of a query, if common.queryMetrics is True
+
+    A query run inside another query is recorded in the outer report.
+
+    Parameters
+    ----------
+    product : str
+        NLDAS or GFS
+    kind : str
+        kind of query
+    variable : str or str[]
+        variable(s) of the query
+
+    """
+    if not common.queryMetrics or active():
+        yield
+        return
+
+    report = Report(product, kind, variable)
+    _local.report = report
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        report.wall = time.perf_counter() - start
+        _local.report = None
+        _local.last = report
+        with _lock:
+            _queries[(product, kind)] += 1
+            _totals[(product, kind)].wall += report.wall
+            _totals[(product, kind)].add(report)
+        if common.queryMetricsFile is not None and time.time() - _lastWrite >= common.queryMetricsInterval:
+            write_prometheus()
+
+
+def last_report():
+    """
+    Get the report of the last query of the current thread
+
+    Returns
+    -------
+    Report
+        report of the last query, None if no query was recorded
+
+    """
+    return getattr(_local, 'last', None)
+
+
+def prometheus():
+    """
+    Get the process-wide totals in the Prometheus text format
+
+    Returns
+    -------
+    str
+        counters labelled by product and kind of query
+
+    """
+    lines = []
+
+    def family(name, help, samples):
+        lines.append('# HELP %s %s' % (name, help))
+        lines.append('# TYPE %s counter' % name)
+        for labels, value in samples:
+            text = ','.join('%s="%s"' % (key, labelValue) for key, labelValue in labels)
+            lines.append('%s{%s} %s' % (name, text, repr(float(value)) if isinstance(value, float) else value))
+
+    with _lock:
+        keys = sorted(_queries)
+        family('pair_queries_total', 'Queries run.',
+               [((('product', p), ('kind', k)), _queries[(p, k)]) for p, k in keys])
+        family('pair_query_seconds_total', 'Wall time of the queries.',
+               [((('product', p), ('kind', k)), _totals[(p, k)].wall) for p, k in keys])
+        family('pair_query_stage_seconds_total', 'Time spent in each stage of the queries, summed over workers.',
+               [((('product', p), ('kind', k), ('stage', s)), _totals[(p, k)].stages[s]) for p, k in keys for s in STAGES])
+        for counter in COUNTERS:
+            family('pair_query_%s_total' % counter, counter.replace('_', ' ').capitalize() + '.',
+                   [((('product', p), ('kind', k)), _totals[(p, k)].counters[counter]) for p, k in keys])
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(filename=None):
+    """
+    Write the process-wide totals to a Prometheus text file
+
+    The file is replaced atomically, so it can be read by the node exporter
+    textfile collector at any time.
+
+    Parameters
+    ----------
+    filename : str
+        file to write, defaults to common.queryMetricsFile
+
+    """
+    global _lastWrite
+    if filename is None:
+        filename = common.queryMetricsFile
+    tmpFilename = filename + '.' + str(os.getpid()) + '.tmp'
+    with open(tmpFilename, 'w') as f:
+        f.write(prometheus())
+    os.replace(tmpFilename, filename)
+    _lastWrite = time.time()
+
+
+def reset():
+    """
+    Clear the process-wide totals
+    """
+    with _lock:
+        _queries.clear()
+        _totals.clear()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module contains a content-addressed store for the raw GRB files
+    downloaded from the web
+
+    Every downloaded file is kept once under its SHA-256 digest and linked
+    into the mirrored directory trees the hourly_to_daily_* modules read.
+    An index records the ETag, Last-Modified and size the server sent for
+    each url, so a later fetch of the same url is a conditional request
+    that only transfers the file again if it changed upstream.
+
+    Layout of the store (common.rawStorePath):
+        index.sqlite        url -> digest, etag, last modified, size, and
+                            mirrored path -> digest of every link made
+        objects/AB/ABCD...  file contents, named by SHA-256 digest
+        tmp/                partial downloads
+        locks/              one lock file per url being fetched, and the
+                            store lock
+
+    The index is a sqlite database and fetches of the same url are
+    serialised with a file lock, so several backfill jobs running on the
+    same machine can share one store. Fetches hold the store lock shared
+    and prune holds it exclusively, so an object is never pruned between
+    being stored and being linked.
+
+ """
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import fcntl
+import glob
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+import common
+import downloader
+
+
+class RawStore:
+    """
+    Content-addressed store of downloaded files
+
+    Parameters
+    ----------
+    path : str
+        directory of the store, created if it does not exist
+
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.dirname(os.path.abspath(__file__)) + common.rawStorePath
+        self.path = path
+        for directory in ('objects', 'tmp', 'locks'):
+            os.makedirs(os.path.join(path, directory), exist_ok=True)
+
+        self.indexPath = os.path.join(path, 'index.sqlite')
+        with self._connect() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS files ('
+                       'url TEXT PRIMARY KEY, digest TEXT NOT NULL, etag TEXT, last_modified TEXT, '
+                       'size INTEGER NOT NULL, fetched REAL NOT NULL)')
+            db.execute('CREATE TABLE IF NOT EXISTS links ('
+                       'path TEXT PRIMARY KEY, digest TEXT NOT NULL, copied INTEGER NOT NULL)')
+
+    def _connect(self):
+        return sqlite3.connect(self.indexPath, timeout=60)
+
+    @contextmanager
+    def _store_lock(self, operation):
+        #shared by fetches, exclusive for prune
+        with open(os.path.join(self.path, 'locks', 'store'), 'w') as lock:
+            fcntl.flock(lock, operation)
+            yield
+
+    def _object_path(self, digest):
+        return os.path.join(self.path, 'objects', digest[:2], digest)
+
+    def _url_key(self, url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def lookup(self, url):
+        """
+        Get the index record for a url
+
+        Parameters
+        ----------
+        url : str
+            url of the file
+
+        Returns
+        -------
+        dict
+            digest, etag, last_modified, size and fetched (epoch seconds)
+            of the stored copy, None if the url has never been fetched
+
+        """
+        with self._connect() as db:
+            row = db.execute('SELECT digest, etag, last_modified, size, fetched FROM files WHERE url = ?',
+                             (url,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('digest', 'etag', 'last_modified', 'size', 'fetched'), row))
+
+    def _record(self, url, digest, headers, size):
+        with self._connect() as db:
+            db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)',
+                       (url, digest, headers.get('ETag'), headers.get('Last-Modified'), size, time.time()))
+
+    def _add_object(self, tmpPath):
+        """
+        Move a downloaded file into the store and return its digest
+        """
+        sha = hashlib.sha256()
+        with open(tmpPath, 'rb') as f:
+            for chunk in iter(lambda: f.read(common.downloadChunkSize), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+
+        objectPath = self._object_path(digest)
+        if os.path.exists(objectPath):
+            os.remove(tmpPath)
+        else:
+            os.makedirs(os.path.dirname(objectPath), exist_ok=True)
+            os.replace(tmpPath, objectPath)
+        return digest
+
+    def _link(self, digest, path):
+        """
+        Make path point at a stored object, hard linking where possible
+        """
+        objectPath = self._object_path(digest)
+        if os.path.exists(path):
+            if os.path.samefile(objectPath, path):
+                return
+            os.remove(path)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        copied = False
+        try:
+            os.link(objectPath, path)
+        except OSError:
+            #the mirrored tree is on another file system
+            shutil.copyfile(objectPath, path)
+            copied = True
+
+        #copies do not show in the link count of the object, prune checks the links recorded here
+        with self._connect() as db:
+            db.execute('INSERT OR REPLACE INTO links VALUES (?, ?, ?)', (os.path.abspath(path), digest, int(copied)))
+
+    def fetch(self, fetcher, url, path):
+        """
+        Make path hold the current upstream copy of url
+
+        A url already in the store is revalidated with If-None-Match /
+        If-Modified-Since and only downloaded again if it changed.
+
+        Parameters
+        ----------
+        fetcher : downloader.Downloader
+            downloader used for the request
+        url : str
+            url of the file
+        path : str
+            local file to link the stored copy to
+
+        Returns
+        -------
+        downloader.DownloadResult
+            outcome of the request, status is 304 if the stored copy was reused
+
+        """
+        key = self._url_key(url)
+        with self._store_lock(fcntl.LOCK_SH), open(os.path.join(self.path, 'locks', key), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            tmpPath = os.path.join(self.path, 'tmp', key)
+            record = self.lookup(url)
+            headers = {}
+            if record is not None and os.path.exists(self._object_path(record['digest'])):
+                if record['etag']:
+                    headers['If-None-Match'] = record['etag']
+                if record['last_modified']:
+                    headers['If-Modified-Since'] = record['last_modified']
+                #a partial file left over from an older version must not be resumed
+                for leftover in (tmpPath + '.part', tmpPath + '.part.validator'):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+            else:
+                record = None
+
+            result = fetcher.download(url, tmpPath, headers)
+            if not result.ok:
+                return result._replace(path=path)
+
+            if result.status == 304:
+                digest = record['digest']
+            else:
+                size = os.path.getsize(tmpPath)
+                digest = self._add_object(tmpPath)
+                self._record(url, digest, result.headers, size)
+
+            self._link(digest, path)
+            return result._replace(path=path)
+
+    def fetch_all(self, fetcher, jobs):
+        """
+        Fetch a list of urls concurrently through the store
+
+        Parameters
+        ----------
+        fetcher : downloader.Downloader
+            downloader used for the requests
+        jobs : list
+            (url, path) tuples to fetch
+
+        Returns
+        -------
+        downloader.DownloadResult[]
+            one result per job, in the same order as jobs
+
+        """
+        with ThreadPoolExecutor(max_workers=fetcher.workers) as pool:
+            results = list(pool.map(lambda job: self.fetch(fetcher, job[0], job[1]), jobs))
+
+        if isinstance(fetcher.session, downloader.EarthdataSession):
+            fetcher.session.save_cookies()
+
+        return results
+
+    def _linked(self, db, digest, objectPath):
+        """
+        True if a mirrored path still holds the stored object
+        """
+        live = False
+        for path, copied in db.execute('SELECT path, copied FROM links WHERE digest = ?', (digest,)).fetchall():
+            try:
+                if copied:
+                    #a copy is still in use while its size matches the object
+                    holds = os.path.getsize(path) == os.path.getsize(objectPath)
+                else:
+                    holds = os.path.samefile(path, objectPath)
+            except OSError:
+                holds = False
+            if holds:
+                live = True
+            else:
+                db.execute('DELETE FROM links WHERE path = ?', (path,))
+        return live
+
+    def prune(self):
+        """
+        Remove stored files that are no longer linked into any mirrored tree
+
+        An object is kept while another hard link to it exists or a
+        mirrored path recorded for it still holds it (hard link or copy).
+        The store lock is held exclusively, so fetches in progress finish
+        linking their objects first.
+
+        Returns
+        -------
+        int
+            number of bytes freed
+
+        """
+        freed = 0
+        with self._store_lock(fcntl.LOCK_EX), self._connect() as db:
+            for objectPath in glob.glob(os.path.join(self.path, 'objects', '*', '*')):
+                digest = os.path.basename(objectPath)
+                stat = os.stat(objectPath)
+                if stat.st_nlink > 1 or self._linked(db, digest, objectPath):
+                    continue
+                os.remove(objectPath)
+                db.execute('DELETE FROM files WHERE digest = ?', (digest,))
+                freed += stat.st_size
+        return freed
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module contains the streaming reducers used by the aggregate queries
+
+    A reducer is created for the shape of the query result, updated with
+    one day of data at a time and holds only fixed size per cell state, so
+    a decade long range is reduced in the same memory as a single day.
+    Two reducers over different days can be merged, so ranges can be
+    reduced in pieces.
+
+    Aggregate functions:
+        min, max, avg   masked where the cell is masked on any day, as the
+                        queries have always done
+        sum             sum of the valid days
+        count           number of valid days
+        std             population standard deviation of the valid days
+                        (Welford, merged with Chan et al.)
+        pNN             approximate NNth percentile of the valid days, for
+                        example p50 or p95, from a per-cell reservoir sample
+                        of common.percentileSamples days
+
+    sum, std and the percentiles are masked where a cell has no valid days.
+
+    Usage:
+        reducer = reducers.create('std', dataSubset.shape)
+        for each day:
+            reducer.update(dataSubset)
+        result = reducer.result()
+
+ """
+
+import numpy as np
+import common
+
+
+class Reducer:
+    """
+    Base class of the streaming reducers
+
+    Parameters
+    ----------
+    shape : tuple
+        shape of one day of data (() for a single coordinate)
+
+    """
+
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        self.days = 0
+
+    def update(self, data):
+        """
+        Add one day of data
+
+        Parameters
+        ----------
+        data : MaskedArray
+            values of the day, masked where there is no data
+
+        """
+        data = np.ma.asarray(data)
+        self._update(np.ma.getdata(data), ~np.ma.getmaskarray(data))
+        self.days += 1
+
+    def merge(self, other):
+        """
+        Add the days of another reducer of the same type and shape
+
+        The days of other are treated as following the days already added,
+        other should not be used afterwards.
+
+        Parameters
+        ----------
+        other : Reducer
+            reducer to merge in
+
+        """
+        if other.days:
+            if self.days:
+                self._merge(other)
+            else:
+                self.__dict__.update(other.__dict__)
+                return
+        self.days += other.days
+
+    def result(self):
+        """
+        Get the reduced values
+
+        Returns
+        -------
+        MaskedArray
+            one value per cell
+
+        """
+        raise NotImplementedError
+
+
+class _Extreme(Reducer):
+
+    combine = None
+
+    def _update(self, values, valid):
+        if self.days == 0:
+            self.values = values.copy()
+            self.valid = valid.copy()
+        else:
+            self.values = self.combine(self.values, values)
+            self.valid &= valid
+
+    def _merge(self, other):
+        self.values = self.combine(self.values, other.values)
+        self.valid &= other.valid
+
+    def result(self):
+        return np.ma.masked_array(self.values, mask=~self.valid)
+
+
+class Min(_Extreme):
+    """
+    Minimum over the days, masked where any day is masked
+    """
+    combine = staticmethod(np.minimum)
+
+
+class Max(_Extreme):
+    """
+    Maximum over the days, masked where any day is masked
+    """
+    combine = staticmethod(np.maximum)
+
+
+class Mean(Reducer):
+    """
+    Mean over the days, masked where any day is masked
+
+    The days are added in the precision of the data, as the queries have
+    always done.
+    """
+
+    def _update(self, values, valid):
+        if self.days == 0:
+            self.total = np.zeros(self.shape, dtype=np.result_type(values.dtype, np.float32))
+            self.valid = np.ones(self.shape, dtype=bool)
+        self.total += np.where(valid, values, 0)
+        self.valid &= valid
+
+    def _merge(self, other):
+        self.total += other.total
+        self.valid &= other.valid
+
+    def result(self):
+        return np.ma.masked_array(self.total / max(self.days, 1), mask=~self.valid)
+
+
+class Count(Reducer):
+    """
+    Number of valid days
+    """
+
+    def __init__(self, shape):
+        Reducer.__init__(self, shape)
+        self.count = np.zeros(self.shape, dtype=np.int64)
+
+    def _update(self, values, valid):
+        self.count += valid
+
+    def _merge(self, other):
+        self.count += other.count
+
+    def result(self):
+        return np.ma.masked_array(self.count)
+
+
+class Sum(Count):
+    """
+    Sum of the valid days, accumulated in double precision
+    """
+
+    def __init__(self, shape):
+        Count.__init__(self, shape)
+        self.total = np.zeros(self.shape, dtype=np.float64)
+
+    def _update(self, values, valid):
+        Count._update(self, values, valid)
+        self.total += np.where(valid, values, 0.0)
+
+    def _merge(self, other):
+        Count._merge(self, other)
+        self.total += other.total
+
+    def result(self):
+        return np.ma.masked_array(self.total, mask=self.count == 0)
+
+
+class Std(Count):
+    """
+    Population standard deviation of the valid days
+
+    Uses Welford's single pass update, and the parallel form of Chan et al.
+    to merge, so it stays accurate for long ranges of large values.
+    """
+
+    def __init__(self, shape):
+        Count.__init__(self, shape)
+        self.mean = np.zeros(self.shape, dtype=np.float64)
+        self.m2 = np.zeros(self.shape, dtype=np.float64)
+
+    def _update(self, values, valid):
+        Count._update(self, values, valid)
+        delta = np.where(valid, values, 0.0) - self.mean
+        self.mean += np.where(valid, delta / np.maximum(self.count, 1), 0.0)
+        self.m2 += np.where(valid, delta * (np.where(valid, values, 0.0) - self.mean), 0.0)
+
+    def _merge(self, other):
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        weight = np.where(count > 0, other.count / np.maximum(count, 1), 0.0)
+        self.mean += delta * weight
+        self.m2 += other.m2 + delta * delta * self.count * weight
+        self.count = count
+
+    def result(self):
+        variance = self.m2 / np.maximum(self.count, 1)
+        return np.ma.masked_array(np.sqrt(np.maximum(variance, 0.0)), mask=self.count == 0)
+
+
+class Percentile(Count):
+    """
+    Approximate percentile of the valid days from a reservoir sample
+
+    Each cell keeps a uniform random sample of up to samples of its valid
+    days (Vitter's algorithm R), the percentile of the sample is reported.
+    The result is exact while a cell has no more valid days than samples.
+    The random generator is seeded so repeated queries return the same
+    result.
+
+    Parameters
+    ----------
+    shape : tuple
+        shape of one day of data
+    q : float
+        percentile to report, 0 to 100
+    samples : int
+        reservoir size per cell, defaults to common.percentileSamples
+    seed : int
+        seed of the random generator, defaults to common.percentileSeed
+
+    """
+
+    def __init__(self, shape, q, samples=None, seed=None):
+        Count.__init__(self, shape)
+        self.q = q
+        self.samples = common.percentileSamples if samples is None else samples
+        self.rng = np.random.default_rng(common.percentileSeed if seed is None else seed)
+        self.reservoir = np.full((self.samples,) + self.shape, np.nan, dtype=np.float32)
+
+    def _update(self, values, valid):
+        #slot each valid value would replace, values past the reservoir are dropped
+        slot = np.where(self.count < self.samples, self.count,
+                        self.rng.integers(0, self.count + 1, size=self.shape))
+        keep = valid & (slot < self.samples)
+        slot = np.minimum(slot, self.samples - 1)[np.newaxis]
+        current = np.take_along_axis(self.reservoir, slot, axis=0)
+        np.put_along_axis(self.reservoir, slot, np.where(keep, values, current), axis=0)
+        Count._update(self, values, valid)
+
+    def _merge(self, other):
+        #draw how many of the merged samples come from each side, then take
+        #that many from each reservoir in random order
+        size = np.minimum(self.count + other.count, self.samples)
+        taken = self.rng.hypergeometric(np.maximum(self.count, 1), np.maximum(other.count, 1), np.maximum(size, 1))
+        taken = np.where(other.count == 0, size, np.where(self.count == 0, 0, taken))
+        taken = np.minimum(np.minimum(taken, self.count), self.samples)
+
+        mine = self._shuffled(self.reservoir, np.minimum(self.count, self.samples))
+        theirs = self._shuffled(other.reservoir, np.minimum(other.count, other.samples))
+        slots = np.arange(self.samples).reshape((-1,) + (1,) * len(self.shape))
+        fromOther = np.take_along_axis(theirs, np.clip(slots - taken, 0, other.samples - 1), axis=0)
+        self.reservoir = np.where(slots < taken, mine, np.where(slots < size, fromOther, np.nan))
+        self.count = self.count + other.count
+
+    def _shuffled(self, reservoir, filled):
+        #random order of the filled slots first, empty slots last
+        slots = np.arange(len(reservoir)).reshape((-1,) + (1,) * len(self.shape))
+        keys = np.where(slots < filled, self.rng.random(reservoir.shape), 2.0)
+        return np.take_along_axis(reservoir, np.argsort(keys, axis=0), axis=0)
+
+    def result(self):
+        empty = self.count == 0
+        sample = np.where(empty, 0.0, self.reservoir)
+        return np.ma.masked_array(np.nanpercentile(sample, self.q, axis=0), mask=empty)
+
+
+def create(aggregatefunction, shape, block=0):
+    """
+    Create the reducer for an aggregate function
+
+    Parameters
+    ----------
+    aggregatefunction : str
+        min, max, avg, sum, count, std or pNN for a percentile (p0 to p100)
+    shape : tuple
+        shape of one day of data (() for a single coordinate)
+    block : int
+        index of the block of days the reducer is for when a range is
+        reduced in blocks, each block samples percentiles with its own seed
+
+    Returns
+    -------
+    Reducer
+        new reducer with no days added
+
+    """
+    if aggregatefunction == "min":
+        return Min(shape)
+    if aggregatefunction == "max":
+        return Max(shape)
+    if aggregatefunction == "avg":
+        return Mean(shape)
+    if aggregatefunction == "sum":
+        return Sum(shape)
+    if aggregatefunction == "count":
+        return Count(shape)
+    if aggregatefunction == "std":
+        return Std(shape)
+    if aggregatefunction[:1] == "p":
+        try:
+            q = float(aggregatefunction[1:])
+        except ValueError:
+            q = -1.0
+        if 0.0 <= q <= 100.0:
+            return Percentile(shape, q, seed=[common.percentileSeed, block])
+    raise ValueError('unknown aggregate function: ' + str(aggregatefunction))
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module rasterizes polygon regions (counties, watersheds) onto the
+    NLDAS and GFS grids
+
+    A region is a GeoJSON style Polygon or MultiPolygon (or a Feature of
+    one) with [lon, lat] coordinates, or a plain list of [lon, lat] points
+    for a single ring. Holes and multiple parts follow the even-odd rule.
+
+    A region is rasterized onto the rectangle of grid cells bounding it.
+    Each cell is split into common.regionSubsamples x common.regionSubsamples
+    subcells and its weight is the fraction of subcells whose centre lies in
+    the polygon, so cells on the boundary count partially. The masks of the
+    last common.regionMaskCacheSize regions are kept, so a region is only
+    rasterized once.
+
+    The query modules read the bounding rectangle of a region and mask the
+    cells outside it, or reduce the cells to area weighted statistics.
+
+ """
+
+from collections import OrderedDict
+import hashlib
+import threading
+import numpy as np
+import common
+
+
+def rings(region):
+    """
+    Get the rings of a region
+
+    Parameters
+    ----------
+    region : dict or list
+        GeoJSON Polygon, MultiPolygon or Feature, or a list of [lon, lat]
+        points
+
+    Returns
+    -------
+    ndarray[]
+        (points x 2) array of [lon, lat] for each ring
+
+    """
+    if isinstance(region, dict):
+        if region.get('type') == 'Feature':
+            region = region['geometry']
+        if region.get('type') == 'Polygon':
+            parts = [region['coordinates']]
+        elif region.get('type') == 'MultiPolygon':
+            parts = region['coordinates']
+        else:
+            raise ValueError('unsupported region type: ' + str(region.get('type')))
+    else:
+        parts = [[region]]
+
+    ringList = [np.asarray(ring, dtype=np.float64)[:, :2] for part in parts for ring in part]
+    if not ringList or any(len(ring) < 3 for ring in ringList):
+        raise ValueError('a region ring needs at least 3 points')
+    return ringList
+
+
+def _inside(ringList, lats, lons):
+    #even-odd rule along each row: a point is inside if an odd number of
+    #edges cross the row to its left
+    edges = np.concatenate([np.column_stack((ring, np.roll(ring, -1, axis=0))) for ring in ringList])
+    x0, y0, x1, y1 = edges.T
+    inside = np.zeros((len(lats), len(lons)), dtype=bool)
+    for i, lat in enumerate(lats):
+        crosses = (y0 <= lat) != (y1 <= lat)
+        xs = x0[crosses] + (lat - y0[crosses]) * (x1[crosses] - x0[crosses]) / (y1[crosses] - y0[crosses])
+        xs.sort()
+        inside[i] = np.searchsorted(xs, lons, side='right') % 2 == 1
+    return inside
+
+
+class RegionMask:
+    """
+    A region rasterized onto a product grid
+
+    Parameters
+    ----------
+    grid : GridIndex
+        index of the product grid, see grid_index.for_product
+    region : dict or list
+        region to rasterize, see rings
+    subsamples : int
+        subcells per cell along each axis, defaults to common.regionSubsamples
+
+    Attributes
+    ----------
+    lat_bounds, lon_bounds : float[]
+        bounds of the rectangle of cells covering the region, read by the
+        rectangle queries
+    lats, lons : ndarray
+        coordinates of the rectangle
+    weights : ndarray
+        fraction of each cell inside the region, 0 to 1
+
+    """
+
+    def __init__(self, grid, region, subsamples=None):
+        if subsamples is None:
+            subsamples = common.regionSubsamples
+        ringList = rings(region)
+        points = np.concatenate(ringList)
+        latStep = abs(grid.latAxis.step)
+        lonStep = abs(grid.lonAxis.step)
+
+        #pad the bounds by a cell, the rectangle queries exclude the upper cell
+        self.lat_bounds = [points[:, 1].min() - latStep, points[:, 1].max() + latStep]
+        self.lon_bounds = [points[:, 0].min() - lonStep, points[:, 0].max() + lonStep]
+        latslice, lonslice = grid.slices(self.lat_bounds, self.lon_bounds)
+        self.lats, self.lons = grid.coordinates(latslice, lonslice)
+
+        #subcell centres around each cell centre
+        offsets = (np.arange(subsamples) + 0.5) / subsamples - 0.5
+        subLats = (np.asarray(self.lats, dtype=np.float64)[:, np.newaxis] + offsets * latStep).ravel()
+        subLons = (np.asarray(self.lons, dtype=np.float64)[:, np.newaxis] + offsets * lonStep).ravel()
+        inside = _inside(ringList, subLats, subLons)
+        self.weights = inside.reshape(len(self.lats), subsamples, len(self.lons), subsamples).mean(axis=(1, 3))
+
+    def mask(self, values):
+        """
+        Mask the cells of a rectangle result outside the region
+
+        Parameters
+        ----------
+        values : MaskedArray
+            values of the cells of the rectangle
+
+        Returns
+        -------
+        MaskedArray
+            values, masked where no part of the cell is in the region
+
+        """
+        return np.ma.masked_array(values, mask=np.ma.getmaskarray(values) | (self.weights == 0))
+
+    def statistics(self, values):
+        """
+        Reduce a rectangle result to statistics of the region
+
+        Cells are weighted by the fraction inside the region and by their
+        area, which shrinks with the cosine of the latitude.
+
+        Parameters
+        ----------
+        values : MaskedArray
+            values of the cells of the rectangle
+
+        Returns
+        -------
+        dict
+            mean (area weighted), min, max, cells (valid cells with any part
+            in the region) and coverage (area fraction of the region with
+            valid values)
+
+        """
+        values = np.ma.asarray(values)
+        weights = self.weights * np.cos(np.radians(np.asarray(self.lats, dtype=np.float64)))[:, np.newaxis]
+        valid = ~np.ma.getmaskarray(values) & (weights > 0)
+        total = weights[valid].sum()
+        data = np.ma.getdata(values)[valid].astype(np.float64)
+        return {'mean': float((data * weights[valid]).sum() / total) if total > 0 else np.ma.masked,
+                'min': float(data.min()) if data.size else np.ma.masked,
+                'max': float(data.max()) if data.size else np.ma.masked,
+                'cells': int(valid.sum()),
+                'coverage': float(total / weights.sum()) if weights.sum() > 0 else 0.0}
+
+
+def _region_key(ringList):
+    #hash of the coordinates of every ring
+    digest = hashlib.sha1()
+    for ring in ringList:
+        digest.update(np.ascontiguousarray(ring).tobytes())
+        digest.update(b'|')
+    return digest.hexdigest()
+
+
+_masks = OrderedDict()
+_lock = threading.Lock()
+
+
+def for_region(product, grid, region):
+    """
+    Get the cached RegionMask of a region on a product grid
+
+    Parameters
+    ----------
+    product : str
+        NLDAS or GFS
+    grid : GridIndex
+        index of the product grid
+    region : dict or list
+        region to rasterize, see rings
+
+    Returns
+    -------
+    RegionMask
+        the region rasterized onto the grid
+
+    """
+    key = (product, _region_key(rings(region)), common.regionSubsamples)
+    with _lock:
+        regionMask = _masks.get(key)
+        if regionMask is not None:
+            _masks.move_to_end(key)
+            return regionMask
+
+    regionMask = RegionMask(grid, region)
+    with _lock:
+        _masks[key] = regionMask
+        while len(_masks) > common.regionMaskCacheSize:
+            _masks.popitem(last=False)
+    return regionMask
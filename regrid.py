@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module regrids values between the NLDAS and GFS grids
+
+    The weights from the cells of a source grid to the cells of a target
+    grid are computed once and kept as a sparse matrix in compressed sparse
+    row form (one row per target cell, one column per source cell, in the
+    row-major order of the grids in the netCDF files). Regridding a grid or
+    a stack of days is then a single sparse matrix product.
+
+    Methods:
+        bilinear        interpolated from the four source cells around the
+                        centre of the target cell
+        conservative    the source cells weighted by the area of their
+                        overlap with the target cell, so totals and means
+                        over an area are kept
+
+    Both grids are regular lat/lon grids, so the weights are the products
+    of weights computed along the lat and lon axes. Areas shrink with the
+    cosine of the latitude, so the lat overlaps are measured in sin(lat).
+
+    Masked source cells do not contribute, the weights of the valid cells
+    are renormalised and a target cell is masked when less than
+    common.regridMinWeight of its weight comes from valid cells (or it is
+    outside the source grid).
+
+    The weights are saved with the key layout of scipy.sparse.save_npz, so
+    scipy.sparse.load_npz can read them, and the weights of the last used
+    grid pairs are kept in memory.
+
+    Weight files:
+        netCDF/regrid/SOURCE_to_TARGET_METHOD.npz
+
+    Usage:
+        weights = regrid.for_grids('GFS', gfsGrid, 'NLDAS', nldasGrid, 'bilinear')
+        nldasValues = weights.apply(gfsValues)
+
+ """
+
+import os
+import threading
+import numpy as np
+import common
+
+METHODS = ('bilinear', 'conservative')
+
+
+class RegridWeights:
+    """
+    Sparse weights from the cells of a source grid to a target grid
+
+    Parameters
+    ----------
+    source_shape : tuple
+        (lat, lon) shape of the source grid
+    target_shape : tuple
+        (lat, lon) shape of the target grid
+    data : ndarray
+        weight of each stored entry, row by row
+    indices : ndarray
+        source cell (column) of each stored entry
+    indptr : ndarray
+        first entry of each target cell (row), and the number of entries
+
+    """
+
+    def __init__(self, source_shape, target_shape, data, indices, indptr):
+        self.source_shape = tuple(int(size) for size in source_shape)
+        self.target_shape = tuple(int(size) for size in target_shape)
+        self.data = np.asarray(data, dtype=np.float64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        #rows with entries and where their entries start, for np.add.reduceat
+        self._filled = np.diff(self.indptr) > 0
+        self._starts = self.indptr[:-1][self._filled]
+
+    @property
+    def shape(self):
+        """
+        (target cells, source cells) shape of the matrix
+        """
+        return (self.target_shape[0] * self.target_shape[1], self.source_shape[0] * self.source_shape[1])
+
+    def dot(self, values):
+        """
+        Multiply the matrix with the columns of a 2d array
+
+        Parameters
+        ----------
+        values : ndarray
+            (source cells x n) array
+
+        Returns
+        -------
+        ndarray
+            (target cells x n) array
+
+        """
+        result = np.zeros((self.shape[0], values.shape[1]), dtype=np.float64)
+        if len(self.data):
+            #weighted source values of every entry, summed over the entries of each row
+            result[self._filled] = np.add.reduceat(values[self.indices] * self.data[:, np.newaxis], self._starts, axis=0)
+        return result
+
+    def apply(self, values):
+        """
+        Regrid a grid or a stack of grids
+
+        Parameters
+        ----------
+        values : MaskedArray
+            (..., lat, lon) values on the source grid, for example a
+            (days x lat x lon) stack
+
+        Returns
+        -------
+        MaskedArray
+            (..., lat, lon) values on the target grid
+
+        """
+        values = np.ma.asarray(values)
+        if values.shape[-2:] != self.source_shape:
+            raise ValueError('values of shape %s are not on the source grid %s' % (values.shape, self.source_shape))
+        leading = values.shape[:-2]
+        dtype = values.dtype if np.issubdtype(values.dtype, np.floating) else np.float64
+
+        grids = values.reshape((-1, self.shape[1]))
+        valid = ~np.ma.getmaskarray(grids)
+        filled = np.where(valid, np.ma.getdata(grids), 0).astype(np.float64)
+
+        result = np.ma.masked_all((len(grids), self.shape[0]), dtype=dtype)
+        for start in range(0, len(grids), common.regridChunk):
+            stop = min(start + common.regridChunk, len(grids))
+            #one product for the weighted values and the weight of the valid cells
+            product = self.dot(np.concatenate([filled[start:stop], valid[start:stop]]).T)
+            result[start:stop] = normalise(product[:, :stop - start], product[:, stop - start:]).T
+        return result.reshape(leading + self.target_shape)
+
+    def cells(self, latindex, lonindex):
+        """
+        Get the weights of some target cells
+
+        Parameters
+        ----------
+        latindex : ndarray
+            lat index of each target cell
+        lonindex : ndarray
+            lon index of each target cell
+
+        Returns
+        -------
+        tuple
+            (lat index, lon index of each source cell used, (target cells x
+            source cells) weights)
+
+        """
+        rows = np.ravel(latindex) * self.target_shape[1] + np.ravel(lonindex)
+        entries = [np.arange(self.indptr[row], self.indptr[row + 1]) for row in rows]
+        columns, inverse = np.unique(self.indices[np.concatenate(entries)], return_inverse=True)
+
+        matrix = np.zeros((len(rows), len(columns)), dtype=np.float64)
+        first = 0
+        for k, rowEntries in enumerate(entries):
+            matrix[k, inverse[first:first + len(rowEntries)]] = self.data[rowEntries]
+            first += len(rowEntries)
+        sourceLatIndex, sourceLonIndex = np.divmod(columns, self.source_shape[1])
+        return sourceLatIndex, sourceLonIndex, matrix
+
+    def save(self, filename, signature):
+        """
+        Write the weights to a .npz file
+
+        The file is replaced atomically, it has the keys of
+        scipy.sparse.save_npz plus the shapes and signature of the grids.
+
+        Parameters
+        ----------
+        filename : str
+            .npz file to write
+        signature : ndarray
+            signature of the source and target grids, see _signature
+
+        """
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        tmpFilename = filename + '.' + str(os.getpid()) + '.tmp'
+        with open(tmpFilename, 'wb') as f:
+            np.savez(f, format=np.array('csr'), shape=np.array(self.shape), data=self.data,
+                     indices=self.indices, indptr=self.indptr, source_shape=np.array(self.source_shape),
+                     target_shape=np.array(self.target_shape), signature=signature)
+        os.replace(tmpFilename, filename)
+
+
+def normalise(weighted, weight):
+    """
+    Divide weighted sums by the weight of the valid source cells
+
+    Parameters
+    ----------
+    weighted : ndarray
+        weighted sums of the valid source values of each target cell
+    weight : ndarray
+        sums of the weights of the valid source cells
+
+    Returns
+    -------
+    MaskedArray
+        regridded values, masked where weight is below
+        common.regridMinWeight
+
+    """
+    return np.ma.masked_array(weighted / np.maximum(weight, 1e-12), mask=weight < common.regridMinWeight)
+
+
+def _linear_pairs(axis, coords):
+    #(target, source, weight) of the two source points around each coordinate
+    coords = np.asarray(coords, dtype=np.float64)
+    targets = np.arange(len(coords))
+    position = axis.position(coords)
+    if axis.period is not None and axis.regular:
+        lowerindex = np.floor(position)
+        fraction = position - lowerindex
+        lowerindex = lowerindex.astype(np.int64) % axis.size
+        upperindex = (lowerindex + 1) % axis.size
+    else:
+        #coordinates outside the axis get no weights
+        tolerance = abs(axis.step) * 1e-3
+        inside = (coords >= axis.values.min() - tolerance) & (coords <= axis.values.max() + tolerance)
+        targets, position = targets[inside], position[inside]
+        lowerindex = np.clip(np.floor(position), 0, axis.size - 2).astype(np.int64)
+        fraction = np.clip(position - lowerindex, 0.0, 1.0)
+        upperindex = lowerindex + 1
+
+    pairs = (np.concatenate([targets, targets]), np.concatenate([lowerindex, upperindex]),
+             np.concatenate([1.0 - fraction, fraction]))
+    keep = pairs[2] > 0
+    return tuple(pair[keep] for pair in pairs)
+
+
+def _overlap_pairs(sourceAxis, targetAxis, latitude):
+    #(target, source, fraction of the target cell covered) of every overlapping pair of cells
+    sources = np.asarray(sourceAxis.values, dtype=np.float64)
+    targets = np.asarray(targetAxis.values, dtype=np.float64)
+    sourceHalf = abs(sourceAxis.step) / 2
+    targetHalf = abs(targetAxis.step) / 2
+
+    #offset of every source cell from every target cell, the shortest way around a wrapping axis
+    offset = sources[np.newaxis, :] - targets[:, np.newaxis]
+    if sourceAxis.period is not None:
+        offset = np.mod(offset + sourceAxis.period / 2, sourceAxis.period) - sourceAxis.period / 2
+    lower = targets[:, np.newaxis] + np.maximum(-targetHalf, offset - sourceHalf)
+    upper = targets[:, np.newaxis] + np.minimum(targetHalf, offset + sourceHalf)
+
+    if latitude:
+        def measure(lowerEdge, upperEdge):
+            return (np.sin(np.radians(np.clip(upperEdge, -90.0, 90.0))) -
+                    np.sin(np.radians(np.clip(lowerEdge, -90.0, 90.0))))
+    else:
+        def measure(lowerEdge, upperEdge):
+            return upperEdge - lowerEdge
+    overlap = np.where(upper > lower, measure(lower, upper), 0.0)
+    size = measure(targets - targetHalf, targets + targetHalf)[:, np.newaxis]
+
+    #drop slivers left by float32 rounding of the stored coordinates
+    fraction = overlap / size
+    targetIndex, sourceIndex = np.nonzero(fraction > 1e-6)
+    return targetIndex, sourceIndex, fraction[targetIndex, sourceIndex]
+
+
+def _outer(latPairs, lonPairs, source_shape, target_shape):
+    #every lat pair with every lon pair, sorted into compressed sparse rows
+    latTargets, latSources, latWeights = latPairs
+    lonTargets, lonSources, lonWeights = lonPairs
+    rows = (latTargets[:, np.newaxis] * target_shape[1] + lonTargets[np.newaxis, :]).ravel()
+    cols = (latSources[:, np.newaxis] * source_shape[1] + lonSources[np.newaxis, :]).ravel()
+    data = (latWeights[:, np.newaxis] * lonWeights[np.newaxis, :]).ravel()
+
+    order = np.lexsort((cols, rows))
+    counts = np.bincount(rows, minlength=target_shape[0] * target_shape[1])
+    return RegridWeights(source_shape, target_shape, data[order], cols[order],
+                         np.concatenate([[0], np.cumsum(counts)]))
+
+
+def compute(sourceGrid, targetGrid, method='bilinear'):
+    """
+    Compute the weights from a source grid to a target grid
+
+    Parameters
+    ----------
+    sourceGrid : GridIndex
+        index of the grid the values are on, see grid_index.for_product
+    targetGrid : GridIndex
+        index of the grid to regrid to
+    method : str
+        bilinear or conservative
+
+    Returns
+    -------
+    RegridWeights
+        the weights
+
+    """
+    source_shape = (sourceGrid.latAxis.size, sourceGrid.lonAxis.size)
+    target_shape = (targetGrid.latAxis.size, targetGrid.lonAxis.size)
+    if method == 'bilinear':
+        latPairs = _linear_pairs(sourceGrid.latAxis, targetGrid.lats)
+        lonPairs = _linear_pairs(sourceGrid.lonAxis, targetGrid.lons)
+    elif method == 'conservative':
+        latPairs = _overlap_pairs(sourceGrid.latAxis, targetGrid.latAxis, True)
+        lonPairs = _overlap_pairs(sourceGrid.lonAxis, targetGrid.lonAxis, False)
+    else:
+        raise ValueError('unknown regrid method: ' + str(method))
+    return _outer(latPairs, lonPairs, source_shape, target_shape)
+
+
+def weights_filename(source, target, method):
+    """
+    Get the weights filename of a pair of products
+
+    Parameters
+    ----------
+    source : str
+        product the values are on, NLDAS or GFS
+    target : str
+        product to regrid to
+    method : str
+        bilinear or conservative
+
+    Returns
+    -------
+    str
+        .npz filename
+
+    """
+    fullPath = os.path.dirname(os.path.abspath(__file__)) + common.regridPath
+    return fullPath + source + '_to_' + target + '_' + method + '.npz'
+
+
+def _signature(sourceGrid, targetGrid):
+    #sizes, first coordinates and steps of both grids, to notice a changed grid
+    return np.array([value for grid in (sourceGrid, targetGrid) for axis in (grid.latAxis, grid.lonAxis)
+                     for value in (axis.size, axis.start, axis.step)], dtype=np.float64)
+
+
+def _load(filename, signature):
+    #weights saved for the same grids, None if there are none
+    if not os.path.exists(filename):
+        return None
+    with np.load(filename) as npz:
+        if npz['signature'].shape != signature.shape or not np.allclose(npz['signature'], signature):
+            return None
+        return RegridWeights(npz['source_shape'], npz['target_shape'], npz['data'], npz['indices'], npz['indptr'])
+
+
+_weights = {}
+_lock = threading.Lock()
+
+
+def for_grids(source, sourceGrid, target, targetGrid, method='bilinear'):
+    """
+    Get the weights from a source product grid to a target product grid
+
+    The weights are computed the first time a pair of grids is used and
+    saved, then read from the weight file and kept in memory.
+
+    Parameters
+    ----------
+    source : str
+        product the values are on, NLDAS or GFS
+    sourceGrid : GridIndex
+        index of the source grid, see grid_index.for_product
+    target : str
+        product to regrid to
+    targetGrid : GridIndex
+        index of the target grid
+    method : str
+        bilinear or conservative
+
+    Returns
+    -------
+    RegridWeights
+        the weights
+
+    """
+    if method not in METHODS:
+        raise ValueError('unknown regrid method: ' + str(method))
+    key = (source, target, method)
+    with _lock:
+        regridWeights = _weights.get(key)
+    if regridWeights is not None:
+        return regridWeights
+
+    filename = weights_filename(source, target, method)
+    signature = _signature(sourceGrid, targetGrid)
+    regridWeights = _load(filename, signature)
+    if regridWeights is None:
+        regridWeights = compute(sourceGrid, targetGrid, method)
+        regridWeights.save(filename, signature)
+    with _lock:
+        _weights[key] = regridWeights
+    return regridWeights
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module contains the result cache used by the query engine
+
+    Query results are kept in two tiers: an in-memory LRU of up to
+    common.resultCacheMemoryBytes and a directory of pickled results of up
+    to common.resultCacheDiskBytes, shared between processes and runs. The
+    oldest entries are evicted from each tier when it is over its size. The
+    order and size of the disk entries are indexed in memory, the directory
+    is only scanned on first use, so an entry written by another process is
+    indexed once this process reads it.
+
+    Each entry records the (modification time, size) of every daily netCDF
+    file the result was computed from. An entry is only used if those files
+    are unchanged, so when the aggregator rewrites a day every cached result
+    whose range includes it is recomputed on its next lookup.
+
+    Entry files:
+        netCDF/cache/HASH.pkl     pickled (key, file stamps, pickled result)
+
+ """
+
+from collections import OrderedDict
+import hashlib
+import os
+import pickle
+import threading
+import common
+
+
+def _stamps(filenames):
+    #modification time and size of every input file, None if one is missing
+    stamps = []
+    for filename in filenames:
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        stamps.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+class ResultCache:
+    """
+    Two tier cache of query results validated against their input files
+
+    Parameters
+    ----------
+    path : str
+        directory of the disk tier, defaults to common.resultCachePath
+        under the directory of this module
+    memory_bytes : int
+        size of the memory tier, defaults to common.resultCacheMemoryBytes
+    disk_bytes : int
+        size of the disk tier, defaults to common.resultCacheDiskBytes
+
+    """
+
+    def __init__(self, path=None, memory_bytes=None, disk_bytes=None):
+        if path is None:
+            path = os.path.dirname(os.path.abspath(__file__)) + common.resultCachePath
+        self.path = path
+        self.memory_bytes = common.resultCacheMemoryBytes if memory_bytes is None else memory_bytes
+        self.disk_bytes = common.resultCacheDiskBytes if disk_bytes is None else disk_bytes
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._memoryUsed = 0
+        #entry filename: size of the disk tier in least recently used order, None until scanned
+        self._disk = None
+        self._diskUsed = 0
+        self._lock = threading.Lock()
+
+    def _entry_filename(self, keyText):
+        return os.path.join(self.path, hashlib.sha1(keyText.encode()).hexdigest() + '.pkl')
+
+    def _disk_index(self):
+        #scan the disk tier once, oldest entries first, the lock must be held
+        if self._disk is None:
+            entries = []
+            if os.path.isdir(self.path):
+                for entry in os.scandir(self.path):
+                    if not entry.name.endswith('.pkl'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, entry.path, stat.st_size))
+            entries.sort()
+            self._disk = OrderedDict((entryFilename, size) for mtime, entryFilename, size in entries)
+            self._diskUsed = sum(self._disk.values())
+        return self._disk
+
+    def _index_disk(self, entryFilename, size):
+        #record an entry as the most recently used, None to drop it
+        with self._lock:
+            index = self._disk_index()
+            self._diskUsed -= index.pop(entryFilename, 0)
+            if size is not None:
+                index[entryFilename] = size
+                self._diskUsed += size
+
+    def _remember(self, keyText, stamps, data):
+        #add to the memory tier and evict the least recently used entries
+        with self._lock:
+            old = self._memory.pop(keyText, None)
+            if old is not None:
+                self._memoryUsed -= len(old[1])
+            if len(data) > self.memory_bytes:
+                return
+            self._memory[keyText] = (stamps, data)
+            self._memoryUsed += len(data)
+            while self._memoryUsed > self.memory_bytes:
+                evicted, (evictedStamps, evictedData) = self._memory.popitem(last=False)
+                self._memoryUsed -= len(evictedData)
+
+    def get(self, key, filenames):
+        """
+        Look up a result
+
+        Parameters
+        ----------
+        key : tuple
+            key of the query, built of plain values
+        filenames : str[]
+            input files of the query
+
+        Returns
+        -------
+        tuple
+            (True, result) on a hit, (False, None) on a miss or if any input
+            file changed since the result was cached
+
+        """
+        keyText = repr(key)
+        stamps = _stamps(filenames)
+        if stamps is None:
+            return False, None
+
+        with self._lock:
+            entry = self._memory.get(keyText)
+            if entry is not None:
+                if entry[0] == stamps:
+                    self._memory.move_to_end(keyText)
+                    self.hits += 1
+                    return True, pickle.loads(entry[1])
+                #an input was rewritten since the result was cached
+                del self._memory[keyText]
+                self._memoryUsed -= len(entry[1])
+
+        entryFilename = self._entry_filename(keyText)
+        try:
+            with open(entryFilename, 'rb') as f:
+                storedKey, storedStamps, data = pickle.load(f)
+                size = f.tell()
+        except (OSError, EOFError, pickle.UnpicklingError):
+            storedKey = None
+        if storedKey == keyText:
+            if storedStamps == stamps:
+                #touch the entry so the disk tier evicts by last use
+                os.utime(entryFilename)
+                self._index_disk(entryFilename, size)
+                self._remember(keyText, stamps, data)
+                with self._lock:
+                    self.diskHits += 1
+                return True, pickle.loads(data)
+            try:
+                os.remove(entryFilename)
+            except OSError:
+                pass
+            self._index_disk(entryFilename, None)
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def put(self, key, filenames, result):
+        """
+        Store a result
+
+        Parameters
+        ----------
+        key : tuple
+            key of the query, built of plain values
+        filenames : str[]
+            input files of the query
+        result : object
+            picklable query result
+
+        """
+        keyText = repr(key)
+        stamps = _stamps(filenames)
+        if stamps is None:
+            return
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(keyText, stamps, data)
+
+        if self.disk_bytes <= 0 or len(data) > self.disk_bytes:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        entryFilename = self._entry_filename(keyText)
+        #write to a private name first so readers never see a partial entry
+        tmpFilename = entryFilename + '.' + str(os.getpid()) + '.' + str(threading.get_ident())
+        with open(tmpFilename, 'wb') as f:
+            pickle.dump((keyText, stamps, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = f.tell()
+        os.replace(tmpFilename, entryFilename)
+        self._index_disk(entryFilename, size)
+        self._evict_disk()
+
+    def _evict_disk(self):
+        #remove the least recently used entries until the disk tier fits
+        with self._lock:
+            index = self._disk_index()
+            while self._diskUsed > self.disk_bytes and index:
+                entryFilename, size = index.popitem(last=False)
+                self._diskUsed -= size
+                try:
+                    os.remove(entryFilename)
+                except OSError:
+                    pass
+
+    def clear(self):
+        """
+        Remove every entry from both tiers
+        """
+        with self._lock:
+            self._memory.clear()
+            self._memoryUsed = 0
+            self._disk = OrderedDict()
+            self._diskUsed = 0
+        if os.path.isdir(self.path):
+            for entry in os.scandir(self.path):
+                if entry.name.endswith('.pkl'):
+                    os.remove(entry.path)
+
+    def stats(self):
+        """
+        Get the cache counters
+
+        Returns
+        -------
+        dict
+            memory hits, disk hits, misses, memory entries and bytes used,
+            disk entries and bytes used
+
+        """
+        with self._lock:
+            return {'hits': self.hits, 'disk_hits': self.diskHits, 'misses': self.misses,
+                    'entries': len(self._memory), 'memory_bytes': self._memoryUsed,
+                    'disk_entries': len(self._disk or ()), 'disk_used': self._diskUsed}
+
+
+#cache shared by every query in the process
+cache = ResultCache()
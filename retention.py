@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module applies the retention policy for raw GRB files once their
+    daily netCDF files have been produced by the hourly_to_daily_* modules
+
+    A day of raw files is only touched after every daily netCDF file built
+    from it opens and has a full lat/lon grid. The policy is configured in
+    common.py:
+        retentionAction      keep, delete, compress (gzip) or move (to coldPath)
+        retentionMinAgeDays  days after aggregation before the action applies
+        retentionMaxBytes    per product budget of raw bytes, the oldest
+                             verified days are processed first to meet it
+
+    Raw days are stored as
+        NLDAS   NLDASpath/YYYY/DDD/*.grb      -> netCDF/NLDAS_YYYY_DDD.nc
+        GFS     GFSpath/YYYYMM/YYYYMMDD/*.grb2 -> netCDF/GFS_YYYYMMDD_HHH.nc
+
+ """
+
+from datetime import datetime
+import glob
+import gzip
+import os
+import shutil
+import time
+from netCDF4 import Dataset
+import common
+import raw_store
+
+#raw tree, GRB file pattern and netCDF grid dimensions for each product
+PRODUCTS = {'NLDAS': {'path': common.NLDASpath, 'pattern': '*.grb',
+                      'dims': {'lat_110': common.NLDASLatCount, 'lon_110': common.NLDASLonCount}},
+            'GFS': {'path': common.GFSpath, 'pattern': '*.grb2',
+                    'dims': {'lat_0': common.GFSLatCount, 'lon_0': common.GFSLonCount}}}
+
+#forecast intervals aggregated for each GFS day (000, 003, 006, ....384)
+GFS_FORECAST_INTERVALS = [str(j * 3).zfill(3) for j in range(129)]
+
+
+def raw_days(product, root):
+    """
+    Get the raw GRB day directories of a product
+
+    Parameters
+    ----------
+    product : str
+        NLDAS or GFS
+    root : str
+        directory the mirrored GRB trees are rooted at
+
+    Returns
+    -------
+    tuple[]
+        (date, directory) for each day on disk, oldest first
+
+    """
+    rawPath = root + PRODUCTS[product]['path']
+    days = []
+    for directory in glob.glob(rawPath + '*/*/'):
+        parts = directory.rstrip('/').split('/')
+        try:
+            if product == 'NLDAS':
+                mydate = datetime.strptime(parts[-2] + parts[-1], '%Y%j').date()
+            else:
+                mydate = datetime.strptime(parts[-1], '%Y%m%d').date()
+        except ValueError:
+            continue
+        days.append((mydate, directory))
+    days.sort()
+    return days
+
+
+def output_files(product, mydate, root):
+    """
+    Get the daily netCDF files built from one day of raw files
+
+    Parameters
+    ----------
+    product : str
+        NLDAS or GFS
+    mydate : date
+        day of the raw files
+    root : str
+        directory the netCDF directory is in
+
+    Returns
+    -------
+    str()
+        netCDF filenames
+
+    """
+    netCDFPath = root + common.netCDFpath
+    if product == 'NLDAS':
+        year = ("{date.year:04}".format(date=mydate))
+        julianday = format(mydate.timetuple().tm_yday, '03')
+        return [netCDFPath + "NLDAS_" + year + "_" + julianday + ".nc"]
+
+    day = mydate.strftime('%Y%m%d')
+    return [netCDFPath + "GFS_" + day + "_" + interval + ".nc" for interval in GFS_FORECAST_INTERVALS]
+
+
+def verify_outputs(product, mydate, root):
+    """
+    Check that every daily netCDF file for a day exists and is complete
+
+    Parameters
+    ----------
+    product : str
+        NLDAS or GFS
+    mydate : date
+        day of the raw files
+    root : str
+        directory the netCDF directory is in
+
+    Returns
+    -------
+    float
+        modification time of the newest output, None if any output is
+        missing or unreadable
+
+    """
+    newest = 0
+    for filename in output_files(product, mydate, root):
+        if not os.path.exists(filename):
+            return None
+        try:
+            ds = Dataset(filename)
+        except OSError:
+            return None
+        try:
+            for dim, size in PRODUCTS[product]['dims'].items():
+                if dim not in ds.dimensions or len(ds.dimensions[dim]) != size:
+                    return None
+        finally:
+            ds.close()
+        newest = max(newest, os.path.getmtime(filename))
+    return newest
+
+
+def _raw_files(product, directory):
+    return glob.glob(directory + PRODUCTS[product]['pattern'])
+
+
+def _apply(action, filename, root):
+    """
+    Apply the retention action to a single raw file and return the bytes freed
+    """
+    size = os.path.getsize(filename)
+    if action == 'delete':
+        os.remove(filename)
+    elif action == 'compress':
+        with open(filename, 'rb') as src, gzip.open(filename + '.gz', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(filename)
+        return size - os.path.getsize(filename + '.gz')
+    elif action == 'move':
+        target = root + common.coldPath + os.path.relpath(filename, root)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(filename, target)
+    return size
+
+
+def enforce(product, root, action=None, min_age_days=None, max_bytes=None):
+    """
+    Apply the retention policy to the raw files of a product
+
+    Parameters
+    ----------
+    product : str
+        NLDAS or GFS
+    root : str
+        directory the mirrored GRB trees and netCDF directory are in
+    action : str
+        keep, delete, compress or move, defaults to common.retentionAction
+    min_age_days : float
+        days after aggregation before the action applies, defaults to
+        common.retentionMinAgeDays
+    max_bytes : int
+        budget of raw bytes, defaults to common.retentionMaxBytes[product]
+
+    Returns
+    -------
+    dict
+        days processed and bytes freed
+
+    """
+    if action is None:
+        action = common.retentionAction
+    if min_age_days is None:
+        min_age_days = common.retentionMinAgeDays
+    if max_bytes is None:
+        max_bytes = common.retentionMaxBytes.get(product)
+
+    summary = {'days': 0, 'bytes': 0}
+    if action == 'keep':
+        return summary
+    if action not in ('delete', 'compress', 'move'):
+        raise ValueError('unknown retention action: ' + str(action))
+
+    days = []
+    total = 0
+    for mydate, directory in raw_days(product, root):
+        files = _raw_files(product, directory)
+        size = sum(os.path.getsize(f) for f in files)
+        total += size
+        days.append((mydate, files, size))
+
+    now = time.time()
+    for mydate, files, size in days:
+        if not files:
+            continue
+        overBudget = max_bytes is not None and total > max_bytes
+        verified = verify_outputs(product, mydate, root)
+        if verified is None:
+            continue
+        if not overBudget and now - verified < min_age_days * 86400:
+            continue
+
+        for filename in files:
+            freed = _apply(action, filename, root)
+            total -= freed
+            summary['bytes'] += freed
+        summary['days'] += 1
+
+    #the raw files are hard links into the raw store, release the copies
+    #nothing links to anymore so the space is actually freed
+    storePath = root + common.rawStorePath
+    if summary['days'] and os.path.isdir(storePath):
+        raw_store.RawStore(storePath).prune()
+
+    return summary
+
+
+def _tree_usage(path, pattern):
+    count = 0
+    size = 0
+    for filename in glob.glob(path + '**/' + pattern, recursive=True):
+        if not os.path.isfile(filename):
+            continue
+        count += 1
+        size += os.path.getsize(filename)
+    return count, size
+
+
+def disk_usage(root):
+    """
+    Report the disk usage of each product
+
+    Parameters
+    ----------
+    root : str
+        directory the mirrored GRB trees and netCDF directory are in
+
+    Returns
+    -------
+    dict
+        for each product a dict of (file count, bytes) tuples for the raw
+        GRB files, the compressed raw files, the files moved to the cold
+        directory and the daily netCDF files
+
+    """
+    report = {}
+    for product, settings in PRODUCTS.items():
+        rawPath = root + settings['path']
+        coldPath = root + common.coldPath + settings['path'].lstrip('/')
+        report[product] = {'raw': _tree_usage(rawPath, settings['pattern']),
+                           'compressed': _tree_usage(rawPath, settings['pattern'] + '.gz'),
+                           'cold': _tree_usage(coldPath, '*'),
+                           'netCDF': _tree_usage(root + common.netCDFpath, product + '_*.nc')}
+    return report
+
+
+def print_disk_usage(root):
+    """
+    Print the disk usage of each product
+
+    Parameters
+    ----------
+    root : str
+        directory the mirrored GRB trees and netCDF directory are in
+
+    """
+    for product, usage in disk_usage(root).items():
+        for kind, (count, size) in usage.items():
+            print('%-6s %-10s %8d files %12.1f MB' % (product, kind, count, size / 1e6))
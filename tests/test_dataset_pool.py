@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+import pytest
+from netCDF4 import Dataset
+import dataset_pool
+
+
+def _write(filename, value, size=4):
+    #small netCDF file holding value in every cell
+    with Dataset(filename, 'w') as ds:
+        ds.createDimension('x', size)
+        ds.createVariable('v', 'f4', ('x',))[:] = value
+
+
+def _checkout_in_thread(pool, filename, results):
+    def run():
+        with pool.checkout(filename) as ds:
+            results.append(float(ds.variables['v'][0]))
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_rewritten_file_is_not_handed_out_while_checked_out(tmp_path):
+    filename = str(tmp_path / 'a.nc')
+    _write(filename, 1)
+    pool = dataset_pool.DatasetPool(4)
+    results = []
+    with pool.checkout(filename) as ds:
+        assert ds.variables['v'][0] == 1
+        #rewrite the file, as the aggregator does from another process
+        _write(filename + '.new', 2, size=8)
+        os.replace(filename + '.new', filename)
+        thread = _checkout_in_thread(pool, filename, results)
+        time.sleep(0.2)
+        #the second checkout waits for the old handle instead of reading it
+        assert results == []
+    thread.join(5)
+    assert results == [2]
+    assert pool.stats()['open'] == 1
+
+
+def test_open_does_not_block_other_files(tmp_path, monkeypatch):
+    slow = str(tmp_path / 'slow.nc')
+    fast = str(tmp_path / 'fast.nc')
+    _write(slow, 1)
+    _write(fast, 2)
+    release = threading.Event()
+
+    def opener(filename):
+        if filename == slow:
+            release.wait(5)
+        return Dataset(filename)
+    monkeypatch.setattr(dataset_pool, 'Dataset', opener)
+
+    pool = dataset_pool.DatasetPool(4)
+    slowResults = []
+    slowThread = _checkout_in_thread(pool, slow, slowResults)
+    time.sleep(0.1)
+    fastResults = []
+    _checkout_in_thread(pool, fast, fastResults).join(2)
+    #a checkout of the file being opened waits for the same handle
+    sameResults = []
+    sameThread = _checkout_in_thread(pool, slow, sameResults)
+    assert fastResults == [2] and slowResults == [] and sameResults == []
+
+    release.set()
+    slowThread.join(5)
+    sameThread.join(5)
+    assert slowResults == [1] and sameResults == [1]
+    assert pool.stats()['misses'] == 2
+
+
+def test_failed_open_releases_the_handle(tmp_path):
+    filename = str(tmp_path / 'bad.nc')
+    with open(filename, 'w') as f:
+        f.write('not netCDF')
+    pool = dataset_pool.DatasetPool(1)
+    with pytest.raises(OSError):
+        with pool.checkout(filename):
+            pass
+    assert pool.stats()['open'] == 0
+
+    _write(filename, 3)
+    with pool.checkout(filename) as ds:
+        assert ds.variables['v'][0] == 3
+
+
+def test_checkouts_wait_when_every_handle_is_busy(tmp_path):
+    filenames = [str(tmp_path / ('%d.nc' % k)) for k in range(2)]
+    for k, filename in enumerate(filenames):
+        _write(filename, k)
+    pool = dataset_pool.DatasetPool(1)
+    results = []
+    with pool.checkout(filenames[0]):
+        thread = _checkout_in_thread(pool, filenames[1], results)
+        time.sleep(0.2)
+        assert results == [] and pool.stats()['open'] == 1
+    thread.join(5)
+    assert results == [1]
+    assert os.path.exists(filenames[1]) and pool.stats()['open'] == 1
@@ -0,0 +1,200 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import base64
+import threading
+import pytest
+import requests
+import common
+import downloader
+
+BODY = bytes(range(256)) * 64
+
+
+class Handler(BaseHTTPRequestHandler):
+    #serves server.body at /file, the behaviour of each request is set by the test on the server
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.headers.get('Host').split(':')[0], self.path, dict(self.headers)))
+        if self.headers.get('Host').startswith('localhost'):
+            return self._login()
+        if server.auth and 'session=ok' not in (self.headers.get('Cookie') or ''):
+            return self._authorize()
+
+        if server.failures:
+            server.failures -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = server.body
+        etag = '"%d"' % hash(body)
+        offset = 0
+        rangeHeader = self.headers.get('Range')
+        #a range of another version of the file is answered with the whole file
+        if rangeHeader and self.headers.get('If-Range', etag) == etag:
+            offset = int(rangeHeader[len('bytes='):-1])
+        if offset >= len(body):
+            self.send_response(416)
+            self.send_header('Content-Range', 'bytes */%d' % len(body))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if offset:
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (offset, len(body) - 1, len(body)))
+        else:
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body) - offset))
+        self.end_headers()
+        if server.cut:
+            #drop the connection halfway through the body
+            server.cut = False
+            self.wfile.write(body[offset:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body[offset:])
+
+    def _authorize(self):
+        #the data server sends unauthenticated requests to the login host, which sends them back with a code
+        if self.path.endswith('?code=1'):
+            self.send_response(302)
+            self.send_header('Set-Cookie', 'session=ok; Path=/')
+            self.send_header('Location', self.path[:-len('?code=1')])
+        else:
+            self.send_response(302)
+            self.send_header('Location', 'http://localhost:%d/authorize?to=%s' % (self.server.server_port, self.path))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _login(self):
+        expected = 'Basic ' + base64.b64encode(b'user:secret').decode()
+        if self.headers.get('Authorization') != expected:
+            self.send_response(401)
+        else:
+            self.send_response(302)
+            to = self.path.split('to=')[1]
+            self.send_header('Location', 'http://127.0.0.1:%d%s?code=1' % (self.server.server_port, to))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.requests = []
+    server.body = BODY
+    server.failures = 0
+    server.cut = False
+    server.auth = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _downloader(session=None, retries=3, workers=2):
+    return downloader.Downloader(workers=workers, retries=retries, backoff=0.01, timeout=5, session=session or requests.Session())
+
+
+def _url(server):
+    return 'http://127.0.0.1:%d/file' % server.server_port
+
+
+def test_interrupted_download_resumes_with_range(server, tmp_path, monkeypatch):
+    #small chunks so the first half is written to the part file before the connection drops
+    monkeypatch.setattr(common, 'downloadChunkSize', 1024)
+    server.cut = True
+    path = str(tmp_path / 'file')
+    with _downloader() as d:
+        result = d.download(_url(server), path)
+
+    assert result.ok and result.status == 206 and result.attempts == 2
+    assert open(path, 'rb').read() == BODY
+    assert not (tmp_path / 'file.part').exists()
+    assert 'Range' not in server.requests[0][2]
+    assert server.requests[1][2]['Range'] == 'bytes=%d-' % (len(BODY) // 2)
+    assert server.requests[1][2]['If-Range'] == '"%d"' % hash(BODY)
+    assert not (tmp_path / 'file.part.validator').exists()
+
+
+def test_changed_file_is_not_appended_to(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(common, 'downloadChunkSize', 1024)
+    server.cut = True
+    path = str(tmp_path / 'file')
+    with _downloader(retries=0) as d:
+        assert not d.download(_url(server), path).ok
+        #the file changes on the server before the download is resumed
+        server.body = BODY[::-1]
+        result = d.download(_url(server), path)
+
+    assert result.ok and result.status == 200
+    assert open(path, 'rb').read() == BODY[::-1]
+    assert 'If-Range' in server.requests[1][2]
+
+
+def test_complete_part_file_is_installed_on_416(server, tmp_path):
+    path = str(tmp_path / 'file')
+    (tmp_path / 'file.part').write_bytes(BODY)
+    with _downloader() as d:
+        result = d.download(_url(server), path)
+
+    assert result.ok and result.attempts == 1 and len(server.requests) == 1
+    assert open(path, 'rb').read() == BODY
+
+
+def test_part_file_of_a_shrunk_file_is_discarded(server, tmp_path):
+    path = str(tmp_path / 'file')
+    (tmp_path / 'file.part').write_bytes(BODY + b'old tail')
+    with _downloader() as d:
+        result = d.download(_url(server), path)
+
+    assert result.ok and result.status == 200
+    assert open(path, 'rb').read() == BODY
+    assert 'Range' not in server.requests[1][2]
+
+
+def test_server_errors_are_retried(server, tmp_path):
+    server.failures = 2
+    path = str(tmp_path / 'file')
+    with _downloader() as d:
+        result = d.download(_url(server), path)
+
+    assert result.ok and result.status == 200 and result.attempts == 3
+    assert open(path, 'rb').read() == BODY
+
+
+def test_retries_give_up(server, tmp_path):
+    server.failures = 10
+    with _downloader(retries=2) as d:
+        result = d.download(_url(server), str(tmp_path / 'file'))
+
+    assert not result.ok and result.status == 503 and result.attempts == 3
+    with pytest.raises(downloader.DownloadError):
+        downloader.check_results([result])
+
+
+def test_login_cookies_are_reused(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(common, 'EarthdataHost', 'localhost')
+    netrcFile = tmp_path / 'netrc'
+    netrcFile.write_text('machine localhost login user password secret\n')
+    netrcFile.chmod(0o600)
+    cookieFile = str(tmp_path / 'cookies')
+    server.auth = True
+
+    session = downloader.EarthdataSession(str(netrcFile), cookieFile)
+    #one worker so the second file is requested after the first login
+    with _downloader(session, workers=1) as d:
+        results = d.download_all([(_url(server), str(tmp_path / 'a')), (_url(server), str(tmp_path / 'b'))])
+    downloader.check_results(results)
+
+    #one login for both files, and the credentials only go to the login host
+    logins = [request for request in server.requests if request[0] == 'localhost']
+    assert len(logins) == 1
+    assert all('Authorization' not in headers for host, path, headers in server.requests if host != 'localhost')
+    assert 'session' in open(cookieFile).read()
@@ -0,0 +1,37 @@
+from datetime import date
+import pytest
+import lazy
+import query_engine
+
+
+class RecordingEngine:
+    #stands in for a QueryEngine, records the specs it is asked to read
+    def __init__(self):
+        self.specs = []
+
+    def read(self, spec):
+        self.specs.append(spec)
+        return [[], [], 0.0]
+
+
+def _result():
+    spec = query_engine.QuerySpec('ET', date(2018, 1, 1), lat_bounds=[35, 36], lon_bounds=[-100, -99])
+    return lazy.LazyResult(RecordingEngine(), 'read', spec)
+
+
+def test_crop_intersects_the_bounds():
+    cropped = _result().crop([35.5, 40], [-101, -99.5])
+    assert cropped.spec.lat_bounds == [35.5, 36]
+    assert cropped.spec.lon_bounds == [-100, -99.5]
+
+
+def test_crop_disjoint_lat_raises():
+    result = _result()
+    with pytest.raises(ValueError):
+        result.crop([40, 41], [-100, -99])
+    assert result.engine.specs == []
+
+
+def test_crop_disjoint_lon_raises():
+    with pytest.raises(ValueError):
+        _result().crop([35, 36], [-90, -89])
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module builds the exact list of NLDAS GRB files to download for a
+    date range, so the drivers never have to crawl the server's directory
+    indexes
+
+    The files are located at https://hydro1.gesdisc.eosdis.nasa.gov/data/NLDAS/NLDAS_FORA0125_H.002/YYYY/DDD
+    The naming convention for the files is NLDAS_FORA0125_H.AYYYYMMDD.HHHH.002.grb
+    Where
+        YYYYY = year
+        MM = Month
+        DD = Day
+        DDD = Julian day of year
+        HHHH = 1 hour average interval (0000, 0100, 0200, ....2300)
+
+ """
+
+from datetime import timedelta
+import os
+import common
+
+
+def nldas_file_name(mydate, hour):
+    """
+    Get the name of an hourly NLDAS GRB file
+
+    Parameters
+    ----------
+    mydate : date
+        date of the file
+    hour : int
+        hour of the day (0 - 23)
+
+    Returns
+    -------
+    str
+        NLDAS GRB filename
+
+    """
+    return 'NLDAS_FORA0125_H.A' + mydate.strftime('%Y%m%d') + '.' + str(hour).zfill(2) + '00.002.grb'
+
+
+def nldas_day_path(mydate):
+    """
+    Get the YYYY/DDD/ directory an NLDAS day is stored under
+
+    Parameters
+    ----------
+    mydate : date
+        date of the files
+
+    Returns
+    -------
+    str
+        relative directory of the day
+
+    """
+    year = ("{date.year:04}".format(date=mydate))
+    julianday = format(mydate.timetuple().tm_yday, '03')
+    return year + '/' + julianday + '/'
+
+
+def nldas_urls_one_day(mydate):
+    """
+    Get the urls of the hourly NLDAS GRB files for one day
+
+    Parameters
+    ----------
+    mydate : date
+        date to get the urls for
+
+    Returns
+    -------
+    str()
+        one url per hour of the day
+
+    """
+    dayUrl = common.NLDASurl + nldas_day_path(mydate)
+    return [dayUrl + nldas_file_name(mydate, hour) for hour in range(common.HOURS)]
+
+
+def nldas_plan(startdate, enddate, root, missing_only=False):
+    """
+    Plan the NLDAS downloads needed for a date range
+
+    Will return every hour of the range, so hours already on disk are
+    revalidated with a conditional request by raw_store.RawStore.fetch and
+    only downloaded again if they changed upstream. Planning only the hours
+    missing on disk, without revalidating the others, is the missing_only
+    option.
+
+    Parameters
+    ----------
+    startdate : date
+        first day to download
+    enddate : date
+        last day to download
+    root : str
+        directory the mirrored GRB tree is rooted at
+    missing_only : bool
+        True to skip the hours already on disk instead of revalidating them
+
+    Returns
+    -------
+    tuple[]
+        (url, path) for every hourly file, or every missing one
+
+    """
+    dayPath = root + common.NLDASpath
+    jobs = []
+
+    mydate = startdate
+    while mydate <= enddate:
+        directory = dayPath + nldas_day_path(mydate)
+        for url in nldas_urls_one_day(mydate):
+            path = directory + url.rsplit('/', 1)[1]
+            if not missing_only or not os.path.exists(path):
+                jobs.append((url, path))
+        mydate += timedelta(days=1)
+
+    return jobs
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created Date: 10/19/2026
+# =============================================================================
+"""
+    The Module computes zonal statistics: per region statistics of every
+    day of a range for many regions at once
+
+    The regions are given as an integer label raster on the grid of the
+    product, in the order of the grid in the netCDF files, with a label for
+    each cell of a region and -1 (any negative value) for cells outside
+    every region. Each daily file is read once, limited to the rectangle
+    bounding the labelled cells, and every region is reduced from that one
+    read with grouped reductions (np.bincount for sums and counts,
+    reduceat over the cells sorted by label for min and max). The days are
+    reduced in blocks in parallel, see fan_out.py.
+
+    Statistics:
+        mean, sum   of the valid cells of the region
+        min, max    of the valid cells of the region
+        count       number of valid cells of the region
+
+    mean, sum, min and max are masked for a region with no valid cells on
+    a day.
+
+    The results can be written as a compact regions x days netCDF table:
+        region(region)                  label of each region
+        time(day)                       days since the first day
+        VARIABLE_STATISTIC(region, day) one variable per statistic
+
+ """
+
+from netCDF4 import Dataset
+import numpy as np
+import dataset_pool
+import fan_out
+import query_metrics
+
+STATISTICS = ('mean', 'min', 'max', 'sum', 'count')
+
+
+class Zones:
+    """
+    Grid cells grouped by region label
+
+    Parameters
+    ----------
+    labels : ndarray
+        integer label of each grid cell, negative outside every region
+
+    """
+
+    def __init__(self, labels):
+        labels = np.asarray(labels)
+        rows, cols = np.nonzero(labels >= 0)
+        if len(rows) == 0:
+            raise ValueError('the label raster has no labelled cells')
+
+        #only the rectangle bounding the labelled cells is read
+        self.shape = labels.shape
+        self.latslice = slice(int(rows.min()), int(rows.max()) + 1)
+        self.lonslice = slice(int(cols.min()), int(cols.max()) + 1)
+        flat = labels[self.latslice, self.lonslice].ravel()
+
+        self.cells = np.flatnonzero(flat >= 0)
+        self.labels, self.zone = np.unique(flat[self.cells], return_inverse=True)
+        #cells sorted by zone and the first sorted cell of each zone, for reduceat
+        self.order = np.argsort(self.zone, kind='stable')
+        self.starts = np.searchsorted(self.zone[self.order], np.arange(len(self.labels)))
+
+    def reduce(self, data, statistics=STATISTICS):
+        """
+        Reduce one day of data to statistics of every region
+
+        Parameters
+        ----------
+        data : MaskedArray
+            values of the rectangle bounding the labelled cells
+        statistics : str[]
+            statistics to compute, see STATISTICS
+
+        Returns
+        -------
+        dict
+            MaskedArray of one value per region for each statistic
+
+        """
+        values = np.ma.getdata(data).ravel()[self.cells].astype(np.float64)
+        valid = ~np.ma.getmaskarray(data).ravel()[self.cells]
+        zones = len(self.labels)
+        count = np.bincount(self.zone, weights=valid, minlength=zones)
+        empty = count == 0
+
+        results = {}
+        for statistic in statistics:
+            if statistic == 'count':
+                results[statistic] = np.ma.masked_array(count.astype(np.int32))
+            elif statistic in ('sum', 'mean'):
+                total = np.bincount(self.zone, weights=np.where(valid, values, 0.0), minlength=zones)
+                if statistic == 'mean':
+                    total = total / np.maximum(count, 1)
+                results[statistic] = np.ma.masked_array(total, mask=empty)
+            elif statistic in ('min', 'max'):
+                ufunc, fill = (np.minimum, np.inf) if statistic == 'min' else (np.maximum, -np.inf)
+                extreme = ufunc.reduceat(np.where(valid, values, fill)[self.order], self.starts)
+                results[statistic] = np.ma.masked_array(extreme, mask=empty)
+            else:
+                raise ValueError('unknown zonal statistic: ' + str(statistic))
+        return results
+
+
+def _reduce_block(block, offset, filenames, variable, zones, statistics):
+    table = {statistic: np.ma.masked_all((len(zones.labels), len(filenames)),
+                                         dtype=np.int32 if statistic == 'count' else np.float64)
+             for statistic in statistics}
+    for day, filename in enumerate(filenames):
+        with dataset_pool.checkout(filename) as ds:
+            #one read of the rectangle bounding every region
+            with query_metrics.stage('read'):
+                dataSubset = ds.variables[variable][zones.latslice, zones.lonslice]
+        query_metrics.record_read(dataSubset)
+        with query_metrics.stage('reduce'):
+            for statistic, values in zones.reduce(dataSubset, statistics).items():
+                table[statistic][:, day] = values
+    return table
+
+
+def reduce_files(file_name_list, variable, labels, statistics=STATISTICS, workers=None):
+    """
+    Compute the zonal statistics of every day of a list of files
+
+    Parameters
+    ----------
+    file_name_list : str[]
+        daily netCDF filenames in date order
+    variable : str
+        variable to query from the netCDF files
+    labels : ndarray or Zones
+        label raster on the grid of the files, see Zones
+    statistics : str[]
+        statistics to compute, see STATISTICS
+    workers : int
+        number of worker processes, defaults to common.queryWorkers
+
+    Returns
+    -------
+    tuple
+        (label of each region, dict of a (regions x days) MaskedArray for
+        each statistic)
+
+    """
+    zones = labels if isinstance(labels, Zones) else Zones(labels)
+    if not file_name_list:
+        return zones.labels, {statistic: np.ma.masked_all((len(zones.labels), 0), dtype=np.int32 if statistic == 'count' else np.float64)
+                              for statistic in statistics}
+    with dataset_pool.checkout(file_name_list[0]) as ds:
+        if ds.variables[variable].shape != zones.shape:
+            raise ValueError('label raster shape %s does not match the grid %s' %
+                             (zones.shape, ds.variables[variable].shape))
+
+    jobs = [(block, offset, filenames, variable, zones, tuple(statistics))
+            for block, offset, filenames in fan_out.blocks(file_name_list)]
+    partials = fan_out.run(_reduce_block, jobs, workers)
+    return zones.labels, {statistic: np.ma.concatenate([partial[statistic] for partial in partials], axis=1)
+                          for statistic in statistics}
+
+
+def write_table(filename, variable, labels, dates, table):
+    """
+    Write zonal statistics as a regions x days netCDF table
+
+    Parameters
+    ----------
+    filename : str
+        netCDF file to write
+    variable : str
+        variable the statistics are of, prefix of the table variables
+    labels : ndarray
+        label of each region
+    dates : date[]
+        date of each day
+    table : dict
+        (regions x days) MaskedArray for each statistic, see reduce_files
+
+    """
+    ds = Dataset(filename, "w", format="NETCDF4")
+    try:
+        ds.createDimension('region', len(labels))
+        ds.createDimension('day', len(dates))
+        ds.createVariable('region', 'i4', ('region',))[:] = labels
+        timeVar = ds.createVariable('time', 'i4', ('day',))
+        timeVar.units = 'days since ' + dates[0].isoformat()
+        timeVar[:] = [(mydate - dates[0]).days for mydate in dates]
+
+        for statistic, values in table.items():
+            datatype = 'i4' if statistic == 'count' else 'f'
+            statVar = ds.createVariable(variable + '_' + statistic, datatype, ('region', 'day'), zlib=True,
+                                        fill_value=None if statistic == 'count' else 1.0e+20)
+            statVar[:] = values
+    finally:
+        ds.close()